@@ -10,11 +10,70 @@
 import warnings
 
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 from mpl_interactions import panhandler, zoom_factory
 from mpl_point_clicker import clicker
 
-from postprocessing import extract_data
+from downsampling import downsample_frame
+from emg_store import EmgStore, open_recording
+from profiling import stage
+
+
+def window_bounds(timestamps, start, end):
+    """ Finds the samples between each start and end timestamp with a binary
+    search over the sorted timestamps. Start and end are included.
+
+    Args:
+        timestamps (array): sorted timestamps of the recording.
+        start (list): start timestamps of the windows.
+        end (list): end timestamps of the windows.
+
+    Returns:
+        array, array: first index and index after the last sample per window.
+    """
+    first = np.searchsorted(timestamps, start, side='left')
+    last = np.searchsorted(timestamps, end, side='right')
+    return first, np.maximum(last, first)
+
+
+def window_statistics(values, first, last):
+    """ Calculates the mean and maximum of each window in one reduction over
+    the selected samples only. Missing values are ignored, like pandas does.
+
+    Args:
+        values (array): samples x channels, e.g. the memory-mapped channels
+        of an EmgStore, see EmgStore.channels.
+        first (array): first index of each window.
+        last (array): index after the last sample of each window.
+
+    Returns:
+        array, array, array: mean and maximum (windows x channels) and number
+        of samples per window.
+    """
+    first = np.asarray(first, dtype=int)
+    lengths = np.asarray(last, dtype=int) - first
+    num_channels = values.shape[1]
+    means = np.full((len(first), num_channels), np.nan)
+    maxima = np.full((len(first), num_channels), np.nan)
+
+    filled = lengths > 0
+    if not filled.any():
+        return means, maxima, lengths
+
+    # indices of all selected samples, window after window
+    offsets = np.cumsum(lengths[filled]) - lengths[filled]
+    indices = np.repeat(first[filled] - offsets, lengths[filled]) + \
+        np.arange(lengths[filled].sum())
+    selected = np.asarray(values[indices], dtype=float)
+    missing = np.isnan(selected)
+
+    sums = np.add.reduceat(np.where(missing, 0, selected), offsets)
+    counts = np.add.reduceat(~missing, offsets)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means[filled] = np.where(counts > 0, sums / counts, np.nan)
+    maxima[filled] = np.fmax.reduceat(selected, offsets)
+    return means, maxima, lengths
 
 
 class EmgCalibration():
@@ -32,13 +91,49 @@ class EmgCalibration():
         self.extend = 'BSMB_MUSCLE_EXTEND'
         self.flex = 'BSMB_MUSCLE_FLEX'
 
+    @stage
     def load_data(self):
-        """ Loads the data files for EMG calibration of a user.
+        """ Loads the data files for EMG calibration of a user. Recordings
+        converted with emg_store.py are memory-mapped, so the windows are
+        read from the store, see open_recording.
         """
-        self.rest_data = extract_data(self.path + self.rest_file)
-        self.flex_data = extract_data(self.path + self.flex_file)
-        self.extend_data = extract_data(self.path + self.extend_file)
+        self.rest_data = open_recording(self.path + self.rest_file)
+        self.flex_data = open_recording(self.path + self.flex_file)
+        self.extend_data = open_recording(self.path + self.extend_file)
 
+    def samples(self, data):
+        """ Gives the timestamps and the extend and flex samples of a
+        recording. The samples of a store are not read until indexed.
+
+        Args:
+            data (data frame or EmgStore): recording.
+
+        Returns:
+            array, array: timestamps and samples x [extend, flex].
+        """
+        if isinstance(data, EmgStore):
+            return data.timestamps, data.channels([self.extend, self.flex])
+        return data['timestamp'].to_numpy(dtype=float), \
+            data[[self.extend, self.flex]].to_numpy(dtype=float)
+
+    def as_frame(self, data, columns=None):
+        """ Reads a recording into a data frame for detecting and plotting
+        the contractions.
+
+        Args:
+            data (data frame or EmgStore): recording.
+            columns (list of str, optional): data columns to read. Defaults to
+            extend and flex.
+
+        Returns:
+            data frame: timestamp and data columns.
+        """
+        columns = columns or [self.extend, self.flex]
+        if isinstance(data, EmgStore):
+            return data.select(columns=columns)
+        return data[['timestamp'] + columns]
+
+    @stage
     def calculate_rest_activity(self):
         """ Calculate rest activity based on a recording.
         First and last seconds are discarded and at most 10 seconds is taken
@@ -47,71 +142,42 @@ class EmgCalibration():
         than 8 seconds.
         Method based on Tchimino et al. 2022.
         """
-        rest_start = sampling_rate
-        if len(self.rest_data) < 12 * sampling_rate:
-            rest_end = len(self.rest_data) - sampling_rate
-        else:
-            rest_end = rest_start + 10 * sampling_rate
+        timestamps, values = self.samples(self.rest_data)
+        rest_start = timestamps[0] + 1000  # timestamps in ms
+        rest_end = min(rest_start + 10000, timestamps[-1] - 1000)
 
-        selected_data = self.rest_data.iloc[rest_start:rest_end]
-        if len(selected_data) < 6 * self.sampling_rate:
+        first, last = window_bounds(timestamps, [rest_start], [rest_end])
+        means, _, lengths = window_statistics(values, first, last)
+        if lengths.sum() < 6 * self.sampling_rate:
             message = 'Total rest contraction recorded is '\
-                f'{len(selected_data) / self.sampling_rate} seconds. '\
+                f'{lengths.sum() / self.sampling_rate} seconds. '\
                 'Consider recording again.'
             warnings.warn(message)
 
-        avg_rest = pd.DataFrame(
-            {self.extend: [selected_data[self.extend].mean()],
-             self.flex: [selected_data[self.flex].mean()]})
+        avg_rest = pd.DataFrame(means, columns=[self.extend, self.flex])
         avg_rest.to_csv(f'{self.path}rest_activity.csv', index=False)
 
-    def calculate_MVC(self):
+    @stage
+    def calculate_MVC(self, review=False):
         """ Calculates the maximum voluntary contraction (MVC) for both flexor
         and extensor muscles based on the selected data.
 
         Each muscle is contracted maximally for 5 s, 3 times with rest in
         between. The mean is taken over these 5 seconds and the average of
         these 3 values is taken as the mvc for each muscle.
-        Checks whether there are already saved start/end positions for each
-        muscle. If there are saved values, asks whether these are okay.
-        Otherwise, new values will be selected.
+        Uses saved start/end positions for each muscle when available,
+        otherwise the contractions are detected automatically.
         The values are then saved in a file.
-        """
-        try:
-            positions_flex = pd.read_csv(
-                f'{self.path}mvc_positions_flexion.csv')
-            start_flex = positions_flex.start.to_list()
-            end_flex = positions_flex.end.to_list()
-            self.visualise_data(
-                self.flex_data, 'flexion', start_flex, end_flex)
-            user_input = input(
-                "Are you happy with the start and end positions?\n"
-                "Press y when happy."
-                "Press any other key when you want to reset the boundaries.\n")
-            if user_input != 'y':
-                start_flex, end_flex = self.extract_contraction_times(
-                    self.flex_data, 'flexion')
-        except FileNotFoundError:
-            start_flex, end_flex = self.extract_contraction_times(
-                self.flex_data, 'flexion')
 
-        try:
-            positions_extend = pd.read_csv(
-                f'{self.path}mvc_positions_extension.csv')
-            start_extend = positions_extend.start.to_list()
-            end_extend = positions_extend.end.to_list()
-            self.visualise_data(
-                self.extend_data, 'extension', start_extend, end_extend)
-            user_input = input(
-                "Are you happy with the start and end positions?\n"
-                "Press y when happy. "
-                "Press any other key when you want to reset the boundaries.\n")
-            if user_input != 'y':
-                start_extend, end_extend = self.extract_contraction_times(
-                    self.extend_data, 'extension')
-        except FileNotFoundError:
-            start_extend, end_extend = self.extract_contraction_times(
-                self.extend_data, 'extension')
+        Args:
+            review (bool, optional): Asks whether the start/end positions are
+            okay, otherwise new values are selected by clicking.
+            Defaults to False.
+        """
+        start_flex, end_flex = self.contraction_times(
+            self.flex_data, 'flexion', review)
+        start_extend, end_extend = self.contraction_times(
+            self.extend_data, 'extension', review)
 
         avg_flex = self.select_data(self.flex_data, start_flex, end_flex)
         avg_extend = self.select_data(
@@ -124,20 +190,122 @@ class EmgCalibration():
                             self.flex: [mvc_flex[self.flex]]})
         mvc.to_csv(f'{self.path}mvc.csv', index=False)
 
+    def contraction_times(self, data_frame, muscle, review=False):
+        """ Loads the saved start and end positions of the contractions or
+        detects them when there are no saved positions. When reviewing, the
+        positions are shown and can be reset by clicking.
+
+        Args:
+            data_frame (data frame): data frame of recording
+            muscle (str): 'flexion' or 'extension'
+            review (bool, optional): Asks whether the positions are okay.
+            Defaults to False.
+
+        Returns:
+            list: 2 lists of timestamps
+        """
+        try:
+            positions = pd.read_csv(f'{self.path}mvc_positions_{muscle}.csv')
+            start = positions.start.to_list()
+            end = positions.end.to_list()
+        except FileNotFoundError:
+            start, end = self.detect_contraction_times(data_frame, muscle)
+
+        if review:
+            self.visualise_data(data_frame, muscle, start, end)
+            user_input = input(
+                "Are you happy with the start and end positions?\n"
+                "Press y when happy. "
+                "Press any other key when you want to reset the boundaries.\n")
+            if user_input != 'y':
+                start, end = self.extract_contraction_times(
+                    data_frame, muscle)
+        return start, end
+
+    def detect_contraction_times(self, data_frame, muscle,
+                                 num_contractions=3, smoothing=0.25,
+                                 on_level=0.5, off_level=0.3,
+                                 min_duration=1):
+        """ Detects the contraction plateaus of the contracted muscle.
+        The EMG is smoothed with a moving average and thresholded with
+        hysteresis: a contraction starts above on_level and ends below
+        off_level, both relative to the range between rest and peak activity.
+        The longest contractions are kept and trimmed to the part above
+        on_level. Saves the starting and ending points in a file.
+
+        Args:
+            data_frame (data frame or EmgStore): recording
+            muscle (str): 'flexion' or 'extension'
+            num_contractions (int, optional): Number of contractions to find.
+            Defaults to 3.
+            smoothing (float, optional): Length of the moving average in
+            seconds. Defaults to 0.25.
+            on_level (float, optional): Start threshold, as fraction of the
+            range between rest and peak. Defaults to 0.5.
+            off_level (float, optional): End threshold, as fraction of the
+            range between rest and peak. Defaults to 0.3.
+            min_duration (int, optional): Minimal duration of a contraction in
+            seconds. Defaults to 1.
+
+        Returns:
+            list: 2 lists of timestamps
+        """
+        column = self.flex if muscle == 'flexion' else self.extend
+        data_frame = self.as_frame(data_frame, [column])
+        window = max(1, int(smoothing * self.sampling_rate))
+        envelope = data_frame[column].interpolate(
+            limit_direction='both').rolling(
+            window, center=True, min_periods=1).mean().to_numpy()
+        timestamps = data_frame['timestamp'].to_numpy()
+
+        rest, peak = np.nanpercentile(envelope, [10, 99])
+        high = rest + on_level * (peak - rest)
+        low = rest + off_level * (peak - rest)
+
+        # hysteresis: keep the last decided state for samples in between
+        state = np.where(envelope >= high, 1, np.where(envelope <= low, 0, -1))
+        decided = np.where(state >= 0, np.arange(len(state)), 0)
+        np.maximum.accumulate(decided, out=decided)
+        active = state[decided] == 1
+
+        edges = np.diff(active.astype(int), prepend=0, append=0)
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)  # index after the contraction
+        lengths = ends - starts
+        longest = np.argsort(lengths)[::-1][:num_contractions]
+        longest = np.sort(longest[
+            lengths[longest] >= min_duration * self.sampling_rate])
+
+        start, end = [], []
+        for index in longest:  # trim to the plateau
+            plateau = np.flatnonzero(
+                envelope[starts[index]:ends[index]] >= high) + starts[index]
+            start.append(float(timestamps[plateau[0]]))
+            end.append(float(timestamps[plateau[-1]]))
+
+        if len(start) < num_contractions:
+            message = f'Detected {len(start)} of {num_contractions} '\
+                f'{muscle} contractions. Consider selecting them manually.'
+            warnings.warn(message)
+
+        positions = pd.DataFrame({"start": start, "end": end})
+        positions.to_csv(f'{self.path}mvc_positions_{muscle}.csv', index=False)
+        return start, end
+
     def extract_contraction_times(self, data_frame, muscle):
         """ Plots data and mark with cursor when contraction starts and ends.
         Saves starting and ending points in a list and sorts these. Then saves
         the values in a file.
 
         Args:
-            data_frame (data frame): data frame of recording
+            data_frame (data frame or EmgStore): recording
 
         Returns:
             list: 2 lists of timestamps (int)
         """
         fig, ax = plt.subplots(constrained_layout=True)
 
-        data_frame.plot(
+        self.as_frame(data_frame).plot(
             kind='line', x='timestamp', y=[self.extend, self.flex], ax=ax)
 
         plt.title(f'EMG activity over time during {muscle}')
@@ -162,24 +330,19 @@ class EmgCalibration():
         the total recorded time for muscle contraction is short (<10 seconds).
 
         Args:
-            data_frame (data frame): data frame of recording
+            data_frame (data frame or EmgStore): recording, only the selected
+            samples of a store are read.
             start (list of int): list of timestamps, start points
             end (list of int): list of timestamps, endpoints
 
         Returns:
             data_frame: average of selected muscle contraction
         """
-        avg_contraction = pd.DataFrame(columns=[self.extend, self.flex])
-        contraction_length = 0
-        for i, (x, y) in enumerate(zip(start, end)):
-            contraction_data = data_frame[
-                (data_frame['timestamp'] >= x) &
-                (data_frame['timestamp'] <= y)]
-
-            mean_contraction = contraction_data[
-                [self.extend, self.flex]].mean()
-            avg_contraction.loc[i] = mean_contraction
-            contraction_length += len(contraction_data)
+        timestamps, values = self.samples(data_frame)
+        first, last = window_bounds(timestamps, start, end)
+        means, _, lengths = window_statistics(values, first, last)
+        avg_contraction = pd.DataFrame(means, columns=[self.extend, self.flex])
+        contraction_length = lengths.sum()
 
         if contraction_length < 6 * self.sampling_rate:
             message = 'Total muscle contraction recorded is '\
@@ -190,18 +353,31 @@ class EmgCalibration():
         return avg_contraction
 
     def visualise_data(self, data_frame, activity, start_markers=None,
-                       end_markers=None):
+                       end_markers=None, max_points=None, method='minmax'):
         """ Visualise recorded data in plot over time.
 
         Args:
-            data_frame (data frame): timestamp, flex, and extend data.
+            data_frame (data frame or EmgStore): timestamp, flex, and extend
+            data.
             activity (str): activity name.
             start_markers (list): x coordinates for muscle contraction start.
             end_markers (list): x coordinates for muscle contraction end.
+            max_points (int, optional): Downsamples each muscle to about this
+            number of points. Plots all samples when None. Defaults to None.
+            method (str, optional): Downsampling method, 'minmax' or 'lttb'.
+            Defaults to 'minmax'.
         """
         ax = plt.gca()
-        data_frame.plot(
-            kind='line', x='timestamp', y=[self.extend, self.flex], ax=ax)
+        data_frame = self.as_frame(data_frame)
+        if max_points:
+            downsampled = downsample_frame(
+                data_frame, 'timestamp', [self.extend, self.flex], max_points,
+                method)
+            for column, series in downsampled.items():
+                series.plot(kind='line', x='timestamp', y=column, ax=ax)
+        else:
+            data_frame.plot(
+                kind='line', x='timestamp', y=[self.extend, self.flex], ax=ax)
 
         if start_markers:
             for x_coordinates in start_markers:
@@ -219,6 +395,7 @@ if __name__ == "__main__":
     user = 'me'
     date = '2023_02_24'
     sampling_rate = 10
+    review = True  # check the positions and reset them by clicking
 
     emg = EmgCalibration(user, date, sampling_rate)
     emg.load_data()
@@ -227,4 +404,4 @@ if __name__ == "__main__":
     # emg.visualise_data(emg.rest_data, 'rest')
 
     emg.calculate_rest_activity()
-    emg.calculate_MVC()
+    emg.calculate_MVC(review=review)
@@ -12,7 +12,7 @@ import time
 import board
 import digitalio
 
-from utils import read_file
+from utils import parse_lines, read_file
 
 
 class ActivateVibrationMotor():
@@ -82,11 +82,20 @@ class ActivateVibrationMotor():
             # level = level_conf["LEVEL"]
             level_conf["PIN"] = [self.pins[i] for i in level_conf["PIN"]]
 
-    def set_thresholds(self, file='perceptual_thresholds.csv'):
+    def set_thresholds(self, file='perceptual_thresholds.csv', lines=None):
         """ Loads file with perceptual thresholds.
         Configures the vibration time for each level.
+
+        Args:
+            file (str, optional): file with the thresholds.
+            Defaults to 'perceptual_thresholds.csv'.
+            lines (list, optional): lines of the file, when already read.
+            Defaults to None.
         """
-        self.thresholds = read_file(self.path, file, ['float'])[0]
+        if lines is None:
+            self.thresholds = read_file(self.path, file, ['float'])[0]
+        else:
+            self.thresholds = parse_lines(lines, ['float'])[0]
         for index, level_conf in enumerate(self.level_list):
             level_conf["VIBRATION_TIME"] = self.thresholds[index] / 1000
 
@@ -0,0 +1,115 @@
+"""
+ * @author Myrthe Tilleman
+ * @email metill@utu.fi
+ * @create date 2026-10-19 12:05:51
+ * @desc Recalculates the EMG calibration of many users and dates without any
+ interaction. Uses the saved mvc_positions_*.csv files or detects the
+ contractions automatically, runs each session in a separate process, and
+ saves a summary with the warnings under /user_files/results/.
+"""
+
+import glob
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+import pandas as pd
+
+matplotlib.use('Agg')  # never open a window in the workers
+
+from EMG_calibration import EmgCalibration
+
+
+def find_sessions(pattern='user_files/*/*/', folder='user_files/'):
+    """ Finds the user/date folders that contain all calibration recordings.
+
+    Args:
+        pattern (str, optional): glob pattern of the folders.
+        Defaults to 'user_files/*/*/'.
+        folder (str, optional): folder where all user files are located.
+        Defaults to 'user_files/'.
+
+    Returns:
+        list: (user, date) tuples.
+    """
+    sessions = []
+    for path in sorted(glob.glob(pattern)):
+        if not all(os.path.isfile(os.path.join(path, file_name)) for file_name
+                   in ['rest.csv', 'flex.csv', 'extend.csv']):
+            continue
+        relative = os.path.relpath(path, folder).split(os.sep)
+        if len(relative) == 2:
+            sessions.append((relative[0], relative[1]))
+    return sessions
+
+
+def calibrate_session(user, date, sampling_rate=100):
+    """ Calculates and saves the rest activity and MVC of one session.
+
+    Args:
+        user (str): user name / number.
+        date (str): date of the calibration.
+        sampling_rate (int, optional): sampling rate of the recordings.
+        Defaults to 100.
+
+    Returns:
+        dict: summary of the session with the calibration values, the
+        warnings, and the error if the calibration failed.
+    """
+    summary = {'User': user, 'Date': date, 'Error': '', 'Warnings': ''}
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        try:
+            emg = EmgCalibration(user, date, sampling_rate)
+            emg.load_data()
+            emg.calculate_rest_activity()
+            emg.calculate_MVC(review=False)
+        except Exception as error:
+            summary['Error'] = repr(error)
+    summary['Warnings'] = ' | '.join(str(warning.message)
+                                     for warning in caught)
+
+    if not summary['Error']:
+        rest = pd.read_csv(f'{emg.path}rest_activity.csv')
+        mvc = pd.read_csv(f'{emg.path}mvc.csv')
+        for column in [emg.extend, emg.flex]:
+            summary[f'rest {column}'] = rest[column].iloc[0]
+            summary[f'mvc {column}'] = mvc[column].iloc[0]
+    return summary
+
+
+def batch_calibrate(sessions, sampling_rate=100, processes=None,
+                    summary_file='user_files/results/calibration_summary.csv'):
+    """ Calibrates all sessions in parallel and saves a summary.
+
+    Args:
+        sessions (list): (user, date) tuples, see find_sessions.
+        sampling_rate (int, optional): sampling rate of the recordings.
+        Defaults to 100.
+        processes (int, optional): number of worker processes. Defaults to the
+        number of cores.
+        summary_file (str, optional): file to save the summary in. Defaults to
+        'user_files/results/calibration_summary.csv'.
+
+    Returns:
+        data frame: summary with one row per session.
+    """
+    users = [user for user, _ in sessions]
+    dates = [date for _, date in sessions]
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        summaries = list(executor.map(
+            calibrate_session, users, dates, [sampling_rate] * len(sessions)))
+
+    summary = pd.DataFrame(summaries)
+    summary.to_csv(summary_file, index=False)
+    return summary
+
+
+if __name__ == '__main__':
+    pattern = 'user_files/*/*/'
+    sampling_rate = 100
+
+    sessions = find_sessions(pattern)
+    summary = batch_calibrate(sessions, sampling_rate)
+    print(summary[['User', 'Date', 'Error', 'Warnings']])
@@ -0,0 +1,68 @@
+"""
+ * @author Myrthe Tilleman
+ * @email metill@utu.fi
+ * @create date 2026-10-19 21:12:45
+ * @desc Precomputed calibration for the boot of the online feedback. The
+ lines of the perceptual thresholds, mvc and rest activity files are saved
+ together in one cache file, so the boot reads one file instead of three.
+ The cache is only used while the size and modification time of every
+ source file are the same, otherwise it is saved again, which needs write
+ access, see booty.py. Runs on the microprocessor.
+"""
+
+import os
+
+
+def file_versions(files):
+    """ Describes the source files by their path, size and modification time.
+
+    Args:
+        files (list): paths of the source files.
+
+    Returns:
+        str: one line with the versions of all files.
+    """
+    versions = []
+    for path in files:
+        status = os.stat(path)
+        versions.append(f'{path}:{status[6]}:{status[8]}')
+    return ','.join(versions)
+
+
+def load_calibration(files, cache_file):
+    """ Reads the lines of the calibration files from the cache, or from the
+    files themselves when the cache is missing or out of date.
+
+    Args:
+        files (list): paths of the source files.
+        cache_file (str): path of the cache file.
+
+    Returns:
+        list: the lines of each file.
+    """
+    versions = file_versions(files)
+    try:
+        with open(cache_file, 'r') as file:
+            lines = file.read().splitlines()
+        if lines[0] == versions:
+            start = 2
+            file_lines = []
+            for length in lines[1].split(','):
+                file_lines.append(lines[start:start + int(length)])
+                start += int(length)
+            return file_lines
+    except (OSError, IndexError, ValueError):  # no valid cache
+        pass
+
+    file_lines = []
+    for path in files:
+        with open(path, 'r') as file:
+            file_lines.append(file.read().splitlines())
+    lengths = ','.join(str(len(lines)) for lines in file_lines)
+    try:
+        with open(cache_file, 'w') as file:
+            file.write('\n'.join([versions, lengths] + [
+                line for lines in file_lines for line in lines]))
+    except OSError:  # no write access, read the files again next boot
+        pass
+    return file_lines
@@ -0,0 +1,68 @@
+"""
+ * @author Myrthe Tilleman
+ * @email metill@utu.fi
+ * @create date 2026-10-19 19:02:17
+ * @desc Boot profiler for the microprocessor. Timestamps the imports and
+ initialisation phases of run.py, from the start of code.py until the first
+ vibration, and saves the breakdown as csv. Saving needs write access, see
+ booty.py; without it, the breakdown is only printed. Only imports time, so
+ it can be imported before anything else. Runs on the microprocessor.
+"""
+
+import time
+
+
+class BootProfiler():
+    def __init__(self, file='user_files/boot_profile.csv'):
+        """ Starts the clock of the boot.
+
+        Args:
+            file (str, optional): csv file to save the phases to.
+            Defaults to 'user_files/boot_profile.csv'.
+        """
+        self.file = file
+        self.start = time.monotonic()  # seconds since the board started
+        self.last = self.start
+        self.phases = []  # (phase, end since start, duration) in ms
+        self.finished = False
+
+    def mark(self, phase):
+        """ Ends a phase, which started at the previous mark.
+
+        Args:
+            phase (str): name of the phase, e.g. 'import asyncio'.
+        """
+        now = time.monotonic()
+        self.phases.append((phase, round((now - self.start) * 1000, 1),
+                            round((now - self.last) * 1000, 1)))
+        self.last = now
+
+    def finish(self, phase='first vibration'):
+        """ Marks the last phase and saves the breakdown, only the first time
+        it is called, so it can be called every frame.
+
+        Args:
+            phase (str, optional): name of the last phase.
+            Defaults to 'first vibration'.
+        """
+        if self.finished:
+            return
+        self.finished = True
+        self.mark(phase)
+        self.save()
+
+    def save(self):
+        """ Saves the phases as csv with the time since the start and the
+        duration of each phase in ms. The first row is the time from the
+        start of the board until the profiler was created. Prints the phases
+        when the file system is read only.
+        """
+        lines = ['phase,since start (ms),duration (ms)',
+                 f'board start,0,{round(self.start * 1000, 1)}']
+        lines += [f'{phase},{end},{duration}'
+                  for phase, end, duration in self.phases]
+        try:
+            with open(self.file, 'w') as file:
+                file.write('\n'.join(lines))
+        except OSError:  # no write access
+            print('\n'.join(lines))
@@ -53,12 +53,21 @@ def read_file(path, file_name, data_type=[None]):
     return data, level
 
 
-if __name__ == '__main__':
-    file_name = 'hold_150ms'
-    user = 'me'
-    date = '2023_03_23'
+def convert_log(user, date, file_name, folder='user_files/'):
+    """ Converts the txt file of a user and date into a csv file with the
+    same name.
 
-    path = f'user_files/{user}/{date}/'
+    Args:
+        user (str): user name / number.
+        date (str): date of the recording.
+        file_name (str): name of the file without extension.
+        folder (str, optional): folder where all user files are located.
+        Defaults to 'user_files/'.
+
+    Returns:
+        data frame: the converted data.
+    """
+    path = f'{folder}{user}/{date}/'
     data, level = read_file(path, f'{file_name}.txt', ['int', None])
     data_array = np.array(data)
 
@@ -66,5 +75,14 @@ if __name__ == '__main__':
         'BSMB_MUSCLE_FLEX': data_array[:, 0],
         'BSMB_MUSCLE_EXTEND': data_array[:, 1],
         'LEVEL': level, 'timestamp': np.arange(len(level))})
-    print(data_frame.head())
     data_frame.to_csv(path + f'{file_name}.csv', index=False)
+    return data_frame
+
+
+if __name__ == '__main__':
+    file_name = 'hold_150ms'
+    user = 'me'
+    date = '2023_03_23'
+
+    data_frame = convert_log(user, date, file_name)
+    print(data_frame.head())
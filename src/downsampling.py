@@ -0,0 +1,168 @@
+"""
+ * @author Myrthe Tilleman
+ * @email metill@utu.fi
+ * @create date 2026-10-19 09:12:40
+ * @desc Shape-preserving downsampling of long recordings before plotting and
+ exporting figures. Supports min/max per bucket and largest triangle three
+ buckets (LTTB). Step traces, such as the feedback level, keep every edge.
+"""
+
+import numpy as np
+
+
+def min_max_indices(y, max_points):
+    """ Selects the indices of the minimum and maximum value in each bucket,
+    so peaks and troughs of the signal are kept. The first and last sample
+    are always kept.
+
+    Args:
+        y (array): values of the series.
+        max_points (int): maximum number of points to keep.
+
+    Returns:
+        array: sorted indices of the selected samples.
+    """
+    y = np.asarray(y, dtype=float)
+    length = len(y)
+    if length <= max_points or max_points < 4:
+        return np.arange(length)
+
+    num_buckets = (max_points - 2) // 2
+    bucket_size = int(np.ceil((length - 2) / num_buckets))
+    num_buckets = int(np.ceil((length - 2) / bucket_size))
+
+    inner = y[1:-1]
+    padding = num_buckets * bucket_size - len(inner)
+    buckets_min = np.pad(np.where(np.isnan(inner), np.inf, inner),
+                         (0, padding), constant_values=np.inf)
+    buckets_max = np.pad(np.where(np.isnan(inner), -np.inf, inner),
+                         (0, padding), constant_values=-np.inf)
+    buckets_min = buckets_min.reshape(num_buckets, bucket_size)
+    buckets_max = buckets_max.reshape(num_buckets, bucket_size)
+
+    offset = np.arange(num_buckets) * bucket_size + 1
+    index_min = offset + buckets_min.argmin(axis=1)
+    index_max = offset + buckets_max.argmax(axis=1)
+
+    indices = np.concatenate(([0], index_min, index_max, [length - 1]))
+    indices = indices[indices < length]
+    return np.unique(indices)
+
+
+def lttb_indices(x, y, max_points):
+    """ Selects indices with the largest triangle three buckets algorithm.
+    Each bucket keeps the sample that forms the largest triangle with the
+    sample kept in the previous bucket and the average of the next bucket.
+    NaN values are skipped.
+
+    Args:
+        x (array): x values of the series, e.g. timestamps.
+        y (array): values of the series.
+        max_points (int): maximum number of points to keep.
+
+    Returns:
+        array: sorted indices of the selected samples.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    valid = np.flatnonzero(~np.isnan(y))
+    if len(valid) <= max_points or max_points < 3:
+        return valid
+
+    x_valid = x[valid]
+    y_valid = y[valid]
+    edges = np.linspace(1, len(valid) - 1, max_points - 1).astype(int)
+
+    selected = np.zeros(max_points, dtype=int)
+    previous = 0
+    for i in range(max_points - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], edges[i + 2]
+            next_x = x_valid[next_start:next_end].mean()
+            next_y = y_valid[next_start:next_end].mean()
+        else:
+            next_x, next_y = x_valid[-1], y_valid[-1]
+
+        area = np.abs(
+            (x_valid[previous] - next_x) * (y_valid[start:end] - y_valid[
+                previous]) - (x_valid[previous] - x_valid[start:end]) * (
+                next_y - y_valid[previous]))
+        previous = start + int(area.argmax())
+        selected[i + 1] = previous
+    selected[-1] = len(valid) - 1
+    return valid[selected]
+
+
+def step_indices(y):
+    """ Selects the indices where a step trace changes value, together with
+    the sample just before each change, so each edge is kept exactly.
+    Changes from or to NaN count as edges as well.
+
+    Args:
+        y (array): values of a piecewise constant series.
+
+    Returns:
+        array: sorted indices of the selected samples.
+    """
+    y = np.asarray(y, dtype=float)
+    length = len(y)
+    if length < 3:
+        return np.arange(length)
+
+    missing = np.isnan(y)
+    changed = (y[1:] != y[:-1]) & ~(missing[1:] & missing[:-1])
+    edges = np.flatnonzero(changed) + 1
+    indices = np.concatenate(([0], edges - 1, edges, [length - 1]))
+    return np.unique(indices)
+
+
+def downsample_indices(x, y, max_points, method='minmax', step=False):
+    """ Selects the samples of one series to keep for plotting.
+
+    Args:
+        x (array): x values of the series, e.g. timestamps.
+        y (array): values of the series.
+        max_points (int): target number of points. Step traces keep all
+        edges, even when this exceeds max_points.
+        method (str, optional): 'minmax' or 'lttb'. Defaults to 'minmax'.
+        step (bool, optional): Whether the series is a step trace.
+        Defaults to False.
+
+    Returns:
+        array: sorted indices of the selected samples.
+    """
+    if step:
+        return step_indices(y)
+    if method == 'minmax':
+        return min_max_indices(y, max_points)
+    elif method == 'lttb':
+        return lttb_indices(x, y, max_points)
+    raise ValueError(f'Unknown downsampling method: {method}')
+
+
+def downsample_frame(data_frame, x, y, max_points, method='minmax',
+                     step_columns=('LEVEL', 'threshold level')):
+    """ Downsamples each column in y separately.
+
+    Args:
+        data_frame (data frame): data frame with the x and y columns.
+        x (str): column name of the x values.
+        y (list): column names of the series to downsample.
+        max_points (int): target number of points per series.
+        method (str, optional): 'minmax' or 'lttb'. Defaults to 'minmax'.
+        step_columns (tuple, optional): columns that are step traces.
+        Defaults to ('LEVEL', 'threshold level').
+
+    Returns:
+        dict: for each series, a data frame with the x column and that
+        series at the selected samples.
+    """
+    x_values = data_frame[x].to_numpy(dtype=float)
+    downsampled = {}
+    for column in y:
+        indices = downsample_indices(
+            x_values, data_frame[column].to_numpy(dtype=float), max_points,
+            method, step=column in step_columns)
+        downsampled[column] = data_frame[[x, column]].iloc[indices]
+    return downsampled
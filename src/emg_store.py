@@ -0,0 +1,355 @@
+"""
+ * @author Myrthe Tilleman
+ * @email metill@utu.fi
+ * @create date 2026-10-19 11:20:37
+ * @desc Store for long EMG recordings and level traces on disk. The samples
+ are memory-mapped, so only the selected time ranges are read from the file.
+
+ File layout: an 8 byte magic, the length of the header (uint32), a JSON
+ header padded to HEADER_SIZE bytes, followed by one record per sample with
+ the timestamp (float64) and a float32 value for each column. Timestamps are
+ sorted, so time ranges are found with a binary search.
+ Recordings are read from a Toolbox log, a plain csv, or their store.
+"""
+
+import json
+import os
+import struct
+
+import numpy as np
+import pandas as pd
+from numpy.lib.recfunctions import structured_to_unstructured
+
+from profiling import stage
+
+MAGIC = b'EMGSTORE'
+HEADER_SIZE = 4096
+VERSION = 1
+
+
+def record_dtype(columns):
+    """ Creates the record type of a store with the given columns.
+
+    Args:
+        columns (list of str): names of the data columns.
+
+    Returns:
+        numpy dtype: timestamp and one float32 field per column.
+    """
+    return np.dtype([('timestamp', '<f8')] + [
+        (column, '<f4') for column in columns])
+
+
+def read_header(path):
+    """ Reads the metadata header of a store.
+
+    Args:
+        path (str): path of the store file.
+
+    Returns:
+        dict: metadata of the store.
+    """
+    with open(path, 'rb') as file:
+        start = file.read(len(MAGIC) + 4)
+        if start[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'{path} is not an EMG store.')
+        (length,) = struct.unpack('<I', start[len(MAGIC):])
+        return json.loads(file.read(length).decode('utf-8'))
+
+
+class EmgStoreWriter():
+    def __init__(self, path, columns, metadata=None):
+        """ Creates a new store file. Samples are added in chunks with
+        append, the header is completed when the writer is closed.
+
+        Args:
+            path (str): path of the store file.
+            columns (list of str): names of the data columns.
+            metadata (dict, optional): extra information saved in the header,
+            e.g. user, date, and sampling rate. Defaults to None.
+        """
+        self.path = path
+        self.columns = list(columns)
+        self.metadata = dict(metadata or {})
+        self.dtype = record_dtype(self.columns)
+        self.num_samples = 0
+        self.first_timestamp = None
+        self.last_timestamp = None
+
+        self.file = open(self.path, 'wb')
+        self.write_header()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write_header(self):
+        """ Writes the magic, header length, and JSON header at the start of
+        the file.
+        """
+        header = dict(self.metadata)
+        header.update({
+            'version': VERSION, 'columns': self.columns,
+            'num_samples': self.num_samples,
+            'first_timestamp': self.first_timestamp,
+            'last_timestamp': self.last_timestamp})
+        encoded = json.dumps(header).encode('utf-8')
+        if len(MAGIC) + 4 + len(encoded) > HEADER_SIZE:
+            raise ValueError('Metadata does not fit in the store header.')
+
+        position = self.file.tell()
+        self.file.seek(0)
+        self.file.write(MAGIC + struct.pack('<I', len(encoded)) + encoded)
+        self.file.write(b' ' * (HEADER_SIZE - len(MAGIC) - 4 - len(encoded)))
+        self.file.seek(max(position, HEADER_SIZE))
+
+    def append(self, data_frame):
+        """ Adds samples to the end of the store. Timestamps need to be sorted
+        and may not be smaller than the last timestamp in the store.
+
+        Args:
+            data_frame (data frame): timestamp and data columns.
+        """
+        timestamps = data_frame['timestamp'].to_numpy(dtype=float)
+        if len(timestamps) == 0:
+            return
+        if np.any(np.diff(timestamps) < 0) or (
+                self.last_timestamp is not None and
+                timestamps[0] < self.last_timestamp):
+            raise ValueError('Timestamps of an EMG store need to be sorted.')
+
+        records = np.empty(len(timestamps), dtype=self.dtype)
+        records['timestamp'] = timestamps
+        for column in self.columns:
+            records[column] = data_frame[column].to_numpy(dtype=float)
+        self.file.write(records.tobytes())
+
+        if self.first_timestamp is None:
+            self.first_timestamp = float(timestamps[0])
+        self.last_timestamp = float(timestamps[-1])
+        self.num_samples += len(timestamps)
+
+    def close(self):
+        """ Completes the header and closes the file.
+        """
+        if not self.file.closed:
+            self.write_header()
+            self.file.close()
+
+
+class EmgStore():
+    def __init__(self, path):
+        """ Opens a store for reading. No samples are read until they are
+        selected.
+
+        Args:
+            path (str): path of the store file.
+        """
+        self.path = path
+        self.metadata = read_header(path)
+        self.columns = self.metadata['columns']
+        self.dtype = record_dtype(self.columns)
+
+        num_samples = self.metadata['num_samples']
+        if num_samples:
+            self.records = np.memmap(self.path, dtype=self.dtype, mode='r',
+                                     offset=HEADER_SIZE, shape=(num_samples,))
+        else:
+            self.records = np.empty(0, dtype=self.dtype)
+        self.timestamps = self.records['timestamp']
+
+    def __len__(self):
+        return len(self.records)
+
+    def channels(self, columns=None):
+        """ Views data columns as one samples x channels array, e.g. for
+        window_statistics. The view is memory-mapped as well, so only the
+        indexed samples are read.
+
+        Args:
+            columns (list of str, optional): columns of the view. Defaults to
+            all columns.
+
+        Returns:
+            array: float32 samples x columns.
+        """
+        columns = list(columns or self.columns)
+        if not len(self):
+            return np.empty((0, len(columns)), dtype='<f4')
+        return structured_to_unstructured(self.records[columns])
+
+    def window(self, start, end):
+        """ Finds the first and last index of the samples in a time range.
+
+        Args:
+            start (float or array): start timestamp(s), included.
+            end (float or array): end timestamp(s), included.
+
+        Returns:
+            int or array, int or array: first index and index after the last
+            sample in the range.
+        """
+        first = np.searchsorted(self.timestamps, start, side='left')
+        last = np.searchsorted(self.timestamps, end, side='right')
+        return first, last
+
+    def select(self, start=None, end=None, columns=None):
+        """ Reads the samples in a time range into a data frame.
+
+        Args:
+            start (float, optional): start timestamp, included. Defaults to
+            the start of the recording.
+            end (float, optional): end timestamp, included. Defaults to the
+            end of the recording.
+            columns (list of str, optional): columns to read. Defaults to all
+            columns.
+
+        Returns:
+            data frame: timestamp and selected columns.
+        """
+        first = 0 if start is None else self.window(start, start)[0]
+        last = len(self) if end is None else self.window(end, end)[1]
+        records = self.records[first:last]
+
+        selected = {'timestamp': np.array(records['timestamp'])}
+        for column in columns or self.columns:
+            selected[column] = np.array(records[column], dtype=float)
+        return pd.DataFrame(selected)
+
+
+def write_store(path, data_frame, columns, metadata=None):
+    """ Saves a data frame with a timestamp column in a store.
+
+    Args:
+        path (str): path of the store file.
+        data_frame (data frame): timestamp and data columns.
+        columns (list of str): names of the data columns to save.
+        metadata (dict, optional): extra information for the header.
+        Defaults to None.
+    """
+    data_frame = data_frame.sort_values('timestamp', kind='stable')
+    with EmgStoreWriter(path, columns, metadata) as writer:
+        writer.append(data_frame)
+
+
+@stage
+def extract_data(filename, verbose=True, comma=False):
+    """
+    Extracts data and returns a reshaped data frame with each variable type
+    in a different column, ordered by timestamp.
+
+    Args:
+        filename (data frame): csv file with EMG data recorded using Ossur
+        Toolbox.
+        verbose (bool, optional): _description_. Defaults to True.
+        comma (bool, optional): Whether decimals are denoted after a comma.
+        Defaults to False.
+
+    Returns:
+        data frame
+    """
+    if comma:
+        dec = ','
+    else:
+        dec = '.'
+    df = pd.read_csv(filename, delimiter=';', decimal=dec, header=0, quoting=3)
+    df = df.pivot(columns="variableType", values="numValue", index="timestamp")
+    df = df.reset_index(level=0)
+    return df
+
+
+def open_recording(data_path, from_log=True):
+    """ Opens a recording. When it was converted to a store with the same
+    name, e.g. rest.emg for rest.csv, which is not older than the recording,
+    the store is opened so only the selected samples are read. Otherwise the
+    recording is read into a data frame.
+
+    Args:
+        data_path (str): path of the recording.
+        from_log (bool, optional): whether the data comes from a Toolbox log.
+        Defaults to True.
+
+    Returns:
+        EmgStore or data frame: store or data of the recording.
+    """
+    store_path = os.path.splitext(data_path)[0] + '.emg'
+    if os.path.exists(store_path) and (
+            not os.path.exists(data_path) or
+            os.path.getmtime(store_path) >= os.path.getmtime(data_path)):
+        return EmgStore(store_path)
+    if from_log:
+        return extract_data(data_path)
+    return pd.read_csv(data_path)
+
+
+def read_recording(data_path, from_log=True):
+    """ Reads a recording into a data frame, from its store when
+    available, see open_recording.
+
+    Args:
+        data_path (str): path of the recording.
+        from_log (bool, optional): whether the data comes from a Toolbox log.
+        Defaults to True.
+
+    Returns:
+        data frame: timestamp and data columns.
+    """
+    recording = open_recording(data_path, from_log)
+    if isinstance(recording, EmgStore):
+        return recording.select()
+    return recording
+
+
+def convert_recording(data_path, store_path, from_log=True,
+                      columns=('BSMB_MUSCLE_EXTEND', 'BSMB_MUSCLE_FLEX'),
+                      metadata=None, chunksize=100000):
+    """ Converts a recording to a store. Plain csv files, e.g. from
+    convert_txt.py, are read in chunks so they do not need to fit in memory.
+
+    Args:
+        data_path (str): path of the recording.
+        store_path (str): path of the store file.
+        from_log (bool, optional): whether the data comes from a Toolbox log.
+        Defaults to True.
+        columns (tuple, optional): data columns to save. Defaults to
+        ('BSMB_MUSCLE_EXTEND', 'BSMB_MUSCLE_FLEX').
+        metadata (dict, optional): extra information for the header.
+        Defaults to None.
+        chunksize (int, optional): number of rows read at a time.
+        Defaults to 100000.
+    """
+    metadata = dict(metadata or {})
+    metadata.setdefault('source', data_path)
+
+    if from_log:
+        data = extract_data(data_path)
+        for column in columns:
+            if column not in data:
+                data[column] = np.nan
+        write_store(store_path, data, columns, metadata)
+        return
+
+    with EmgStoreWriter(store_path, columns, metadata) as writer:
+        for chunk in pd.read_csv(data_path, chunksize=chunksize):
+            if 'LEVEL' in chunk:
+                chunk['LEVEL'] = pd.to_numeric(chunk['LEVEL'],
+                                               errors='coerce')
+            writer.append(chunk)
+
+
+if __name__ == '__main__':
+    user = 'U401'
+    date = '2023_03_17'
+    file_name = 'plantar_flexion'
+
+    path = f'user_files/{user}/{date}/'
+    convert_recording(
+        f'{path}{file_name}.csv', f'{path}{file_name}.emg', from_log=False,
+        columns=('BSMB_MUSCLE_EXTEND', 'BSMB_MUSCLE_FLEX', 'LEVEL'),
+        metadata={'user': user, 'date': date})
+
+    store = EmgStore(f'{path}{file_name}.emg')
+    print(store.metadata)
+    print(store.select(store.timestamps[0], store.timestamps[0] + 5000))
@@ -0,0 +1,108 @@
+"""
+ * @author Myrthe Tilleman
+ * @email metill@utu.fi
+ * @create date 2026-10-19 18:31:26
+ * @desc Garbage collection policy for the online feedback. Automatic
+ collection is disabled during the feedback, so it cannot pause a vibration
+ or a frame read. Instead, the heap is collected in idle windows, e.g. the
+ off time of the motors when no UART data is waiting, and it is always
+ collected when the free heap drops below a safety margin. Counts how often
+ each path runs. Runs on the microprocessor.
+"""
+
+import gc
+import time
+
+
+class GcPolicy():
+    def __init__(self, min_free=8192, idle_alloc=4096, min_idle_time=0.05):
+        """ Decides when the heap is collected.
+
+        Args:
+            min_free (int, optional): free heap (bytes) below which a
+            collection is forced. Defaults to 8192.
+            idle_alloc (int, optional): bytes allocated since the last
+            collection before an idle window is used. Defaults to 4096.
+            min_idle_time (float, optional): shortest idle window (seconds)
+            to collect in. Defaults to 0.05.
+        """
+        self.min_free = min_free
+        self.idle_alloc = idle_alloc
+        self.min_idle_time = min_idle_time
+        # gc.mem_free and gc.mem_alloc only exist in CircuitPython
+        self.heap_info = hasattr(gc, 'mem_free')
+
+        self.active = False
+        self.last_alloc = 0
+        self.counters = {'idle': 0, 'forced': 0, 'skipped': 0}
+
+    def allocated(self):
+        """ Memory allocated on the heap.
+
+        Returns:
+            int: bytes on the microprocessor, otherwise number of objects
+            tracked by the garbage collector since the last collection.
+        """
+        if self.heap_info:
+            return gc.mem_alloc()
+        return gc.get_count()[0]
+
+    def collect(self, path):
+        """ Collects the heap and counts the path.
+
+        Args:
+            path (str): 'idle' or 'forced'.
+        """
+        gc.collect()
+        self.last_alloc = self.allocated()
+        self.counters[path] += 1
+
+    def start(self):
+        """ Collects once and disables automatic collection, at the start of
+        the feedback.
+        """
+        gc.collect()
+        gc.disable()
+        self.active = True
+        self.last_alloc = self.allocated()
+
+    def stop(self):
+        """ Enables automatic collection again.
+        """
+        gc.enable()
+        self.active = False
+
+    def check(self):
+        """ Forces a collection when the free heap is below the safety
+        margin. Call regularly, e.g. after each frame.
+
+        Returns:
+            bool: True if the heap was collected.
+        """
+        if self.active and self.heap_info and gc.mem_free() < self.min_free:
+            self.collect('forced')
+            return True
+        return False
+
+    def idle(self, duration, backlog=0):
+        """ Collects in an idle window when enough memory was allocated since
+        the last collection and no data is waiting.
+
+        Args:
+            duration (float): length of the idle window (seconds), inf
+            while the motors are off until the next level.
+            backlog (int, optional): bytes waiting to be read. Defaults to 0.
+
+        Returns:
+            float: time (seconds) spent collecting.
+        """
+        if not self.active or duration < self.min_idle_time or \
+                self.allocated() - self.last_alloc < self.idle_alloc:
+            return 0
+        if backlog:  # collect in a later window
+            self.counters['skipped'] += 1
+            return 0
+
+        start = time.monotonic()
+        self.collect('idle')
+        return time.monotonic() - start
@@ -0,0 +1,144 @@
+"""
+ * @author Myrthe Tilleman
+ * @email metill@utu.fi
+ * @create date 2026-10-19 13:48:26
+ * @desc Count matrices of the true and predicted levels of the feedback
+ validation. Each session is counted once and cached next to its label files.
+ Cohort matrices are the sum of the session matrices.
+"""
+
+import os
+
+import numpy as np
+
+from profiling import stage
+from utils import accuracy_from_counts, read_file
+
+LEVELS = np.arange(-4, 5)
+GROUPS = ['flexion', 'co-contraction', 'extension']
+CACHE_FILE = 'label_counts.npz'
+
+
+def count_matrix(true_labels, predicted_labels):
+    """ Counts how often each true level was predicted as each level.
+
+    Args:
+        true_labels (list): true levels, -4 to 4.
+        predicted_labels (list): predicted levels, -4 to 4.
+
+    Returns:
+        array: counts, true level x predicted level.
+
+    Raises:
+        ValueError: if a level is out of range.
+    """
+    offset = -LEVELS[0]
+    true_labels = np.asarray(true_labels, dtype=int) + offset
+    predicted_labels = np.asarray(predicted_labels, dtype=int) + offset
+    for labels in [true_labels, predicted_labels]:
+        if np.any((labels < 0) | (labels >= len(LEVELS))):
+            raise ValueError(f'Levels out of range: {labels - offset}')
+    counts = np.bincount(true_labels * len(LEVELS) + predicted_labels,
+                         minlength=len(LEVELS) ** 2)
+    return counts.reshape(len(LEVELS), len(LEVELS))
+
+
+@stage
+def session_counts(user, date, folder='user_files/', cache=True):
+    """ Loads the count matrix of a validation session. The matrix is saved in
+    a cache file and only recounted when a label file changed.
+
+    Args:
+        user (str): user name / number.
+        date (str): date of the validation session.
+        folder (str, optional): folder where all user files are located.
+        Defaults to 'user_files/'.
+        cache (bool, optional): Whether to use and update the cache file.
+        Defaults to True.
+
+    Returns:
+        array: counts, true level x predicted level.
+    """
+    path = f'{folder}{user}/{date}/'
+    label_files = ['true_labels.csv', 'predicted_labels.csv']
+    versions = np.array([(os.stat(path + file_name).st_mtime_ns,
+                          os.stat(path + file_name).st_size)
+                         for file_name in label_files])
+
+    if cache:
+        try:
+            with np.load(path + CACHE_FILE) as cached:
+                if np.array_equal(cached['versions'], versions):
+                    return cached['counts']
+        except (OSError, KeyError, ValueError):
+            pass  # no valid cache
+
+    true_labels = read_file(path, label_files[0], ['int'])[0]
+    predicted_labels = read_file(path, label_files[1], ['int'])[0]
+    counts = count_matrix(true_labels, predicted_labels)
+
+    if cache:
+        np.savez(path + CACHE_FILE, counts=counts, versions=versions)
+    return counts
+
+
+def cohort_counts(users, dates, folder='user_files/', cache=True):
+    """ Sums the count matrices of multiple users/dates.
+
+    Args:
+        users (list of str): user names / numbers.
+        dates (list of str): dates of the validation sessions.
+        folder (str, optional): folder where all user files are located.
+        Defaults to 'user_files/'.
+        cache (bool, optional): Whether to use the cache files.
+        Defaults to True.
+
+    Returns:
+        array: counts, true level x predicted level.
+    """
+    counts = np.zeros((len(LEVELS), len(LEVELS)), dtype=np.int64)
+    for user, date in zip(users, dates):
+        counts += session_counts(user, date, folder, cache)
+    return counts
+
+
+def collapse_counts(counts):
+    """ Combines the levels into flexion, co-contraction, and extension.
+
+    Args:
+        counts (array): counts, true level x predicted level.
+
+    Returns:
+        array: counts, true group x predicted group.
+    """
+    groups = np.stack([LEVELS < 0, LEVELS == 0, LEVELS > 0], axis=1)
+    groups = groups.astype(np.int64)
+    return groups.T @ counts @ groups
+
+
+def normalise_counts(counts):
+    """ Divides each row by the number of times the true level was given.
+    Rows without any counts stay 0.
+
+    Args:
+        counts (array): count matrix.
+
+    Returns:
+        array: fraction of each row.
+    """
+    totals = counts.sum(axis=1, keepdims=True)
+    return np.divide(counts, totals, out=np.zeros(counts.shape),
+                     where=totals > 0)
+
+
+def accuracy(counts):
+    """ Calculates the strict and loose accuracy, see accuracy_from_counts.
+
+    Args:
+        counts (array): counts, true level x predicted level.
+
+    Returns:
+        float, float: strict and loose accuracy.
+    """
+    strict, loose = accuracy_from_counts(counts)
+    return float(strict), float(loose)
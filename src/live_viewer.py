@@ -0,0 +1,409 @@
+"""
+ * @author Myrthe Tilleman
+ * @email metill@utu.fi
+ * @create date 2026-10-19 20:27:36
+ * @desc Live viewer of the EMG data and feedback levels on the laptop, to
+ check the signal quality and calibration during a session. A reader process
+ reads the samples from a source, i.e. the UART frames of the Panda from a
+ serial port, a Toolbox csv file that is being recorded, or a replay of a
+ recording or synthetic data, and writes them to a ring buffer in shared
+ memory. The viewer shows the last seconds of the raw and normalised EMG,
+ the extension - flexion difference with the level bands, and the current
+ level, normalised like PreprocessEMG. The figure is updated with blitting.
+"""
+
+import struct
+import time
+from multiprocessing import Process, shared_memory
+
+import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.animation import FuncAnimation
+
+from preprocessing import PreprocessEMG
+from replay_uart import STARTING_BYTE
+
+
+class SharedRingBuffer():
+    def __init__(self, capacity=8192, channels=2, name=None):
+        """ Ring buffer of samples in shared memory, written by one process
+        and read by another. The buffer starts with the number of samples
+        written so far.
+
+        Args:
+            capacity (int, optional): number of samples in the buffer.
+            Defaults to 8192.
+            channels (int, optional): values per sample. Defaults to 2.
+            name (str, optional): name of the shared memory to attach to,
+            creates new shared memory when None. Defaults to None.
+        """
+        self.capacity = capacity
+        self.channels = channels
+        size = 8 + 8 * capacity * channels
+        self.owner = name is None
+        self.memory = shared_memory.SharedMemory(name, create=self.owner,
+                                                 size=size)
+        self.name = self.memory.name
+        self.count = np.ndarray((1,), np.int64, self.memory.buf)
+        self.data = np.ndarray((capacity, channels), np.float64,
+                               self.memory.buf, offset=8)
+        if self.owner:
+            self.count[0] = 0
+
+    def write(self, sample):
+        """ Adds a sample, overwriting the oldest sample when full.
+
+        Args:
+            sample (tuple): value per channel.
+        """
+        count = int(self.count[0])
+        self.data[count % self.capacity] = sample
+        self.count[0] = count + 1  # publish after the data is written
+
+    def latest(self, number):
+        """ Copies the newest samples.
+
+        Args:
+            number (int): maximum number of samples, at most capacity - 1,
+            since the writer may be filling the slot of the oldest sample.
+
+        Returns:
+            array: samples x channels, oldest first.
+            int: total number of samples written.
+        """
+        count = int(self.count[0])
+        number = min(number, count, self.capacity)
+        indices = np.arange(count - number, count) % self.capacity
+        samples = self.data[indices]
+        # the writer may be filling the slot of sample count[0] while copying
+        overwritten = int(self.count[0]) - self.capacity - \
+            (count - number) + 1
+        if overwritten > 0:  # the writer wrapped around while copying
+            samples = samples[overwritten:]
+        return samples, count
+
+    def close(self):
+        """ Detaches from the shared memory and removes it if it was created
+        here.
+        """
+        del self.count, self.data  # release the views of the memory
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+
+def serial_source(port, baud_rate=921600, array_length=14,
+                  start_num_bytes=8):
+    """ Reads the UART frames of the Panda from a serial port. Needs
+    pyserial.
+
+    Args:
+        port (str): serial port, e.g. 'COM3' or '/dev/ttyUSB0'.
+        baud_rate (int, optional): Defaults to 921600.
+        array_length (int, optional): number of bytes of a frame.
+        Defaults to 14.
+        start_num_bytes (int, optional): bytes before the EMG data.
+        Defaults to 8.
+
+    Yields:
+        tuple: (flex, extend) EMG values.
+    """
+    import serial  # only needed for this source
+
+    data = bytearray()
+    with serial.Serial(port, baud_rate, timeout=0.01) as connection:
+        while True:
+            data += connection.read(max(1, connection.in_waiting))
+            start = data.find(STARTING_BYTE)
+            while start >= 0 and len(data) - start >= array_length:
+                yield struct.unpack_from('hh', data, start + start_num_bytes)
+                del data[:start + array_length]
+                start = data.find(STARTING_BYTE)
+            if start < 0:  # keep the bytes of a partial starting byte
+                del data[:-len(STARTING_BYTE)]
+
+
+def toolbox_source(file_name, extend='BSMB_MUSCLE_EXTEND',
+                   flex='BSMB_MUSCLE_FLEX', comma=False):
+    """ Follows a Toolbox csv file while it is being recorded, see
+    extract_data for the format.
+
+    Args:
+        file_name (str): path of the csv file.
+        extend (str, optional): variable type of the extension data.
+        Defaults to 'BSMB_MUSCLE_EXTEND'.
+        flex (str, optional): variable type of the flexion data.
+        Defaults to 'BSMB_MUSCLE_FLEX'.
+        comma (bool, optional): Whether decimals are denoted after a comma.
+        Defaults to False.
+
+    Yields:
+        tuple: (flex, extend) EMG values, once both are recorded.
+    """
+    pending = {}
+    with open(file_name, 'r') as file:
+        header = file.readline().strip().split(';')
+        columns = [header.index(name) for name in [
+            'timestamp', 'variableType', 'numValue']]
+        line = ''
+        while True:
+            line += file.readline()
+            if not line.endswith('\n'):  # wait for the rest of the line
+                time.sleep(0.005)
+                continue
+            values = line.strip().split(';')
+            line = ''
+            timestamp, variable, value = [values[index] for index in columns]
+            if variable not in [extend, flex]:
+                continue
+            if comma:
+                value = value.replace(',', '.')
+            sample = pending.setdefault(timestamp, {})
+            sample[variable] = float(value)
+            if len(sample) == 2:
+                del pending[timestamp]
+                yield sample[flex], sample[extend]
+
+
+def replay_source(file_name=None, sampling_rate=100, duration=3600,
+                  flex='BSMB_MUSCLE_FLEX', extend='BSMB_MUSCLE_EXTEND'):
+    """ Replays a recording at the sampling rate, to stand in for the
+    hardware. Without a file, synthetic gait EMG is replayed.
+
+    Args:
+        file_name (str, optional): csv file with a column per muscle, e.g.
+        created with convert_txt.py. Defaults to None.
+        sampling_rate (int, optional): samples per second. Defaults to 100.
+        duration (int, optional): length (in seconds) of the synthetic data.
+        Defaults to 3600.
+        flex (str, optional): column with the flexion data.
+        Defaults to 'BSMB_MUSCLE_FLEX'.
+        extend (str, optional): column with the extension data.
+        Defaults to 'BSMB_MUSCLE_EXTEND'.
+
+    Yields:
+        tuple: (flex, extend) EMG values.
+    """
+    if file_name is None:
+        from synthetic_emg import emg_chunks, samples
+        data = samples(emg_chunks(duration=duration,
+                                  sampling_rate=sampling_rate))
+    else:
+        from replay_uart import ReplayUart
+        data = ReplayUart.from_csv(file_name, flex, extend).samples
+
+    start = time.perf_counter()
+    for index, sample in enumerate(data):
+        delay = start + index / sampling_rate - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        yield sample
+
+
+def read_samples(buffer_name, capacity, source, args=()):
+    """ Reader process: writes the samples of the source to the ring buffer.
+
+    Args:
+        buffer_name (str): name of the shared memory of the ring buffer.
+        capacity (int): capacity of the ring buffer.
+        source (function): module level generator function, e.g.
+        serial_source.
+        args (tuple, optional): arguments of the source. Defaults to ().
+    """
+    buffer = SharedRingBuffer(capacity, name=buffer_name)
+    try:
+        for sample in source(*args):
+            buffer.write(sample)
+    finally:
+        buffer.close()
+
+
+class LiveViewer():
+    def __init__(self, user, emg_folder, buffer, sampling_rate=100, window=5,
+                 folder='user_files/'):
+        """ Plots the newest samples of the ring buffer.
+
+        Args:
+            user (str): user name / number.
+            emg_folder (str): date of the emg calibration.
+            buffer (SharedRingBuffer): samples (flex, extend).
+            sampling_rate (int, optional): samples per second.
+            Defaults to 100.
+            window (int, optional): seconds shown. Defaults to 5.
+            folder (str, optional): folder where all user files are located.
+            Defaults to 'user_files/'.
+        """
+        self.buffer = buffer
+        self.sampling_rate = sampling_rate
+        self.window_size = window * sampling_rate
+        self.process_EMG = PreprocessEMG(user, emg_folder, folder,
+                                         extend=1, flex=0)
+        process_EMG = self.process_EMG
+        self.rest = np.array([process_EMG.rest[0], process_EMG.rest[1]])
+        self.normal_mvc = np.array([process_EMG.normal_mvc[0],
+                                    process_EMG.normal_mvc[1]])
+        self.thresholds = np.array(process_EMG.thresholds)
+        bounds = [-1] + list(process_EMG.thresholds) + [1]
+        self.level_middle = np.convolve(bounds, [0.5, 0.5], 'valid')
+
+        self.fig, (self.ax_raw, self.ax_normal, self.ax_level) = \
+            plt.subplots(3, 1, sharex=True, figsize=(12, 8))
+        self.create_axes(window, bounds)
+
+    def create_axes(self, window, bounds):
+        """ Creates the static parts of the figure and the animated lines.
+
+        Args:
+            window (int): seconds shown.
+            bounds (list): boundaries of the levels, from -1 to 1.
+        """
+        process_EMG = self.process_EMG
+        x = np.zeros(0)
+        self.raw_lines = [
+            self.ax_raw.plot(x, x, label=label, animated=True)[0]
+            for label in ['Extension muscle', 'Flexion muscle']]
+        self.ax_raw.set_ylim(process_EMG.lower_bound - 10,
+                             process_EMG.upper_bound + 10)
+        self.ax_raw.set_ylabel('Raw EMG data (V)')
+
+        self.ax_normal.axhspan(-process_EMG.activation_threshold,
+                               process_EMG.activation_threshold,
+                               facecolor='grey', alpha=0.5)
+        self.normal_lines = [
+            self.ax_normal.plot(x, x, label=label, animated=True)[0]
+            for label in ['Extension muscle', 'Flexion muscle']]
+        self.ax_normal.set_ylim(-0.2, 1.5)
+        self.ax_normal.set_ylabel('Normalised EMG data')
+
+        for low, high, middle in zip(bounds[:-1], bounds[1:],
+                                     self.level_middle):
+            color = 'orange' if middle < 0 else 'blue' if middle > 0 \
+                else 'grey'
+            self.ax_level.axhspan(low, high, facecolor=color, alpha=0.2)
+        self.difference_line, = self.ax_level.plot(
+            x, x, label='Extension - Flexion', animated=True)
+        self.level_line, = self.ax_level.plot(
+            x, x, label='Feedback level', animated=True)
+        self.ax_level.set_ylim(-1, 1)
+        self.ax_level.set_yticks(bounds)
+        self.ax_level.set_ylabel('Normalised extension - flexion')
+        self.ax_level.set_xlabel('Time (s)')
+        self.ax_level.set_xlim(-window, 0)
+        self.status = self.ax_raw.text(
+            0.01, 0.95, '', transform=self.ax_raw.transAxes, va='top',
+            animated=True)
+
+        for ax in [self.ax_raw, self.ax_normal, self.ax_level]:
+            ax.legend(loc='upper right')
+            ax.grid()
+
+    def process(self, samples):
+        """ Normalises the samples and defines the levels like
+        PreprocessEMG, for all samples at once.
+
+        Args:
+            samples (array): samples x (flex, extend).
+
+        Returns:
+            array: normalised samples x (flex, extend).
+            array: extension - flexion difference.
+            array: level per sample, nan when the feedback is not active.
+        """
+        process_EMG = self.process_EMG
+        emg = np.clip(samples, process_EMG.lower_bound,
+                      process_EMG.upper_bound)
+        normal = (emg - self.rest) / self.normal_mvc
+        difference = normal[:, 1] - normal[:, 0]
+
+        level = np.digitize(difference, self.thresholds) - 4.0
+        level[difference <= self.thresholds[0]] = -4
+        active = (normal > process_EMG.activation_threshold).any(axis=1)
+        level[~active] = np.nan
+        return normal, difference, level
+
+    def update(self, frame=None):
+        """ Draws the newest samples, called by FuncAnimation.
+
+        Args:
+            frame (int, optional): number of the frame. Defaults to None.
+
+        Returns:
+            list: the artists that changed.
+        """
+        samples, count = self.buffer.latest(self.window_size)
+        x = (np.arange(len(samples)) - len(samples) + 1) / self.sampling_rate
+        normal, difference, level = self.process(samples)
+        level_trace = np.full(len(level), np.nan)
+        active = ~np.isnan(level)
+        level_trace[active] = self.level_middle[
+            level[active].astype(int) + 4]
+
+        for column, raw_line, normal_line in zip(
+                [1, 0], self.raw_lines, self.normal_lines):
+            raw_line.set_data(x, samples[:, column])
+            normal_line.set_data(x, normal[:, column])
+        self.difference_line.set_data(x, difference)
+        self.level_line.set_data(x, level_trace)
+
+        if len(samples):
+            current = 'off' if np.isnan(level[-1]) else int(level[-1])
+            saturated = np.mean(samples >= self.process_EMG.upper_bound,
+                                axis=0) * 100
+            self.status.set_text(
+                f'Level: {current}   samples: {count}   saturated: '
+                f'extension {saturated[1]:.0f}%, flexion {saturated[0]:.0f}%')
+        return self.raw_lines + self.normal_lines + [
+            self.difference_line, self.level_line, self.status]
+
+    def show(self, interval=20):
+        """ Updates the figure every interval until it is closed.
+
+        Args:
+            interval (int, optional): time (in ms) between updates.
+            Defaults to 20.
+        """
+        self.animation = FuncAnimation(
+            self.fig, self.update, interval=interval, blit=True,
+            cache_frame_data=False)
+        plt.show()
+
+
+def run_viewer(user, emg_folder, source, args=(), sampling_rate=100,
+               window=5, capacity=8192):
+    """ Starts the reader process and shows the viewer until the figure is
+    closed.
+
+    Args:
+        user (str): user name / number.
+        emg_folder (str): date of the emg calibration.
+        source (function): serial_source, toolbox_source, or replay_source.
+        args (tuple, optional): arguments of the source. Defaults to ().
+        sampling_rate (int, optional): samples per second. Defaults to 100.
+        window (int, optional): seconds shown. Defaults to 5.
+        capacity (int, optional): samples in the ring buffer, more than
+        window * sampling_rate. Defaults to 8192.
+    """
+    buffer = SharedRingBuffer(capacity)
+    reader = Process(target=read_samples,
+                     args=(buffer.name, capacity, source, args), daemon=True)
+    reader.start()
+    try:
+        LiveViewer(user, emg_folder, buffer, sampling_rate, window).show()
+    finally:
+        reader.terminate()
+        reader.join()
+        buffer.close()
+
+
+if __name__ == '__main__':
+    user = 'U401'
+    emg_calibration = '2023_03_17'
+    source = 'replay'  # 'serial', 'toolbox', or 'replay'
+
+    if source == 'serial':
+        run_viewer(user, emg_calibration, serial_source, ('COM3',))
+    elif source == 'toolbox':
+        run_viewer(user, emg_calibration, toolbox_source,
+                   (f'user_files/{user}/{emg_calibration}/recording.csv',))
+    else:  # synthetic data, or a csv file as argument
+        run_viewer(user, emg_calibration, replay_source)
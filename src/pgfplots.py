@@ -0,0 +1,387 @@
+"""
+ * @author Myrthe Tilleman
+ * @email metill@utu.fi
+ * @create date 2026-10-19 19:51:08
+ * @desc Saves matplotlib figures as pgfplots code, with the data of each
+ series in an external table next to the .tex file instead of inline
+ coordinates. Series of a few points, e.g. brackets, are kept inline.
+ Supports the elements of our figures: lines, bars with error
+ bars, horizontal lines, spans and other filled patches, and text. Only the
+ direct elements of each axes are read, the artist tree is not traversed.
+ The tables are written directly from the NumPy arrays of the artists.
+ The .tex file needs \\usepackage{pgfplots} and \\pgfplotsset{compat=1.7} or
+ newer, so bar widths are in axis units.
+"""
+
+import os
+from itertools import count
+
+import numpy as np
+from matplotlib.collections import LineCollection
+from matplotlib.colors import to_rgba
+from matplotlib.container import BarContainer, ErrorbarContainer
+from matplotlib.ticker import ScalarFormatter
+
+ANCHORS = {'left': 'west', 'center': '', 'right': 'east',
+           'top': 'north', 'bottom': 'south', 'baseline': 'base',
+           'center_baseline': 'base'}
+DASHES = {'-': '', 'solid': '', '--': 'dashed', 'dashed': 'dashed',
+          ':': 'dotted', 'dotted': 'dotted', '-.': 'dashdotted',
+          'dashdot': 'dashdotted'}
+
+
+def color_option(color, key='color'):
+    """ Converts a matplotlib color into a pgf option.
+
+    Args:
+        color: any matplotlib color.
+        key (str, optional): option to set, e.g. 'fill'. Defaults to 'color'.
+
+    Returns:
+        list: the color option, and the opacity option when transparent.
+    """
+    red, green, blue, alpha = to_rgba(color)
+    options = [f'{key}={{rgb,1:red,{red:.3f};green,{green:.3f};'
+               f'blue,{blue:.3f}}}']
+    if alpha < 1:
+        opacity = 'opacity' if key == 'color' else f'{key} opacity'
+        options.append(f'{opacity}={alpha:.3f}')
+    return options
+
+
+def escape(text):
+    """ Escapes the characters that have a meaning in LaTeX.
+
+    Args:
+        text (str): text of a label, title, or node.
+
+    Returns:
+        str: escaped text.
+    """
+    for character in '&%#_':
+        text = text.replace(character, '\\' + character)
+    return text
+
+
+def is_label(label):
+    """ Checks whether a label should be in the legend, like matplotlib.
+
+    Args:
+        label (str): label of an artist.
+
+    Returns:
+        bool: True for labels that do not start with an underscore.
+    """
+    return bool(label) and not label.startswith('_')
+
+
+class PgfAxis():
+    def __init__(self, ax, file_name, table_folder, tables, inline_points):
+        """ Writes the pgfplots code of one axes.
+
+        Args:
+            ax (Axes): matplotlib axes.
+            file_name (str): path of the .tex file, the tables are saved
+            next to it.
+            table_folder (str): folder of the tables as seen from LaTeX.
+            tables (count): numbers of the tables of the figure.
+            inline_points (int): series with at most this number of points
+            are saved in the .tex file.
+        """
+        self.ax = ax
+        self.base = os.path.splitext(file_name)[0]
+        self.table_folder = table_folder
+        self.tables = tables
+        self.inline_points = inline_points
+        self.legend = ax.get_legend() is not None
+
+    def write_table(self, columns, data):
+        """ Saves a table of one series, or creates an inline table for a
+        few points. Spaces in the file name are replaced for LaTeX.
+
+        Args:
+            columns (list): column names.
+            data (array): data with a column per name.
+
+        Returns:
+            str: path of the table for LaTeX, or the inline table.
+        """
+        if len(data) <= self.inline_points:
+            rows = [' '.join(columns)] + [' '.join(f'{value:.6g}'
+                                                   for value in row)
+                                          for row in data]
+            return '\\\\ '.join(rows) + '\\\\'
+        name = f'{self.base}_{next(self.tables)}.dat'.replace(' ', '_')
+        np.savetxt(name, data, fmt='%.6g', header=' '.join(columns),
+                   comments='')
+        return self.table_folder + os.path.basename(name)
+
+    def add_plot(self, options, columns, data, label, keys=('x', 'y')):
+        """ Creates the code of a series with a table.
+
+        Args:
+            options (list): pgfplots options of the series.
+            columns (list): column names, without spaces.
+            data (array): data with a column per name.
+            label (str): legend entry of the series.
+            keys (tuple, optional): table key of each column.
+            Defaults to ('x', 'y').
+
+        Returns:
+            str: the code.
+        """
+        table = self.write_table(columns, data)
+        keys = [f'{key}={column}' for key, column in zip(keys, columns)]
+        if len(data) <= self.inline_points:
+            keys.append('row sep=\\\\')
+        if not (self.legend and is_label(label)):
+            options = ['forget plot'] + options
+        code = f'\\addplot [{", ".join(options)}] table ' \
+            f'[{", ".join(keys)}] {{{table}}};\n'
+        if self.legend and is_label(label):
+            code += f'\\addlegendentry{{{escape(label)}}}\n'
+        return code
+
+    def line_options(self, color, linestyle, linewidth):
+        """ Options of a line.
+
+        Args:
+            color: matplotlib color of the line.
+            linestyle (str or tuple): matplotlib line style.
+            linewidth (float): width in points.
+
+        Returns:
+            list: pgfplots options.
+        """
+        options = color_option(color)
+        if isinstance(linestyle, tuple):  # dash pattern of a collection
+            linestyle = '-' if linestyle[1] is None else '--'
+        dash = DASHES.get(linestyle, '')
+        return options + ([dash] if dash else []) + [
+            f'line width={linewidth:.2f}pt']
+
+    def line(self, line):
+        """ Code of a line, e.g. from plot.
+
+        Args:
+            line (Line2D): line of the axes.
+
+        Returns:
+            str: the code.
+        """
+        options = self.line_options(line.get_color(), line.get_linestyle(),
+                                    line.get_linewidth())
+        if line.get_linestyle() in ['None', 'none', '', ' ']:
+            options = color_option(line.get_color()) + ['only marks']
+        elif line.get_marker() in ['None', 'none', '', ' ', None]:
+            options.append('no markers')
+        return self.add_plot(options, ['x', 'y'], line.get_xydata(),
+                             line.get_label())
+
+    def line_collection(self, collection):
+        """ Code of a LineCollection, e.g. from hlines. The segments are
+        separated by a row of nan.
+
+        Args:
+            collection (LineCollection): collection of the axes.
+
+        Returns:
+            str: the code.
+        """
+        segments = collection.get_segments()
+        data = np.full((3 * len(segments), 2), np.nan)
+        for index, segment in enumerate(segments):
+            data[3 * index:3 * index + 2] = segment[[0, -1]]
+        options = self.line_options(
+            collection.get_color()[0], collection.get_linestyle()[0],
+            collection.get_linewidth()[0])
+        return self.add_plot(options + ['no markers'], ['x', 'y'], data[:-1],
+                             collection.get_label())
+
+    def bars(self, container):
+        """ Code of the bars of one series, with the error bars if present.
+
+        Args:
+            container (BarContainer): bars of the axes, e.g. from plot.bar.
+
+        Returns:
+            str: the code.
+        """
+        rectangles = container.patches
+        x = np.array([rectangle.get_x() + rectangle.get_width() / 2
+                      for rectangle in rectangles])
+        bottom = np.array([rectangle.get_y() for rectangle in rectangles])
+        height = np.array([rectangle.get_height() for rectangle in rectangles])
+        columns = ['x', 'y']
+        keys = ['x', 'y']
+        data = [x, bottom + height]
+        options = ['ybar', f'bar width={rectangles[0].get_width():.6g}',
+                   'bar shift=0', 'draw=none'] + color_option(
+            rectangles[0].get_facecolor(), 'fill')
+
+        errorbar = container.errorbar
+        if errorbar is not None and errorbar.lines[2]:
+            segments = errorbar.lines[2][0].get_segments()
+            lower = np.array([segment[:, 1].min() for segment in segments])
+            upper = np.array([segment[:, 1].max() for segment in segments])
+            columns += ['plus', 'minus']
+            keys += ['y error plus', 'y error minus']
+            data += [upper - data[1], data[1] - lower]
+            options += ['error bars/.cd', 'y dir=both', 'y explicit']
+        return self.add_plot(options, columns, np.column_stack(data),
+                             container.get_label(), keys)
+
+    def patch(self, patch):
+        """ Code of a filled patch in data coordinates, e.g. from axhspan.
+
+        Args:
+            patch (Patch): patch of the axes.
+
+        Returns:
+            str: the code.
+        """
+        vertices = self.ax.transData.inverted().transform(patch.get_verts())
+        path = ' -- '.join(f'(axis cs:{x:.6g},{y:.6g})'
+                           for x, y in vertices[:-1])
+        options = color_option(patch.get_facecolor(), 'fill')
+        return f'\\fill [{", ".join(options)}] {path} -- cycle;\n'
+
+    def text(self, text):
+        """ Code of a text node, in data or axes coordinates.
+
+        Args:
+            text (Text): text of the axes.
+
+        Returns:
+            str: the code.
+        """
+        if text.get_transform() is self.ax.transAxes:
+            coordinates = 'rel axis cs'
+        else:
+            coordinates = 'axis cs'
+        x, y = text.get_position()
+        anchor = ' '.join(filter(None, [
+            ANCHORS.get(text.get_verticalalignment(), ''),
+            ANCHORS.get(text.get_horizontalalignment(), '')])) or 'center'
+        options = [f'anchor={anchor}'] + color_option(text.get_color(),
+                                                      'text')
+        return f'\\node [{", ".join(options)}] at ({coordinates}:{x:.6g},' \
+            f'{y:.6g}) {{{escape(text.get_text())}}};\n'
+
+    def axis_options(self):
+        """ Options of the axis: position, size, limits, ticks, labels,
+        grid and legend. The axis is placed where matplotlib placed it in the
+        figure, so the axes of subplots do not overlap.
+
+        Returns:
+            list: pgfplots options.
+        """
+        ax = self.ax
+        size = ax.figure.get_size_inches()
+        x, y = ax.get_position().p0 * size
+        width, height = ax.get_position().size * size
+        xmin, xmax = ax.get_xlim()
+        ymin, ymax = ax.get_ylim()
+        options = [f'at={{({x:.2f}in,{y:.2f}in)}}', 'anchor=south west',
+                   f'width={width:.2f}in', f'height={height:.2f}in',
+                   'scale only axis', f'xmin={xmin:.6g}', f'xmax={xmax:.6g}',
+                   f'ymin={ymin:.6g}', f'ymax={ymax:.6g}',
+                   'unbounded coords=jump', 'tick align=outside']
+
+        for axis, low, high in [('x', xmin, xmax), ('y', ymin, ymax)]:
+            ticks = getattr(ax, f'get_{axis}ticks')()
+            labels = getattr(ax, f'get_{axis}ticklabels')()
+            inside = [index for index, tick in enumerate(ticks)
+                      if min(low, high) <= tick <= max(low, high)]
+            options.append(f'{axis}tick={{' + ','.join(
+                f'{ticks[index]:.6g}' for index in inside) + '}')
+            formatter = getattr(ax, f'{axis}axis').get_major_formatter()
+            if not isinstance(formatter, ScalarFormatter):  # e.g. set labels
+                options.append(f'{axis}ticklabels={{' + ','.join(
+                    '{' + escape(labels[index].get_text()) + '}'
+                    for index in inside) + '}')
+            if labels and labels[0].get_rotation():
+                options.append(f'{axis}ticklabel style={{rotate='
+                               f'{labels[0].get_rotation():.0f}, '
+                               f'anchor=north east}}')
+            label = getattr(ax, f'get_{axis}label')()
+            if label:
+                options.append(f'{axis}label={{{escape(label)}}}')
+            gridlines = getattr(ax, f'get_{axis}gridlines')()
+            if any(line.get_visible() for line in gridlines):
+                options.append(f'{axis}majorgrids')
+
+        if ax.get_title():
+            options.append(f'title={{{escape(ax.get_title())}}}')
+        legend = ax.get_legend()
+        if legend is not None:  # place the legend where matplotlib drew it
+            box = legend.get_window_extent()
+            x, y = ax.transAxes.inverted().transform(box.p0)
+            columns = getattr(legend, '_ncols', getattr(legend, '_ncol', 1))
+            options.append(f'legend style={{at={{({x:.3f},{y:.3f})}}, '
+                           f'anchor=south west, legend columns={columns}}}')
+        return options
+
+    def code(self):
+        """ Creates the axis environment with all elements in the order
+        matplotlib draws them.
+
+        Returns:
+            str: the code.
+        """
+        ax = self.ax
+        elements = []
+        bar_patches = set()
+        errorbar_collections = set()
+        for container in ax.containers:
+            if isinstance(container, BarContainer):
+                elements.append((container.patches[0].get_zorder(),
+                                 self.bars, container))
+                bar_patches.update(container.patches)
+                if container.errorbar is not None:
+                    errorbar_collections.update(container.errorbar.lines[2])
+            elif isinstance(container, ErrorbarContainer):
+                errorbar_collections.update(container.lines[2])
+
+        elements += [(line.get_zorder(), self.line, line)
+                     for line in ax.lines if line.get_visible()]
+        elements += [(collection.get_zorder(), self.line_collection,
+                      collection) for collection in ax.collections
+                     if isinstance(collection, LineCollection) and
+                     collection not in errorbar_collections and
+                     collection.get_visible()]
+        elements += [(patch.get_zorder(), self.patch, patch)
+                     for patch in ax.patches
+                     if patch not in bar_patches and patch.get_visible()]
+        elements += [(text.get_zorder(), self.text, text)
+                     for text in ax.texts if text.get_visible()]
+        elements.sort(key=lambda element: element[0])  # stable
+
+        code = '\\begin{axis}[\n' + ',\n'.join(self.axis_options()) + '\n]\n'
+        code += ''.join(write(artist) for _, write, artist in elements)
+        return code + '\\end{axis}\n'
+
+
+def save(file_name, figure, table_folder='', inline_points=10):
+    """ Saves a figure as pgfplots code with external tables, instead of
+    tikzplotlib.save.
+
+    Args:
+        file_name (str): path of the .tex file. The tables are saved in the
+        same folder, named after the file.
+        figure (Figure): matplotlib figure with one or more axes.
+        table_folder (str, optional): folder of the tables as seen from
+        LaTeX, e.g. 'figures/'. Defaults to '', the tables are referred to by
+        their file name, as in the folder of the .tex file.
+        inline_points (int, optional): series with at most this number of
+        points are saved in the .tex file instead of a table. Defaults to 10.
+    """
+    figure.draw_without_rendering()  # positions of legends and ticks
+    tables = count()
+    code = '\\begin{tikzpicture}\n'
+    for ax in figure.axes:
+        code += PgfAxis(ax, file_name, table_folder, tables,
+                        inline_points).code()
+    code += '\\end{tikzpicture}\n'
+    with open(file_name, 'w') as file:
+        file.write(code)
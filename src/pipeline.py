@@ -0,0 +1,368 @@
+"""
+ * @author Myrthe Tilleman
+ * @email metill@utu.fi
+ * @create date 2026-10-19 16:12:40
+ * @desc Incremental build of the analysis chain: EMG calibration, log
+ conversion, replay, confusion matrices, ASI, and subjective measures. Each
+ result is a target with declared input files and code modules. A target is
+ only rebuilt when an output is missing or when its inputs, code, or
+ arguments changed since the last build. Targets that do not depend on each
+ other are built in parallel. The state of the last build is saved in
+ /user_files/results/pipeline_state.json.
+"""
+
+import ast
+import glob
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from fnmatch import fnmatch
+from functools import lru_cache
+
+import matplotlib
+
+matplotlib.use('Agg')  # never open a window in the workers
+
+from batch_calibration import calibrate_session
+from convert_txt import convert_log
+from render_figures import (render_asi, render_confusion_matrix,
+                            render_replay, render_subjective_measures)
+
+SOURCE_FOLDER = os.path.dirname(os.path.abspath(__file__))
+STATE_FILE = 'user_files/results/pipeline_state.json'
+
+
+@lru_cache(maxsize=None)
+def module_files(module):
+    """ Finds the file of a module in the source folder and the files of all
+    modules from the source folder that it imports, directly or indirectly.
+
+    Args:
+        module (str): name of the module, e.g. 'plot_results'.
+
+    Returns:
+        tuple: paths of the module files.
+    """
+    files = {module: os.path.join(SOURCE_FOLDER, f'{module}.py')}
+    to_check = [module]
+    while to_check:
+        with open(files[to_check.pop()], 'r') as file:
+            tree = ast.parse(file.read())
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.level == 0:
+                names = [node.module]
+            else:
+                continue
+            for name in names:
+                path = os.path.join(SOURCE_FOLDER, f'{name}.py')
+                if name not in files and os.path.isfile(path):
+                    files[name] = path
+                    to_check.append(name)
+    return tuple(sorted(files.values()))
+
+
+class Target():
+    def __init__(self, name, function, args=(), inputs=(), outputs=(),
+                 modules=()):
+        """ A result of the analysis.
+
+        Args:
+            name (str): unique name of the target.
+            function (function): module level function that builds the
+            target, so it can run in a worker process.
+            args (tuple, optional): arguments of the function.
+            Defaults to ().
+            inputs (list, optional): paths or glob patterns of the files the
+            target is built from. Defaults to ().
+            outputs (list, optional): paths or glob patterns of the files the
+            target creates. Defaults to ().
+            modules (list, optional): modules of the source folder the target
+            is built with, their imports are included. Defaults to ().
+        """
+        self.name = name
+        self.function = function
+        self.args = tuple(args)
+        self.inputs = [os.path.normpath(path) for path in inputs]
+        self.outputs = [os.path.normpath(path) for path in outputs]
+        self.modules = list(modules)
+
+    def depends_on(self, other):
+        """ Checks whether an input of this target is an output of the other
+        target.
+
+        Args:
+            other (Target): other target.
+
+        Returns:
+            bool: True if this target has to be built after the other target.
+        """
+        return any(fnmatch(input, output) or fnmatch(output, input)
+                   for input in self.inputs for output in other.outputs)
+
+    def outputs_exist(self):
+        """ Checks whether every output exists.
+
+        Returns:
+            bool: True if all outputs match at least one file.
+        """
+        return all(glob.glob(output) for output in self.outputs)
+
+    def signature(self):
+        """ Describes the current inputs, code, and arguments of the target.
+        Files are described by their modification time and size, missing
+        files by None.
+
+        Returns:
+            dict: description that can be saved as json.
+        """
+        paths = set()
+        for pattern in self.inputs:
+            if glob.has_magic(pattern):
+                paths.update(glob.glob(pattern))
+            else:
+                paths.add(pattern)
+        for module in self.modules:
+            paths.update(os.path.relpath(path)
+                         for path in module_files(module))
+
+        signature = {'args': repr(self.args)}
+        for path in sorted(paths):
+            if os.path.isfile(path):
+                status = os.stat(path)
+                signature[path] = [status.st_mtime_ns, status.st_size]
+            else:
+                signature[path] = None
+        return signature
+
+
+def calibration(user, date, sampling_rate=100):
+    """ Calculates the rest activity and MVC of one session, see
+    calibrate_session.
+
+    Args:
+        user (str): user name / number.
+        date (str): date of the calibration.
+        sampling_rate (int, optional): sampling rate of the recordings.
+        Defaults to 100.
+
+    Raises:
+        RuntimeError: if the calibration failed.
+    """
+    summary = calibrate_session(user, date, sampling_rate)
+    if summary['Error']:
+        raise RuntimeError(summary['Error'])
+
+
+def analysis_targets(calibrations=(), logs=(), recordings=(),
+                     validation_users=(), validation_dates=(),
+                     gait_sessions=(), subjective_users=(),
+                     sampling_rate=100, folder='user_files/'):
+    """ Creates the targets of the analysis chain.
+
+    Args:
+        calibrations (list, optional): (user, date) of the EMG calibrations.
+        logs (list, optional): (user, date, file name without extension) of
+        the txt files of run.py to convert.
+        recordings (list, optional): (user, emg folder, data folder, data
+        file, from log, max points) of the recordings to replay.
+        validation_users (list, optional): users of the confusion matrices.
+        validation_dates (list, optional): dates of the confusion matrices.
+        gait_sessions (list, optional): (user, date, prosthetic side) of the
+        treadmill sessions.
+        subjective_users (list, optional): users of the subjective measures.
+        sampling_rate (int, optional): sampling rate of the EMG calibration
+        recordings. Defaults to 100.
+        folder (str, optional): folder where all user files are located.
+        Defaults to 'user_files/'.
+
+    Returns:
+        list: Target instances.
+    """
+    results = f'{folder}results/'
+    targets = []
+
+    for user, date in calibrations:
+        path = f'{folder}{user}/{date}/'
+        targets.append(Target(
+            f'calibration {user} {date}', calibration,
+            (user, date, sampling_rate),
+            inputs=[path + file_name for file_name in [
+                'rest.csv', 'flex.csv', 'extend.csv', 'rest.emg', 'flex.emg',
+                'extend.emg', 'mvc_positions_*.csv']],
+            outputs=[path + 'rest_activity.csv', path + 'mvc.csv'],
+            modules=['batch_calibration']))
+
+    for user, date, file_name in logs:
+        path = f'{folder}{user}/{date}/'
+        targets.append(Target(
+            f'conversion {user} {date} {file_name}', convert_log,
+            (user, date, file_name), inputs=[f'{path}{file_name}.txt'],
+            outputs=[f'{path}{file_name}.csv'], modules=['convert_txt']))
+
+    for recording in recordings:
+        user, emg_folder, data_folder, data_file = recording[:4]
+        emg_path = f'{folder}{user}/{emg_folder}/'
+        name = data_file.split('.')[0]
+        targets.append(Target(
+            f'replay {user} {data_folder} {data_file}', render_replay,
+            recording,
+            inputs=[f'{folder}{user}/{data_folder}/{data_file}',
+                    f'{folder}{user}/{data_folder}/'
+                    f'{os.path.splitext(data_file)[0]}.emg',
+                    emg_path + 'rest_activity.csv', emg_path + 'mvc.csv'],
+            outputs=[f'{results}{name}_{figure}.tex' for figure in [
+                'raw', 'normal', 'difference_level']],
+            modules=['render_figures', 'postprocessing']))
+
+    if validation_users:
+        targets.append(Target(
+            'confusion matrices', render_confusion_matrix,
+            (list(validation_users), list(validation_dates)),
+            inputs=[f'{folder}{user}/{date}/{file_name}'
+                    for user, date in zip(validation_users, validation_dates)
+                    for file_name in ['true_labels.csv',
+                                      'predicted_labels.csv']],
+            outputs=[f'{results}Confusion_matrix_{title}_'
+                     f'{len(validation_users)}_user_*.pdf'
+                     for title in ['all levels', 'combined levels']],
+            modules=['plot_results']))
+
+    for user, date, prosthetic_side in gait_sessions:
+        targets.append(Target(
+            f'ASI {user} {date}', render_asi, (user, date, prosthetic_side),
+            inputs=[f'{folder}{user}/{date}/treadmill_data/*/parameters.csv',
+                    'src/Treadmill parameters names.csv'],
+            outputs=[f'{results}{user}_{date}_ASI.tex'],
+            modules=['plot_symmetry']))
+
+    if subjective_users:
+        targets.append(Target(
+            'subjective measures', render_subjective_measures,
+            (list(subjective_users),),
+            inputs=[f'{folder}{user}/{user}_{questionnaire}.xlsx'
+                    for user in subjective_users
+                    for questionnaire in ['Confidence', 'NASA_TLX',
+                                          'PEmbS-LLA']],
+            outputs=[f'{results}Subjective_measures_statistics.csv'],
+            modules=['plot_subjective_measures']))
+    return targets
+
+
+def load_state(state_file=STATE_FILE):
+    """ Loads the signatures of the last build.
+
+    Args:
+        state_file (str, optional): json file with the state.
+        Defaults to STATE_FILE.
+
+    Returns:
+        dict: signature per target name, empty without a valid file.
+    """
+    try:
+        with open(state_file, 'r') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(state, state_file=STATE_FILE):
+    """ Saves the signatures of the built targets.
+
+    Args:
+        state (dict): signature per target name.
+        state_file (str, optional): json file with the state.
+        Defaults to STATE_FILE.
+    """
+    with open(state_file, 'w') as file:
+        json.dump(state, file, indent=1, sort_keys=True)
+
+
+def build(targets, processes=None, force=False, state_file=STATE_FILE):
+    """ Builds the targets that are out of date. A target is started as soon
+    as the targets it depends on are finished. When a target fails, the
+    targets that depend on it are not built.
+
+    Args:
+        targets (list): Target instances, see analysis_targets.
+        processes (int, optional): number of worker processes. Defaults to the
+        number of cores.
+        force (bool, optional): Builds all targets. Defaults to False.
+        state_file (str, optional): json file with the state of the last
+        build. Defaults to STATE_FILE.
+
+    Returns:
+        dict: 'built', 'up to date', 'skipped', or the error per target.
+    """
+    by_name = {target.name: target for target in targets}
+    dependencies = {target.name: [other.name for other in targets
+                                  if other is not target and
+                                  target.depends_on(other)]
+                    for target in targets}
+    state = load_state(state_file)
+    status = {}
+    pending = list(by_name)
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        running = {}
+        while pending or running:
+            progress = True
+            while progress:  # until every ready target is handled
+                progress = False
+                for name in list(pending):
+                    upstream = [status.get(other)
+                                for other in dependencies[name]]
+                    if any(value not in [None, 'built', 'up to date']
+                           for value in upstream):
+                        status[name] = 'skipped'  # a dependency failed
+                    elif None in upstream:
+                        continue  # a dependency is not finished
+                    elif (not force and by_name[name].outputs_exist() and
+                          state.get(name) == by_name[name].signature()):
+                        status[name] = 'up to date'
+                    else:
+                        target = by_name[name]
+                        running[executor.submit(
+                            target.function, *target.args)] = name
+                        status[name] = None
+                    pending.remove(name)
+                    progress = True
+
+            if not running:
+                for name in pending:  # circular dependencies
+                    status[name] = 'skipped'
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                error = future.exception()
+                if error is None:
+                    status[name] = 'built'
+                    state[name] = by_name[name].signature()
+                    save_state(state, state_file)
+                else:
+                    status[name] = repr(error)
+    return status
+
+
+if __name__ == '__main__':
+    calibrations = [('U401', '2023_03_17')]
+    logs = []  # (user, date, file name of run.py output without .txt)
+    recordings = [('U401', '2023_03_17', '2023_03_17', 'plantar_flexion.csv',
+                   False, 2000)]
+
+    validation_users = ['U401', 'U412', 'U747']
+    validation_dates = ['2023_04_25', '2023_04_26', '2023_05_03']
+
+    gait_sessions = [('U401', '2023_04_25', 'R'), ('U412', '2023_04_26', 'L'),
+                     ('U412', '2023_04_27', 'L'), ('U412', '2023_04_28', 'L'),
+                     ('U747', '2023_05_03', 'R')]
+    force = False  # rebuild everything
+
+    targets = analysis_targets(calibrations, logs, recordings,
+                               validation_users, validation_dates,
+                               gait_sessions, validation_users)
+    for name, result in build(targets, force=force).items():
+        print(name, result)
@@ -7,15 +7,61 @@
  block, and activity. Saves the results under /user_files/results/.
 """
 
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
 from math import factorial
 
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-import tikzplotlib
 from scipy.stats import friedmanchisquare, wilcoxon
 
-from utils import tikzplotlib_fix_ncols
+import pgfplots
+from profiling import stage
+
+INDEX = ['Activity', 'Session', 'Block']
+RESULT_COLUMNS = ['User', 'Activity', 'Comparison', 'Test', 'Session', 'Block',
+                  'Condition_1', 'Condition_2', 'all_statistic', 'all_p',
+                  'NASA_statistic', 'NASA_p', 'pembs_statistic', 'pembs_p']
+
+
+@stage
+def read_workbook(path, file_name, sheet_name=0, cache=True):
+    """ Reads a sheet of an excel file. The sheet is saved in a pickle file
+    next to the excel file and only parsed again when the excel file changed.
+    The pickle file is replaced at once, so parallel jobs never read a
+    partly written cache.
+
+    Args:
+        path (str): folder of the file.
+        file_name (str): name of the excel file.
+        sheet_name (int or str, optional): sheet to read. Defaults to 0.
+        cache (bool, optional): Whether to use and update the cache file.
+        Defaults to True.
+
+    Returns:
+        DataFrame: the sheet as it is in the excel file.
+    """
+    status = os.stat(path + file_name)
+    version = (status.st_mtime_ns, status.st_size)
+    cache_file = f'{path}{os.path.splitext(file_name)[0]}_{sheet_name}.pkl'
+
+    if cache:
+        try:
+            cached_version, data = pd.read_pickle(cache_file)
+            if cached_version == version:
+                return data
+        except (OSError, EOFError, ValueError, TypeError, AttributeError,
+                ImportError, pickle.UnpicklingError):
+            pass  # no valid cache, e.g. written by another pandas version
+
+    data = pd.read_excel(path + file_name, sheet_name=sheet_name)
+    if cache:
+        temporary_file = f'{cache_file}.{os.getpid()}.tmp'
+        pd.to_pickle((version, data), temporary_file, compression=None)
+        os.replace(temporary_file, cache_file)
+    return data
 
 
 class AnalyseSubjectiveMeasures():
@@ -30,6 +76,10 @@ class AnalyseSubjectiveMeasures():
         self.max_sessions = 3
         self.elements = 2
 
+        self.tables = {}  # answers indexed by activity, session, and block
+        self.summaries = {}  # mean and standard deviation per index
+        self.samples = {}  # answers per index
+
     def calculate_max_combinations(self, number):
         """ Calculate the number of maximum combinations, this is the maximum
         number of statistical tests performed and used for a Bonferroni
@@ -46,8 +96,9 @@ class AnalyseSubjectiveMeasures():
         """ Loads excel file with confidence scores and saves it in DataFrame.
         """
         file_name = f'{self.user}_Confidence.xlsx'
-        self.confidence = pd.read_excel(self.path + file_name)
+        self.confidence = read_workbook(self.path, file_name)
         self.confidence.dropna(inplace=True, subset=['Answer'])
+        self.confidence = self.index_table('confidence', self.confidence)
 
     def load_NASA_TLX(self):
         """ Loads excel file with workload scores and saves it in DataFrame.
@@ -55,9 +106,10 @@ class AnalyseSubjectiveMeasures():
         and self.avg_nasa_tlx for plotting.
         """
         file_name = f'{self.user}_NASA_TLX.xlsx'
-        self.nasa_tlx = pd.read_excel(self.path + file_name, sheet_name=0)
+        self.nasa_tlx = read_workbook(self.path, file_name, sheet_name=0)
         self.nasa_tlx['Answer'] = 10 - (self.nasa_tlx['Answer'] / 10)
         self.nasa_tlx.dropna(inplace=True, subset=['Answer'])
+        self.nasa_tlx = self.index_table('nasa_tlx', self.nasa_tlx)
 
     def load_PEmbS_LLA(self):
         """ Loads excel file with embodiment scores and saves it in DataFrame.
@@ -65,40 +117,58 @@ class AnalyseSubjectiveMeasures():
         and self.avg_pembs_lla for plotting.
         """
         file_name = f'{self.user}_PEmbS-LLA.xlsx'
-        self.pembs_lla = pd.read_excel(self.path + file_name, sheet_name=0)
+        self.pembs_lla = read_workbook(self.path, file_name, sheet_name=0)
         self.pembs_lla['Answer'] = (self.pembs_lla['Answer'] + 3) / 6 * 10
         self.pembs_lla.dropna(inplace=True, subset=['Answer'])
+        self.pembs_lla = self.index_table('pembs_lla', self.pembs_lla)
+
+    def index_table(self, name, data):
+        """ Indexes a table by activity, session, and block. Calculates the
+        mean and standard deviation, and collects the answers of each index
+        in one groupby pass, so they can be looked up for every block,
+        session, and activity.
+
+        Args:
+            name (str): name of the table, e.g. 'confidence'.
+            data (DataFrame): DataFrame with scores for subjective measures,
+            with or without the index.
 
-    def average_block(self, data):
+        Returns:
+            DataFrame: the indexed table.
+        """
+        table = data if data.index.names == INDEX else data.set_index(INDEX)
+        answers = table.groupby(level=INDEX)['Answer']
+        self.tables[name] = table
+        self.summaries[name] = answers.agg(['mean', 'std'])
+        self.samples[name] = {key: group.to_numpy() for key, group in answers}
+        return table
+
+    def average_block(self, name):
         """ Calculates the average score for each block, for the set activity
         and session.
 
         Args:
-            data (DataFrame): DataFrame with scores for subjective measures.
+            name (str): name of the table, see index_table.
 
         Returns:
             DataFrame: DataFrame with average scores for each block.
         """
+        blocks = np.arange(1, self.num_blocks + 1)
+        index = pd.MultiIndex.from_product(
+            [[self.activity], [self.session], blocks], names=INDEX)
+        summary = self.summaries[name].reindex(index)
+
         average_score = pd.DataFrame({
             'User': [f'{self.user}'] * self.num_blocks,
-            'Block': np.arange(1, self.num_blocks + 1),
-            'Answer': [np.nan] * self.num_blocks,
-            'Standard deviation': [np.nan] * self.num_blocks})
-
-        for block in range(1, self.num_blocks + 1):
-            block_data = data[(
-                data['Block'] == block) & (
-                data['Session'] == self.session) & (
-                data['Activity'] == self.activity)]
-            score = block_data['Answer'].mean()
-            std = block_data['Answer'].std()
-            average_score.loc[[block - 1], ['Answer']] = score
-            average_score.loc[[block - 1], ['Standard deviation']] = std
+            'Block': blocks,
+            'Answer': summary['mean'].to_numpy(),
+            'Standard deviation': summary['std'].to_numpy()})
 
         average_score.fillna(0, inplace=True)
         return average_score
 
-    def plot_results(self, p_values=[]):
+    @stage
+    def plot_results(self, p_values=[], show=False):
         """ Plots all subjective measures per block in one bar plot.
         Rescales all scores to a range from 0 to 10. Plots horizontal
         bars with asterisks to indicate statistical difference.
@@ -106,10 +176,12 @@ class AnalyseSubjectiveMeasures():
         Args:
             p_values (DataFrame): DataFrame with p_values of statistical
             difference between blocks. Defaults to [].
+            show (bool, optional): Shows the figure after saving, otherwise
+            the figure is closed. Defaults to False.
         """
-        avg_confidence = self.average_block(self.confidence)
-        avg_nasa = self.average_block(self.nasa_tlx)
-        avg_pembs = self.average_block(self.pembs_lla)
+        avg_confidence = self.average_block('confidence')
+        avg_nasa = self.average_block('nasa_tlx')
+        avg_pembs = self.average_block('pembs_lla')
 
         all_data = pd.DataFrame({
             'User': [f'{self.user}'] * self.num_blocks,
@@ -128,23 +200,25 @@ class AnalyseSubjectiveMeasures():
         if all_data['Confidence'].sum() == 0:
             return  # nothing to plot
 
+        fig, ax = plt.subplots()
         all_data.plot.bar(
             x='Block', rot=45, yerr=standard_dev[
-                ['Confidence', 'Ease of use', 'Embodiment']].to_numpy().T)
-        plt.ylabel('Score; low (0) to high (10)')
-        plt.yticks(np.arange(11))
-        plt.ylim(0, 12.5)
-        # plt.text(1.95, 9, '+')  # plus mark for outlier
-        plt.xlabel('')
-        plt.xticks(np.arange(self.num_blocks), labels=[
+                ['Confidence', 'Ease of use', 'Embodiment']].to_numpy().T,
+            ax=ax)
+        ax.set_ylabel('Score; low (0) to high (10)')
+        ax.set_yticks(np.arange(11))
+        ax.set_ylim(0, 12.5)
+        # ax.text(1.95, 9, '+')  # plus mark for outlier
+        ax.set_xlabel('')
+        ax.set_xticks(np.arange(self.num_blocks), labels=[
             'Baseline', 'EMG before SF', 'EMG + SF', 'EMG after SF'])
         if self.activity == 'Ground level walking':
             title = 'Subjective measures during level ground walking'
         else:
             title = 'Subjective measures during ramp ascension'
-        plt.title(title)
-        plt.legend(bbox_to_anchor=(0, -0.05), loc="upper left",
-                   ncol=3)
+        ax.set_title(title)
+        ax.legend(bbox_to_anchor=(0, -0.05), loc="upper left",
+                  ncol=3)
         above_y = 0.2
         y_max_values = []
         for index, row in all_data.iterrows():
@@ -156,9 +230,9 @@ class AnalyseSubjectiveMeasures():
             y_max_values.append(y_max + above_y)
             if y_max == 0.2:
                 continue
-            plt.plot([x1, x1, x2, x2],
-                     [y_max, y_max + above_y, y_max + above_y, y_max],
-                     lw=1., c='black')
+            ax.plot([x1, x1, x2, x2],
+                    [y_max, y_max + above_y, y_max + above_y, y_max],
+                    lw=1., c='black')
 
         h = 0
         if len(p_values) > 0:
@@ -183,17 +257,20 @@ class AnalyseSubjectiveMeasures():
                         h += 0.6
                         y1, y2 = y_max_values[int(x1)], y_max_values[int(x2)]
                         y = max(y1, y2) + h
-                        plt.plot([x1, x1, x2, x2],
-                                 [y, y + above_y, y + above_y, y],
-                                 lw=1., c='black')
-                        plt.text((x1 + x2) * .5, y+above_y, text, ha='center',
-                                 va='bottom', c='black')
-
-        plt.grid()
-        fig = plt.gcf()
-        tikzplotlib_fix_ncols(fig)
-        tikzplotlib.save(
-            f'user_files/results/{self.user}_Subjective_measures_session_{self.session}_{self.activity}.tex')
+                        ax.plot([x1, x1, x2, x2],
+                                [y, y + above_y, y + above_y, y],
+                                lw=1., c='black')
+                        ax.text((x1 + x2) * .5, y+above_y, text, ha='center',
+                                va='bottom', c='black')
+
+        ax.grid()
+        pgfplots.save(
+            f'user_files/results/{self.user}_Subjective_measures_session_{self.session}_{self.activity}.tex',
+            figure=fig)
+        if show:
+            plt.show()
+        else:
+            plt.close(fig)
 
     def calculate_stats(self):
         """ Performs the statistical analysis between all combinations of
@@ -204,13 +281,14 @@ class AnalyseSubjectiveMeasures():
             DataFrame: DataFrame with statistical difference between blocks,
             otherwise empty.
         """
-        all_data = pd.concat([self.confidence, self.nasa_tlx, self.pembs_lla],
-                             ignore_index=True)
+        if 'all' not in self.tables:
+            self.index_table('all', pd.concat(
+                [self.confidence, self.nasa_tlx, self.pembs_lla]))
 
-        x_all, p_all = self.friedman_test(all_data)
+        x_all, p_all = self.friedman_test('all')
 
-        x_nasa, p_nasa = self.friedman_test(self.nasa_tlx)
-        x_pembs, p_pembs = self.friedman_test(self.pembs_lla)
+        x_nasa, p_nasa = self.friedman_test('nasa_tlx')
+        x_pembs, p_pembs = self.friedman_test('pembs_lla')
 
         if self.compare_sessions:
             condition = self.block
@@ -221,18 +299,16 @@ class AnalyseSubjectiveMeasures():
                     x_nasa, p_nasa, x_pembs, p_pembs]
 
         if p_nasa <= 0.05 or p_pembs < 0.05 or np.isnan(p_nasa):
-            return friedman, self.wilcoxon_compare_sample(all_data)
+            return friedman, self.wilcoxon_compare_sample()
         else:
             return friedman, pd.DataFrame()
 
-    def wilcoxon_compare_sample(self, all_data):
+    @stage
+    def wilcoxon_compare_sample(self):
         """ Prepares the data for the wilcoxon test to compare within session
         and between sessions. After the statistical tests, the results are
         saved in a DataFrame.
 
-        Args:
-            all_data (DataFrame): Contains all data of the subjective measures.
-
         Returns:
             DataFrame: Results of the test used for indicating significant
             differences in plot.
@@ -243,11 +319,11 @@ class AnalyseSubjectiveMeasures():
         pembs_w, pembs_p = [], []
 
         if self.compare_sessions:
-            sample_range = all_data['Session'].unique().tolist()
+            sample_range = self.tables['all'].index.unique('Session').tolist()
             compare = 'Block'
             condition = self.block
         else:
-            sample_range = all_data['Block'].unique().tolist()
+            sample_range = self.tables['all'].index.unique('Block').tolist()
             compare = 'Session'
             condition = self.session
 
@@ -258,7 +334,7 @@ class AnalyseSubjectiveMeasures():
 
                 try:
                     w, p = self.wilcoxon_test(
-                        all_data, condition_1, condition_2)
+                        'all', condition_1, condition_2)
                 except ValueError:
                     w, p = np.nan, np.nan
                 all_w.append(w)
@@ -266,7 +342,7 @@ class AnalyseSubjectiveMeasures():
 
                 try:
                     w, p = self.wilcoxon_test(
-                        self.nasa_tlx, condition_1, condition_2)
+                        'nasa_tlx', condition_1, condition_2)
                 except ValueError:
                     w, p = np.nan, np.nan
                 nasa_w.append(w)
@@ -274,7 +350,7 @@ class AnalyseSubjectiveMeasures():
 
                 try:
                     w, p = self.wilcoxon_test(
-                        self.pembs_lla, condition_1, condition_2)
+                        'pembs_lla', condition_1, condition_2)
                 except ValueError:
                     w, p = np.nan, np.nan
                 pembs_w.append(w)
@@ -290,12 +366,12 @@ class AnalyseSubjectiveMeasures():
 
         return stats
 
-    def wilcoxon_test(self, data, condition_1, condition_2):
+    def wilcoxon_test(self, name, condition_1, condition_2):
         """ Performs the wilcoxon signed-rank test on the data from block
         against the compare block.
 
         Args:
-            data (DataFrame): DataFrame with all data to test on.
+            name (str): name of the table to test on, see index_table.
             condition_1 (int): Block or session of first set of measures.
             condition_2 (int): Block or session of second set of measures to
             compare first block against.
@@ -303,48 +379,34 @@ class AnalyseSubjectiveMeasures():
         Returns:
             float, float: statistic, and p-value of the wilcoxon test.
         """
-        if self.compare_sessions:
-            self.session = condition_1
-        else:
-            self.block = condition_1
-
-        x = self.select_sample(data)
+        x = self.select_sample(name, condition_1)
+        y = self.select_sample(name, condition_2)
 
-        if self.compare_sessions:
-            self.session = condition_2
-        else:
-            self.block = condition_2
-        y = self.select_sample(data)
-
-        w, p = wilcoxon(x['Answer'], y['Answer'], mode='exact')
+        w, p = wilcoxon(x, y, mode='exact')
         return w, p
 
-    def friedman_test(self, data):
+    @stage
+    def friedman_test(self, name):
         """ Performs the friedman test on the groups.
 
         Args:
-            data (DataFrame): DataFrame to test difference between blocks.
+            name (str): name of the table to test difference between blocks,
+            see index_table.
 
         Returns:
             float, float: statistic, and p-value result from the statistical
             test, otherwise np.nan, np.nan.
         """
-        compare_data = []
-
         if self.compare_sessions:
-            sessions = data['Session'].unique().tolist()
-            for session in sessions:
-                self.session = session
-                sample = self.select_sample(data)
-                if len(sample) > 0:
-                    compare_data.append(sample['Answer'])
+            conditions = self.tables[name].index.unique('Session')
         else:
-            blocks = data['Block'].unique().tolist()
-            for block in blocks:
-                self.block = block
-                sample = self.select_sample(data)
-                if len(sample) > 0:
-                    compare_data.append(sample['Answer'])
+            conditions = self.tables[name].index.unique('Block')
+
+        compare_data = []
+        for condition in conditions:
+            sample = self.select_sample(name, condition)
+            if len(sample) > 0:
+                compare_data.append(sample)
 
         if len(compare_data) >= 3:
             chi, p = friedmanchisquare(*compare_data)
@@ -352,109 +414,203 @@ class AnalyseSubjectiveMeasures():
             chi, p = np.nan, np.nan
         return chi, p
 
-    def analyse_data(self, users):
-        """ Loops through user list to load the data for each user.
-        Then analyses the data per session and activity. Plots the results
-        and calculate the statistics. Then saves the results.
+    def load_data(self):
+        """ Loads the confidence, workload, and embodiment scores of the set
+        user.
+        """
+        self.path = f'user_files/{self.user}/'
+        self.tables = {}
+        self.load_confidence()
+        self.load_NASA_TLX()
+        self.load_PEmbS_LLA()
+
+    @stage
+    def activity_statistics(self, activity):
+        """ Performs the statistical tests within each session and between
+        sessions for one activity, without plotting.
+
+        Args:
+            activity (str): activity to analyse.
+
+        Returns:
+            DataFrame: results with RESULT_COLUMNS, one row per test.
+        """
+        self.activity = activity
+        results = []
+
+        for comparison, conditions in [
+                ('within session', range(1, self.max_sessions + 1)),
+                ('between session', range(1, self.num_blocks + 1))]:
+            self.compare_sessions = comparison == 'between session'
+            if self.compare_sessions:
+                self.calculate_max_combinations(self.max_sessions)
+                key = 'Block'
+            else:
+                self.calculate_max_combinations(self.num_blocks)
+                key = 'Session'
+
+            for condition in conditions:
+                if self.compare_sessions:
+                    self.block = condition
+                else:
+                    self.session = condition
+
+                if self.average_block('confidence')['Answer'].sum() == 0:
+                    continue  # skip if no data
+                friedman, wilcoxon_stats = self.calculate_stats()
+
+                friedman = pd.DataFrame([friedman], columns=[
+                    'Activity', key, 'all_statistic', 'all_p',
+                    'NASA_statistic', 'NASA_p', 'pembs_statistic', 'pembs_p'])
+                wilcoxon_stats = wilcoxon_stats.rename(columns={
+                    'all_w': 'all_statistic', 'NASA_w': 'NASA_statistic',
+                    'pembs_w': 'pembs_statistic'})
+                results.append(friedman.assign(
+                    Comparison=comparison, Test='Friedman'))
+                results.append(wilcoxon_stats.assign(
+                    Comparison=comparison, Test='Wilcoxon'))
+
+        results = [result for result in results if not result.empty]
+        if not results:
+            return pd.DataFrame(columns=RESULT_COLUMNS)
+        results = pd.concat(results, ignore_index=True)
+        results['User'] = self.user
+        return results.reindex(columns=RESULT_COLUMNS)
+
+    @stage
+    def calculate_statistics(self, users, processes=None):
+        """ Performs the statistical tests of all users in a process pool,
+        one task per user and activity.
 
         Args:
             users (list): List of user IDs as string
+            processes (int, optional): number of worker processes. Defaults to
+            the number of cores, 1 runs the tests in this process.
+
+        Returns:
+            DataFrame: results of all users, see activity_statistics.
         """
-        for user in users:
-            self.user = user
-            self.path = f'user_files/{user}/'
-            self.load_confidence()
-            self.load_NASA_TLX()
-            self.load_PEmbS_LLA()
+        tasks = [(user, activity) for user in users
+                 for activity in self.activities]
+        if processes == 1:
+            results = [activity_statistics(*task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                results = list(executor.map(activity_statistics, *zip(*tasks)))
 
-            friedman_within_session_file = f'user_files/results/{self.user}_Subjective_measures_friedman_within_session.csv'
-            friedman_within_session_list = []
-            friedman_between_session_file = f'user_files/results/{self.user}_Subjective_measures_friedman_between_session.csv'
-            friedman_between_session_list = []
+        results = pd.concat(results, ignore_index=True)
+        for column in ['Session', 'Block', 'Condition_1', 'Condition_2']:
+            results[column] = results[column].astype('Int64')
+        return results
 
-            wilcoxon_within_session_file = f'user_files/results/{self.user}_Subjective_measures_wilcoxon_within_session.csv'
-            wilcoxon_within_session_df = pd.DataFrame()
-            wilcoxon_between_session_file = f'user_files/results/{self.user}_Subjective_measures_wilcoxon_between_session.csv'
-            wilcoxon_between_session_df = pd.DataFrame()
+    def save_statistics(self, results):
+        """ Saves the results of each user in the Friedman and Wilcoxon csv
+        files within and between sessions.
 
-            for activity in self.activities:
-                self.activity = activity
+        Args:
+            results (DataFrame): results, see calculate_statistics.
+        """
+        for user, user_results in results.groupby('User', sort=False):
+            for comparison, key in [('within session', 'Session'),
+                                    ('between session', 'Block')]:
+                for test, statistic in [('Friedman', 'chi'),
+                                        ('Wilcoxon', 'w')]:
+                    columns = ['Activity', key]
+                    if test == 'Wilcoxon':
+                        columns += ['Condition_1', 'Condition_2']
+                    columns += ['all_statistic', 'all_p', 'NASA_statistic',
+                                'NASA_p', 'pembs_statistic', 'pembs_p']
+
+                    selected = user_results.loc[
+                        (user_results['Comparison'] == comparison) & (
+                            user_results['Test'] == test), columns]
+                    if selected.empty:
+                        continue  # save when not empty
+                    selected = selected.rename(columns=lambda column: (
+                        column.replace('statistic', statistic)))
+                    selected.to_csv(
+                        f'user_files/results/{user}_Subjective_measures_{test.lower()}_{comparison.replace(" ", "_")}.csv',
+                        index=False)
+
+    def plot_statistics(self, results):
+        """ Plots the results of each session with the significant
+        differences within the session.
 
-                # test within sessions
-                self.compare_sessions = False
-                self.calculate_max_combinations(self.num_blocks)
+        Args:
+            results (DataFrame): results, see calculate_statistics.
+        """
+        within = results[(results['Comparison'] == 'within session') & (
+            results['Test'] == 'Wilcoxon')]
+        self.compare_sessions = False
+        self.calculate_max_combinations(self.num_blocks)
 
+        for user in results['User'].unique():
+            self.user = user
+            self.load_data()
+            for activity in self.activities:
+                self.activity = activity
                 for session in range(1, self.max_sessions + 1):
                     self.session = session
-
-                    if self.average_block(self.confidence
-                                          )['Answer'].sum() == 0:
+                    if self.average_block('confidence')['Answer'].sum() == 0:
                         continue  # skip if no data
-                    friedman, wilcoxon_stats = self.calculate_stats()
-                    friedman_within_session_list.append(friedman)
-                    if wilcoxon_within_session_df.empty:
-                        wilcoxon_within_session_df = wilcoxon_stats
-                    else:
-                        wilcoxon_within_session_df = pd.concat([
-                            wilcoxon_within_session_df, wilcoxon_stats],
-                            ignore_index=True)
-                    self.plot_results(wilcoxon_stats)
-
-                # compare sessions
-                self.compare_sessions = True
-                self.calculate_max_combinations(self.max_sessions)
-                for block in range(1, self.num_blocks + 1):
-                    self.block = block
+                    p_values = within[(within['User'] == user) & (
+                        within['Activity'] == activity) & (
+                        within['Session'] == session)]
+                    self.plot_results(p_values.reset_index(drop=True))
 
-                    if self.average_block(self.confidence
-                                          )['Answer'].sum() == 0:
-                        continue  # skip if no data
-                    friedman, wilcoxon_stats = self.calculate_stats()
-                    friedman_between_session_list.append(friedman)
-                    if wilcoxon_between_session_df.empty:
-                        wilcoxon_between_session_df = wilcoxon_stats
-                    else:
-                        wilcoxon_between_session_df = pd.concat([
-                            wilcoxon_between_session_df, wilcoxon_stats],
-                            ignore_index=True)
-
-            # save all in csv files
-            friedman_within_session_df = pd.DataFrame(
-                friedman_within_session_list,
-                columns=['Activity', 'Session', 'all_chi', 'all_p',
-                         'NASA_chi', 'NASA_p', 'pembs_chi', 'pembs_p'])
-            if not friedman_within_session_df.empty:  # save when not empty
-                friedman_within_session_df.to_csv(
-                    friedman_within_session_file, index=False)
-            if not wilcoxon_within_session_df.empty:
-                wilcoxon_within_session_df.to_csv(
-                    wilcoxon_within_session_file, index=False)
-
-            friedman_between_session_df = pd.DataFrame(
-                friedman_between_session_list,
-                columns=['Activity', 'Block', 'all_chi', 'all_p',
-                         'NASA_chi', 'NASA_p', 'pembs_chi', 'pembs_p'])
-            if not friedman_between_session_df.empty:
-                friedman_between_session_df.to_csv(
-                    friedman_between_session_file, index=False)
-            if not wilcoxon_between_session_df.empty:
-                wilcoxon_between_session_df.to_csv(
-                    wilcoxon_between_session_file, index=False)
-
-    def select_sample(self, data):
-        """ Select a sample of the data based on the defined parameters.
+    def analyse_data(self, users, processes=None):
+        """ Calculates the statistics of all users per session and activity
+        in parallel, see calculate_statistics. Then saves the results in one
+        table and per user, and plots the results.
 
         Args:
-            data (DataFrame): DF from which to select a specific portion.
+            users (list): List of user IDs as string
+            processes (int, optional): number of worker processes. Defaults to
+            the number of cores.
 
         Returns:
-            DataFrame : Selected data of the defined block, session, and
-            activity.
+            DataFrame: results of all users.
         """
-        sample = data.loc[(data['Block'] == self.block) & (
-            data['Session'] == self.session) & (
-            data['Activity'] == self.activity)]
-        return sample
+        results = self.calculate_statistics(users, processes)
+        results.to_csv('user_files/results/Subjective_measures_statistics.csv',
+                       index=False)
+        self.save_statistics(results)
+        self.plot_statistics(results)
+        return results
+
+    def select_sample(self, name, condition):
+        """ Selects the answers of the set activity for a block or session.
+        The block is given when comparing within a session, otherwise the
+        session is given and the set block is used.
+
+        Args:
+            name (str): name of the table, see index_table.
+            condition (int): Block or session.
+
+        Returns:
+            array: Selected answers, empty when there are none.
+        """
+        if self.compare_sessions:
+            key = (self.activity, condition, self.block)
+        else:
+            key = (self.activity, self.session, condition)
+        return self.samples[name].get(key, np.array([]))
+
+
+def activity_statistics(user, activity):
+    """ Loads the data of a user and performs the statistical tests of one
+    activity, see AnalyseSubjectiveMeasures.activity_statistics.
+
+    Args:
+        user (str): user ID.
+        activity (str): activity to analyse.
+
+    Returns:
+        DataFrame: results with RESULT_COLUMNS.
+    """
+    analysis = AnalyseSubjectiveMeasures(user)
+    analysis.load_data()
+    return analysis.activity_statistics(activity)
 
 
 if __name__ == '__main__':
@@ -8,13 +8,138 @@
 """
 
 import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-import tikzplotlib
 
-from utils import read_file, tikzplotlib_fix_ncols
+import pgfplots
+from profiling import stage
+from utils import read_file
+
+ACTIVITIES = ['Ground level walking', 'Ascending slope']
+ASI_PARAMETERS = ['Stance phase L %', 'Swing phase L %',
+                  'Stance phase R %', 'Swing phase R %']
+
+
+@lru_cache(maxsize=None)
+def parameter_names(path='src/', file_name='Treadmill parameters names.csv'):
+    """ Loads the names of the treadmill parameters once.
+
+    Args:
+        path (str, optional): folder of the file. Defaults to 'src/'.
+        file_name (str, optional): name of the file.
+        Defaults to 'Treadmill parameters names.csv'.
+
+    Returns:
+        tuple: 'Parameters' followed by the parameter names.
+    """
+    param = read_file(path, file_name)
+    list_param = list(filter(None, param))  # remove None
+    return tuple(['Parameters'] + ['.'.join(parameter)
+                                   for parameter in list_param])
+
+
+def session_trials(user, date, prosthetic_side, num_blocks=4,
+                   activities=ACTIVITIES, folder='user_files/'):
+    """ Lists the trial folders of a treadmill session. The sorted folders are
+    block 1 for each activity, then block 2, etc.
+
+    Args:
+        user (str): user name / number.
+        date (str): date of the treadmill session.
+        prosthetic_side (str): 'L' or 'R'.
+        num_blocks (int, optional): number of blocks. Defaults to 4.
+        activities (list, optional): activities per block.
+        Defaults to ACTIVITIES.
+        folder (str, optional): folder where all user files are located.
+        Defaults to 'user_files/'.
+
+    Returns:
+        list: (user, date, side, block, activity, parameters file) per trial.
+    """
+    path = os.path.join(folder, user, date, 'treadmill_data')
+    folders = sorted(name for name in os.listdir(path) if '.pdf' not in name)
+    trials = [(block, activity) for block in range(1, num_blocks + 1)
+              for activity in activities]
+    return [(user, date, prosthetic_side, block, activity,
+             os.path.join(path, name, 'parameters.csv'))
+            for (block, activity), name in zip(trials, folders)]
+
+
+def read_trial(file_name, names):
+    """ Reads the parameters of one trial.
+
+    Args:
+        file_name (str): path of the parameters.csv file.
+        names (tuple): parameter names, see parameter_names.
+
+    Returns:
+        Series: value per parameter.
+    """
+    trial = pd.read_csv(file_name).T.dropna()
+    return pd.Series(pd.to_numeric(trial[0].to_numpy(), errors='coerce'),
+                     index=pd.Index(names, name='Parameter'), name='Value')
+
+
+@stage
+def load_trials(sessions, processes=None):
+    """ Reads all trials of all sessions in parallel into one long-format
+    table.
+
+    Args:
+        sessions (list): (user, date, prosthetic side) per session.
+        processes (int, optional): number of threads. Defaults to the
+        ThreadPoolExecutor default.
+
+    Returns:
+        DataFrame: User, Date, Side, Block, Activity, Parameter and Value
+        columns, one row per parameter of each trial.
+    """
+    trials = [trial for session in sessions
+              for trial in session_trials(*session)]
+    names = parameter_names()
+    with ThreadPoolExecutor(max_workers=processes) as executor:
+        values = list(executor.map(lambda trial: read_trial(trial[-1], names),
+                                   trials))
+    if not values:
+        return pd.DataFrame(columns=['User', 'Date', 'Side', 'Block',
+                                     'Activity', 'Parameter', 'Value'])
+
+    keys = pd.MultiIndex.from_tuples(
+        [trial[:-1] for trial in trials],
+        names=['User', 'Date', 'Side', 'Block', 'Activity'])
+    return pd.concat(values, keys=keys).reset_index()
+
+
+@stage
+def symmetry_index(trials):
+    """ Calculates the absolute symmetry index of every trial at once.
+    i indicates the intact side, p the prosthetic side.
+
+    Args:
+        trials (DataFrame): long-format table, see load_trials.
+
+    Returns:
+        DataFrame: ASI per User, Date, Block and Activity. 0 means perfect
+        symmetry.
+    """
+    data = trials[trials['Parameter'].isin(ASI_PARAMETERS)].pivot_table(
+        index=['User', 'Date', 'Side', 'Block', 'Activity'],
+        columns='Parameter', values='Value', aggfunc='first')
+    right = data.index.get_level_values('Side') == 'R'
+
+    left_ratio = (data['Stance phase L %'] / data['Swing phase L %']).to_numpy()
+    right_ratio = (data['Stance phase R %'] /
+                   data['Swing phase R %']).to_numpy()
+    i = np.where(right, left_ratio, right_ratio)
+    p = np.where(right, right_ratio, left_ratio)
+
+    asi = pd.DataFrame({'ASI': (i - p) / (0.5 * (i + p)) * 100},
+                       index=data.index).reset_index('Side', drop=True)
+    return asi.reset_index('User')
 
 
 class AnalyseGaitData():
@@ -30,102 +155,56 @@ class AnalyseGaitData():
 
     def extract_param(self):
         """ Extract parameters for the treadmill data from a .csv file.
+        The file is only read once, see parameter_names.
         """
-        param = read_file('src/', 'Treadmill parameters names.csv')
-
-        list_param = list(filter(None, param))  # remove None
-        list_param = ['.'.join(parameter) for parameter in list_param]
-        self.list_param = [['Parameters'] + list_param]
+        self.list_param = [list(parameter_names())]
 
     def get_symmetry_data(self):
-        """ Loads excel files with treadmill data one by one.
-        Calculates the asymmetry data.
+        """ Loads the treadmill data of the session and calculates the
+        asymmetry data.
 
         Returns:
             DataFrame: absolute symmetry index for each of the recorded files
         """
-        dir = os.listdir(self.path)
-        folders = [folder for folder in dir if '.pdf' not in folder]
-        folders.sort()
-        data = pd.DataFrame()
-
-        blocks = list(np.arange(1, self.num_blocks + 1)) * self.num_activities
-        blocks.sort()
-        activities = ['Ground level walking',
-                      'Ascending slope'] * self.num_blocks
-        index = pd.MultiIndex.from_arrays([blocks, activities],
-                                          names=('Block', 'Activity'))
-        symmetry_index = pd.DataFrame({
-            'User': [f'{self.user}'] * self.num_blocks * self.num_activities,
-            'ASI': [np.nan] * self.num_blocks * self.num_activities},
-            index=index)
-
-        for i, folder in zip(index, folders):
-            trial = pd.read_csv(self.path + folder + '\\parameters.csv').T
-            trial.dropna(inplace=True)
-            trial = trial.set_axis(self.list_param, axis=0)
-            data[i] = trial
-            asi = self.calculate_asymmetry(trial)
-            symmetry_index.loc[[i], 'ASI'] = asi
-        return symmetry_index
-
-    def calculate_asymmetry(self, data):
-        """ Calculates the absolute symmetry index of the input data.
-        i indicates the intact side, p the prosthetic side.
-
-        Args:
-            data (DataFrame): Contains swing and stance info per leg.
+        trials = load_trials([(self.user, self.date, self.prosthetic_side)])
+        return symmetry_index(trials).droplevel('Date')
 
-        Returns:
-            float: absolute symmetry index score. 0 means perfect symmetry.
-        """
-        if self.prosthetic_side == 'R':
-            p_side = 'R'
-            i_side = 'L'
-        elif self.prosthetic_side == 'L':
-            p_side = 'L'
-            i_side = 'R'
-
-        stance_i = data[0].loc[f'Stance phase {i_side} %'].to_numpy()
-        swing_i = data[0].loc[f'Swing phase {i_side} %'].to_numpy()
-        stance_p = data[0].loc[f'Stance phase {p_side} %'].to_numpy()
-        swing_p = data[0].loc[f'Swing phase {p_side} %'].to_numpy()
-
-        i = stance_i / swing_i
-        p = stance_p / swing_p
-        asi = (i - p) / (0.5 * (i + p)) * 100
-        return asi
-
-    def plot_asi(self, data):
+    @stage
+    def plot_asi(self, data, show=False):
         """ Plots the symmetry score of one participant over one session.
 
         Args:
             data (DataFrame): Contains symmetry scores for each activity
             and block.
+            show (bool, optional): Shows the figure after saving, otherwise
+            the figure is closed. Defaults to False.
         """
+        fig, ax = plt.subplots()
         data.unstack()['ASI'].plot.bar(y=[
             'Ground level walking', 'Ascending slope'], rot=45,
-            label=['Level ground', 'Inclined'])
-        plt.xticks(np.arange(4), labels=[
+            label=['Level ground', 'Inclined'], ax=ax)
+        ax.set_xticks(np.arange(4), labels=[
             'Baseline', 'EMG before SF', 'EMG + SF', 'EMG after SF'])
-        plt.ylabel('ASI (%)')
-        plt.hlines(10, -1, 4, colors='black', linestyles='dashed',
-                   label='Healthy asymmetry')
-        plt.legend(bbox_to_anchor=(1.02, 1), loc="upper left")
-
-        plt.title('Absolute symmetry index')
-        plt.xlabel('')
-        plt.grid()
-
-        fig = plt.gcf()
-        tikzplotlib_fix_ncols(fig)
-        tikzplotlib.save(
-            f'user_files/results/{self.user}_{self.date}_ASI.tex')
+        ax.set_ylabel('ASI (%)')
+        ax.hlines(10, -1, 4, colors='black', linestyles='dashed',
+                  label='Healthy asymmetry')
+        ax.legend(bbox_to_anchor=(1.02, 1), loc="upper left")
+
+        ax.set_title('Absolute symmetry index')
+        ax.set_xlabel('')
+        ax.grid()
+
+        pgfplots.save(
+            f'user_files/results/{self.user}_{self.date}_ASI.tex', figure=fig)
+        if show:
+            plt.show()
+        else:
+            plt.close(fig)
 
     def analyse_data(self, users, dates, prosthetic_sides):
-        """ Loops through user list to load the data for each user.
-        Then analyses the data per session/date. Then plots and saves the
-        results.
+        """ Loads the data of all users at once and calculates the symmetry
+        index of all trials. Then plots and saves the results per
+        session/date.
 
         Args:
             users (list): List of user IDs as string
@@ -133,13 +212,15 @@ class AnalyseGaitData():
             prosthetic_sides (list): List of prosthetic sides corresponding to
             the users.
         """
-        for user, date, p_side in zip(users, dates, prosthetic_sides):
+        sessions = list(zip(users, dates, prosthetic_sides))
+        symmetry_data = symmetry_index(load_trials(sessions))
+        for user, date, p_side in sessions:
             self.user = user
             self.date = date
             self.path = f'user_files/{self.user}/{self.date}/treadmill_data/'
             self.prosthetic_side = p_side
-            symmetry_data = self.get_symmetry_data()
-            self.plot_asi(symmetry_data)
+            session = symmetry_data[symmetry_data['User'] == user]
+            self.plot_asi(session.xs(date, level='Date'))
 
 
 if __name__ == '__main__':
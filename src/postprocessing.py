@@ -8,40 +8,20 @@
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-import tikzplotlib
 
-from preprocessing import PreprocessEMG
-from utils import tikzplotlib_fix_ncols
-
-
-def extract_data(filename, verbose=True, comma=False):
-    """
-    Extracts data and returns a reshaped data frame with each variable type
-    in a different column, ordered by timestamp.
-
-    Args:
-        filename (data frame): csv file with EMG data recorded using Ossur
-        Toolbox.
-        verbose (bool, optional): _description_. Defaults to True.
-        comma (bool, optional): Whether decimals are denoted after a comma.
-        Defaults to False.
-
-    Returns:
-        data frame
-    """
-    if comma:
-        dec = ','
-    else:
-        dec = '.'
-    df = pd.read_csv(filename, delimiter=';', decimal=dec, header=0, quoting=3)
-    df = df.pivot(columns="variableType", values="numValue", index="timestamp")
-    df = df.reset_index(level=0)
-    return df
+import pgfplots
+from downsampling import downsample_frame
+from emg_store import read_recording
+from preprocessing import ACTIVATION_THRESHOLD, THRESHOLDS, PreprocessEMG
+from profiling import stage
 
 
+@stage
 def visualise_data(raw_data, normal_data, data_file,
                    extend='BSMB_MUSCLE_EXTEND', flex='BSMB_MUSCLE_FLEX',
-                   all=True):
+                   all=True, max_points=None, method='minmax', show=False,
+                   thresholds=THRESHOLDS,
+                   activation_threshold=ACTIVATION_THRESHOLD):
     """ Plots data in subplots of raw data, normalised data, and difference
     data and vibration levels. Saves data in .tex files.
 
@@ -55,9 +35,20 @@ def visualise_data(raw_data, normal_data, data_file,
         Defaults to 'BSMB_MUSCLE_FLEX'.
         all (boolean, optional): Indicates if all diagrams are plotted or just
         the raw EMG data. Defaults to True.
+        max_points (int, optional): Downsamples each series to about this
+        number of points before plotting, keeping the edges of the level
+        trace. Plots all samples when None. Defaults to None.
+        method (str, optional): Downsampling method, 'minmax' or 'lttb'.
+        Defaults to 'minmax'.
+        show (bool, optional): Shows each figure after saving, otherwise the
+        figure is closed. Defaults to False.
+        thresholds (list, optional): Boundaries between the levels.
+        Defaults to THRESHOLDS.
+        activation_threshold (float, optional): Normalised EMG value at which
+        the feedback is activated. Defaults to ACTIVATION_THRESHOLD.
     """
     if all:
-        THRESHOLDS = [-1, -0.65, -0.4, -0.2, -0.1, 0.1, 0.2, 0.4, 0.65, 1]
+        THRESHOLDS = [-1] + list(thresholds) + [1]
 
         text = ['Level -4', 'Level -3', 'Level -2', 'Level -1', 'Level 0',
                 'Level 1', 'Level 2', 'Level 3', 'Level 4']
@@ -86,7 +77,8 @@ def visualise_data(raw_data, normal_data, data_file,
         fig, ax1 = plt.subplots(figsize=(15, 7))
 
         if color == 'deadzone':
-            ax1.axhspan(-0.1, 0.1, facecolor='grey', alpha=0.5)
+            ax1.axhspan(-activation_threshold, activation_threshold,
+                        facecolor='grey', alpha=0.5)
             ax1.text(normal_data['timestamp'].iloc[1], 0.01, 'Dead zone')
         elif color == 'levels':
             ax1.hlines(THRESHOLDS[1:-1], 0, normal_data['timestamp'].iloc[-1],
@@ -113,24 +105,34 @@ def visualise_data(raw_data, normal_data, data_file,
                 else np.nan for t in normal_data.loc[:, 'LEVEL']]
             normal_data['threshold level'] = threshold_levels
 
-        data.plot(kind='line', x='timestamp', y=y, ax=ax1, label=label)
+        if max_points:
+            downsampled = downsample_frame(
+                data, 'timestamp', y, max_points, method)
+            for column, column_label in zip(y, label):
+                downsampled[column].plot(kind='line', x='timestamp', y=column,
+                                         ax=ax1, label=column_label)
+        else:
+            data.plot(kind='line', x='timestamp', y=y, ax=ax1, label=label)
         ax1.set_ylabel(y_label)
         ax1.set_xlabel('Time (s)')
         ax1.set_xlim(normal_data['timestamp'].iloc[0],
                      normal_data['timestamp'].iloc[-1])
         ax1.legend(loc='upper left')
-        plt.grid()
+        ax1.grid()
 
-        tikzplotlib_fix_ncols(fig)
         file_name = data_file.split('.')[0] + f'_{name}.tex'
-        tikzplotlib.save(f'user_files/results/{file_name}')
-        plt.show()
+        pgfplots.save(f'user_files/results/{file_name}', figure=fig)
+        if show:
+            plt.show()
+        else:
+            plt.close(fig)
 
 
+@stage
 def simulate_online(user, emg_folder, data_folder, data_file,
                     folder='user_files/',
                     extend='BSMB_MUSCLE_EXTEND', flex='BSMB_MUSCLE_FLEX',
-                    from_log=True):
+                    from_log=True, prediction_horizon=0):
     """ Create loop as if the recorded data was coming in through the online
     system. Preprocess EMG and calculate level. Then plots the data.
 
@@ -145,13 +147,11 @@ def simulate_online(user, emg_folder, data_folder, data_file,
         flex (str): name of column with emg data from flexion muscle.
         from_log (bool): whether the data comes from a log from the panda or
         another Össur device. Defaults to True.
+        prediction_horizon (float): time (in seconds) the level is predicted
+        ahead, see PreprocessEMG.set_prediction. Defaults to 0.
     """
     data_path = f'{folder}{user}/{data_folder}/{data_file}'
-
-    if from_log:
-        data = extract_data(data_path)
-    else:
-        data = pd.read_csv(data_path)
+    data = read_recording(data_path, from_log)
 
     data['timestamp'] = (data['timestamp'] - data['timestamp'].iloc[0]) / 1000
     raw_data = data[['timestamp', extend, flex]]
@@ -161,6 +161,7 @@ def simulate_online(user, emg_folder, data_folder, data_file,
     normalised_extend = []
 
     process_EMG = PreprocessEMG(user, emg_folder)
+    process_EMG.set_prediction(prediction_horizon)
     vib_emg = False
 
     for _, row in data.iterrows():  # loop through data as if live data
@@ -175,6 +176,7 @@ def simulate_online(user, emg_folder, data_folder, data_file,
             level = process_EMG.define_dominant_muscle(normal)
             levels.append(level)
         else:
+            process_EMG.reset_prediction()
             levels.append(None)
 
     normal_data = pd.DataFrame({
@@ -189,8 +191,10 @@ if __name__ == "__main__":
     emg_calibration = '2023_03_17'
     data_file = 'plantar_flexion.csv'
     from_log = False
+    max_points = 2000  # per series, None plots all samples
 
     raw, normal = simulate_online(user, emg_calibration, data_folder,
                                   data_file, from_log=from_log)
 
-    visualise_data(raw, normal, data_file, all=True)
+    visualise_data(raw, normal, data_file, all=True, max_points=max_points,
+                   show=True)
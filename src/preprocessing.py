@@ -5,12 +5,69 @@
  * @desc Process EMG data from file: normalise and define activation level
 """
 
-from utils import read_file
+from utils import parse_lines, read_file
+
+# boundaries between the levels of the normalised extension - flexion
+THRESHOLDS = [-0.65, -0.4, -0.2, -0.1, 0.1, 0.2, 0.4, 0.65]
+ACTIVATION_THRESHOLD = 0.1  # normalised EMG to activate feedback
+
+
+class AlphaBetaFilter():
+    def __init__(self, alpha=0.5, beta=0.1, sample_time=0.01):
+        """ Alpha-beta filter that tracks the value and rate of change of a
+        signal, to extrapolate it ahead in time. Every update costs the same.
+        With alpha and beta 1, the prediction is the linear extrapolation of
+        the last two samples.
+
+        Args:
+            alpha (float, optional): gain of the value, between 0 and 1.
+            Defaults to 0.5.
+            beta (float, optional): gain of the rate of change, between 0 and
+            alpha. Defaults to 0.1.
+            sample_time (float, optional): time (in seconds) between samples.
+            Defaults to 0.01.
+        """
+        self.alpha = alpha
+        self.beta = beta
+        self.sample_time = sample_time
+        self.reset()
+
+    def reset(self):
+        """ Forgets the signal, the next sample starts a new estimate.
+        """
+        self.value = None
+        self.rate = 0.0
+
+    def update(self, measurement):
+        """ Adds a sample to the estimate.
+
+        Args:
+            measurement (float): new sample of the signal.
+        """
+        if self.value is None:
+            self.value = measurement
+            return
+        expected = self.value + self.rate * self.sample_time
+        residual = measurement - expected
+        self.value = expected + self.alpha * residual
+        self.rate += self.beta * residual / self.sample_time
+
+    def predict(self, horizon):
+        """ Extrapolates the signal.
+
+        Args:
+            horizon (float): time (in seconds) ahead of the last sample.
+
+        Returns:
+            float: predicted value of the signal.
+        """
+        return self.value + self.rate * horizon
 
 
 class PreprocessEMG():
     def __init__(self, user, date, folder='user_files/',
-                 extend='BSMB_MUSCLE_EXTEND', flex='BSMB_MUSCLE_FLEX'):
+                 extend='BSMB_MUSCLE_EXTEND', flex='BSMB_MUSCLE_FLEX',
+                 calibration=None):
         self.folder = folder
         self.user = user
         self.date = date
@@ -22,9 +79,15 @@ class PreprocessEMG():
         self.upper_bound = 500  # upper and lower bound for EMG values
         self.lower_bound = 0
         self.mvc_percentage = 1.0  # mvc percentage to normalise over
-
-        self.mvc = self.create_dict('mvc.csv')
-        self.rest = self.create_dict('rest_activity.csv')
+        self.thresholds = THRESHOLDS
+        self.activation_threshold = ACTIVATION_THRESHOLD
+        self.predictor = None  # AlphaBetaFilter when the level is predicted
+        self.prediction_horizon = 0
+
+        calibration = calibration or {}  # lines per file, see boot_cache
+        self.mvc = self.create_dict('mvc.csv', calibration.get('mvc.csv'))
+        self.rest = self.create_dict('rest_activity.csv',
+                                     calibration.get('rest_activity.csv'))
         self.calculate_normal_mvc()
 
     def calculate_normal_mvc(self):
@@ -36,16 +99,21 @@ class PreprocessEMG():
             self.normal_mvc[key] = self.mvc_percentage * (
                 value - self.rest[key])
 
-    def create_dict(self, file_name):
+    def create_dict(self, file_name, lines=None):
         """ Loads file with calibration data and saves it in a dict.
 
         Args:
             file_name (string): file to load
+            lines (list, optional): lines of the file, when already read.
+            Defaults to None.
 
         Returns:
             dict: dict with emg calibration data.
         """
-        names, emg = read_file(self.path, file_name, [None, 'float'])
+        if lines is None:
+            names, emg = read_file(self.path, file_name, [None, 'float'])
+        else:
+            names, emg = parse_lines(lines, [None, 'float'])
         extend = 1  # order of uart data
         flex = 0
 
@@ -82,8 +150,36 @@ class PreprocessEMG():
             normalised[muscle] = emg_signal / self.normal_mvc[muscle]
         return normalised
 
+    def set_prediction(self, horizon=0.1, alpha=0.5, beta=0.1,
+                       sampling_rate=100):
+        """ Predicts the level horizon seconds ahead, to compensate the delay
+        until a level change is felt. The extension - flexion difference is
+        extrapolated with an AlphaBetaFilter. A horizon of 0 turns the
+        prediction off.
+
+        Args:
+            horizon (float, optional): time (in seconds) to predict ahead.
+            Defaults to 0.1.
+            alpha (float, optional): see AlphaBetaFilter. Defaults to 0.5.
+            beta (float, optional): see AlphaBetaFilter. Defaults to 0.1.
+            sampling_rate (int, optional): sampling rate of the EMG data.
+            Defaults to 100.
+        """
+        self.prediction_horizon = horizon
+        if horizon > 0:
+            self.predictor = AlphaBetaFilter(alpha, beta, 1 / sampling_rate)
+        else:
+            self.predictor = None
+
+    def reset_prediction(self):
+        """ Restarts the prediction, e.g. when the feedback is deactivated.
+        """
+        if self.predictor is not None:
+            self.predictor.reset()
+
     def threshold_reached(self, data, vib_emg=False):
-        """ Sets vib_emg to True when the EMG threshold is reached, EMG > 0.1.
+        """ Sets vib_emg to True when the EMG threshold is reached,
+        EMG > activation_threshold.
 
         Args:
             data: normalised EMG data
@@ -94,7 +190,8 @@ class PreprocessEMG():
             bool: is True when EMG threshold is reached and feedback should be
             activated.
         """
-        if (data[self.extend] > 0.1) | (data[self.flex] > 0.1):
+        if (data[self.extend] > self.activation_threshold) | (
+                data[self.flex] > self.activation_threshold):
             vib_emg = True
         return vib_emg
 
@@ -104,6 +201,8 @@ class PreprocessEMG():
         difference in activation between the extensor and the flexor.
         Subtracts extensor EMG from flexor EMG. Thresholds for the levels
         have been based on the paper from Tchimino et al., 2022.
+        With prediction, see set_prediction, the level of the extrapolated
+        difference is returned.
 
         Args:
             data: preprocessed and normalised EMG data from both
@@ -114,10 +213,13 @@ class PreprocessEMG():
             0 = equal contracted, 4 = extensor max & flexor min
         """
         dominant_muscle = data[self.extend] - data[self.flex]
-        thresholds = [-0.65, -0.4, -0.2, -0.1, 0.1, 0.2, 0.4, 0.65]
-        if dominant_muscle <= thresholds[0]:  # smaller than -0.65
+        if self.predictor is not None:
+            self.predictor.update(dominant_muscle)
+            dominant_muscle = self.predictor.predict(self.prediction_horizon)
+        thresholds = self.thresholds
+        if dominant_muscle <= thresholds[0]:  # smaller than lowest threshold
             level = self.levels[0]
-        elif dominant_muscle >= thresholds[-1]:  # larger than 0.65
+        elif dominant_muscle >= thresholds[-1]:  # larger than highest threshold
             level = self.levels[-1]
         else:
             for i, t in enumerate(thresholds[:-1]):
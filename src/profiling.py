@@ -0,0 +1,217 @@
+"""
+ * @author Myrthe Tilleman
+ * @email metill@utu.fi
+ * @create date 2026-10-19 17:05:12
+ * @desc Opt-in timing of the stages of the analysis on the laptop. Stages are
+ marked with the stage decorator or the span context manager. When profiling
+ is enabled, the wall time, number of calls, and peak memory of each stage
+ are collected, chosen stages can be run under cProfile, and a json report is
+ written under /user_files/results/. When it is disabled, a stage only costs
+ one check.
+ Profiling is enabled with enable(), or by setting the environment variable
+ SF_PROFILE to 1 or to the comma separated stages to run under cProfile, e.g.
+ SF_PROFILE=postprocessing.simulate_online. With the environment variable,
+ every process, including the workers of a process pool, writes its own
+ report when it exits.
+"""
+
+import cProfile
+import functools
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from multiprocessing.util import Finalize, register_after_fork
+
+
+class StageProfiler():
+    def __init__(self):
+        """ Collects the statistics of the stages of one process.
+        """
+        self.enabled = False
+        self.memory = False
+        self.profile_stages = set()
+        self.profiles = {}  # cProfile per profiled stage
+        self.stages = {}
+        self.stack = []  # open spans
+        self.start_time = None
+
+    def enable(self, memory=True, profile=()):
+        """ Starts collecting statistics.
+
+        Args:
+            memory (bool, optional): Whether to trace the peak memory, which
+            slows down the code. Defaults to True.
+            profile (list, optional): stages to run under cProfile.
+            Defaults to ().
+        """
+        self.enabled = True
+        self.memory = memory
+        self.profile_stages = set(profile)
+        self.start_time = time.time()
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def reset(self):
+        """ Removes the collected statistics, e.g. in a forked worker process
+        that should only report its own stages.
+        """
+        self.profiles = {}
+        self.stages = {}
+        self.stack = []
+        self.start_time = time.time()
+        if self.memory and tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+
+    def disable(self):
+        """ Stops collecting statistics. The collected statistics are kept.
+        """
+        self.enabled = False
+        if self.memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    @contextmanager
+    def span(self, name):
+        """ Measures the code in the with block as stage name.
+
+        Args:
+            name (str): name of the stage.
+        """
+        if not self.enabled:
+            yield
+            return
+
+        frame = {'start': time.perf_counter(), 'base': 0, 'peak': 0}
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if self.stack:  # keep the peak of the outer span
+                self.stack[-1]['peak'] = max(self.stack[-1]['peak'], peak)
+            tracemalloc.reset_peak()
+            frame['base'] = frame['peak'] = current
+        self.stack.append(frame)
+
+        profile = None
+        if name in self.profile_stages and not any(
+                'profile' in open_frame for open_frame in self.stack):
+            profile = self.profiles.setdefault(name, cProfile.Profile())
+            frame['profile'] = True
+            profile.enable()
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+            duration = time.perf_counter() - frame['start']
+            self.stack.pop()
+
+            peak = 0
+            if self.memory:
+                frame['peak'] = max(frame['peak'],
+                                    tracemalloc.get_traced_memory()[1])
+                peak = frame['peak'] - frame['base']
+                if self.stack:
+                    self.stack[-1]['peak'] = max(self.stack[-1]['peak'],
+                                                 frame['peak'])
+
+            stage = self.stages.setdefault(name, {
+                'calls': 0, 'total_s': 0.0, 'max_s': 0.0,
+                'peak_memory_bytes': 0})
+            stage['calls'] += 1
+            stage['total_s'] += duration
+            stage['max_s'] = max(stage['max_s'], duration)
+            stage['peak_memory_bytes'] = max(stage['peak_memory_bytes'], peak)
+
+    def stage(self, function):
+        """ Decorator that measures every call of a function as a stage named
+        after its module and qualified name.
+
+        Args:
+            function (function): function to measure.
+
+        Returns:
+            function: the wrapped function.
+        """
+        name = f'{function.__module__}.{function.__qualname__}'
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not self.enabled:
+                return function(*args, **kwargs)
+            with self.span(name):
+                return function(*args, **kwargs)
+        return wrapper
+
+    def report(self):
+        """ Summarises the collected statistics.
+
+        Returns:
+            dict: run information and statistics per stage, slowest first.
+        """
+        stages = {}
+        for name, stage in sorted(self.stages.items(),
+                                  key=lambda item: -item[1]['total_s']):
+            stages[name] = dict(stage, mean_s=stage['total_s'] / stage['calls'])
+        return {'pid': os.getpid(), 'start_time': self.start_time,
+                'wall_time_s': time.time() - self.start_time,
+                'memory_traced': self.memory, 'stages': stages}
+
+    def write_report(self, folder='user_files/results/'):
+        """ Saves the report as json and the cProfile statistics of each
+        profiled stage as .prof file, which can be read with pstats or
+        snakeviz. Nothing is saved when no stage was measured.
+
+        Args:
+            folder (str, optional): folder of the files.
+            Defaults to 'user_files/results/'.
+
+        Returns:
+            str: name of the report file, None if nothing was saved.
+        """
+        if not self.stages:
+            return None
+        base = f'{folder}profile_{time.strftime("%Y_%m_%d_%H%M%S")}_' \
+            f'{os.getpid()}'
+        for name, profile in self.profiles.items():
+            profile.dump_stats(f'{base}_{name}.prof')
+        with open(f'{base}.json', 'w') as file:
+            json.dump(self.report(), file, indent=1)
+        return f'{base}.json'
+
+
+PROFILER = StageProfiler()
+enable = PROFILER.enable
+disable = PROFILER.disable
+span = PROFILER.span
+stage = PROFILER.stage
+write_report = PROFILER.write_report
+
+
+def enable_from_environment(variable='SF_PROFILE'):
+    """ Enables profiling when the environment variable is set, and writes
+    the report when the process exits.
+
+    Args:
+        variable (str, optional): name of the environment variable.
+        Defaults to 'SF_PROFILE'.
+    """
+    value = os.environ.get(variable, '')
+    if value in ['', '0']:
+        return
+    profile = [] if value == '1' else value.split(',')
+    enable(profile=profile)
+    Finalize(None, write_report, exitpriority=10)  # at exit
+    register_after_fork(PROFILER, report_worker)
+
+
+def report_worker(profiler):
+    """ Only reports the stages of a multiprocessing worker, when it exits.
+
+    Args:
+        profiler (StageProfiler): profiler of the worker process.
+    """
+    profiler.reset()
+    Finalize(None, profiler.write_report, exitpriority=10)
+
+
+enable_from_environment()
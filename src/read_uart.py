@@ -56,6 +56,20 @@ class ReadUart():
             private_data += bytearray(read_next)  # add extra bytes to the end
         return private_data
 
+    def reset_input_buffer(self):
+        """ Discards the bytes waiting to be read, e.g. received while the
+        board was busy.
+        """
+        self.uart.reset_input_buffer()
+
+    def backlog(self):
+        """ Number of bytes waiting to be read.
+
+        Returns:
+            int: bytes in the input buffer of the UART.
+        """
+        return self.uart.in_waiting
+
     def extract_emg_data(self, private_data):
         """ Extracts the EMG data from the byte array and converts the bytes
         to integers.
@@ -0,0 +1,120 @@
+"""
+ * @author Myrthe Tilleman
+ * @email metill@utu.fi
+ * @create date 2026-10-19 10:02:18
+ * @desc Renders all result figures without opening any windows. Uses the Agg
+ backend and renders each figure job in a separate process, saving the .pdf
+ and .tex files under /user_files/results/.
+"""
+
+import matplotlib
+
+matplotlib.use('Agg')  # before any figure is created, also in the workers
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from plot_results import plot_confusion_matrix
+from plot_subjective_measures import AnalyseSubjectiveMeasures
+from plot_symmetry import AnalyseGaitData
+from postprocessing import simulate_online, visualise_data
+
+
+def render_replay(user, emg_folder, data_folder, data_file, from_log=True,
+                  max_points=None):
+    """ Replays a recording and saves the raw, normalised, and level figures.
+
+    Args:
+        user (str): user name / number.
+        emg_folder (str): date of the emg calibration.
+        data_folder (str): date of the recorded file.
+        data_file (str): name of the recorded file.
+        from_log (bool, optional): whether the data comes from a Toolbox log.
+        Defaults to True.
+        max_points (int, optional): number of points per series to downsample
+        to. Defaults to None.
+    """
+    raw, normal = simulate_online(user, emg_folder, data_folder, data_file,
+                                  from_log=from_log)
+    visualise_data(raw, normal, data_file, all=True, max_points=max_points,
+                   show=False)
+
+
+def render_confusion_matrix(users, dates):
+    """ Saves the confusion matrices of the combined users and dates.
+
+    Args:
+        users (list of str): user names / numbers.
+        dates (list of str): dates of the validation sessions.
+    """
+    plot_confusion_matrix(users, dates, show=False)
+
+
+def render_asi(user, date, prosthetic_side):
+    """ Saves the absolute symmetry index figure of one session.
+
+    Args:
+        user (str): user name / number.
+        date (str): date of the treadmill session.
+        prosthetic_side (str): 'L' or 'R'.
+    """
+    gait = AnalyseGaitData(user, date, prosthetic_side)
+    gait.plot_asi(gait.get_symmetry_data())
+
+
+def render_subjective_measures(users):
+    """ Saves the subjective measures figures and statistics of the users.
+    The statistics run in the worker process of the job. All users are one
+    job, because they share Subjective_measures_statistics.csv: a job per
+    user would overwrite the results of the other users.
+
+    Args:
+        users (list of str): user names / numbers.
+    """
+    AnalyseSubjectiveMeasures().analyse_data(users, processes=1)
+
+
+def render_all(jobs, processes=None):
+    """ Renders the figure jobs in parallel, one job per process at a time.
+    A failing job does not stop the other jobs.
+
+    Args:
+        jobs (list): list of (function, args) tuples, e.g.
+        (render_asi, ('U401', '2023_04_25', 'R')).
+        processes (int, optional): number of worker processes. Defaults to the
+        number of cores.
+
+    Returns:
+        list: (function name, args, error message or None) for each job.
+    """
+    results = []
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = {executor.submit(function, *args): (function, args)
+                   for function, args in jobs}
+        for future in as_completed(futures):
+            function, args = futures[future]
+            error = future.exception()
+            results.append((function.__name__, args,
+                            None if error is None else repr(error)))
+    return results
+
+
+if __name__ == '__main__':
+    validation_users = ['U401', 'U412', 'U747']
+    validation_dates = ['2023_04_25', '2023_04_26', '2023_05_03']
+
+    gait_users = ['U401', 'U412', 'U412', 'U412', 'U747']
+    gait_dates = ['2023_04_25', '2023_04_26', '2023_04_27', '2023_04_28',
+                  '2023_05_03']
+    prosthetic_sides = ['R', 'L', 'L', 'L', 'R']
+
+    recordings = [('U401', '2023_03_17', '2023_03_17', 'plantar_flexion.csv',
+                   False, 2000)]
+
+    jobs = [(render_confusion_matrix, (validation_users, validation_dates))]
+    jobs += [(render_asi, session) for session in zip(
+        gait_users, gait_dates, prosthetic_sides)]
+    jobs += [(render_subjective_measures, (validation_users,))]
+    jobs += [(render_replay, recording) for recording in recordings]
+
+    for name, args, error in render_all(jobs):
+        print(name, args, 'done' if error is None else f'failed: {error}')
@@ -0,0 +1,152 @@
+"""
+ * @author Myrthe Tilleman
+ * @email metill@utu.fi
+ * @create date 2026-10-19 12:40:12
+ * @desc Stand-in for ReadUart that replays recorded EMG values as UART frames,
+ so code for the microprocessor can be run and tested on the laptop.
+ The frames have the same layout as the frames of the Panda: the starting
+ byte, the EMG data of flexion and extension from the start_num_bytes byte,
+ padded to array_length bytes.
+"""
+
+import csv
+import struct
+
+STARTING_BYTE = b'\xaa\n\xb1'
+
+
+def build_frame(flex, extend, array_length=14, data_num_bytes=2,
+                start_num_bytes=8):
+    """ Creates a UART frame with the EMG data of both muscles.
+
+    Args:
+        flex (int): EMG value of the flexion muscle.
+        extend (int): EMG value of the extension muscle.
+        array_length (int, optional): number of bytes of a frame.
+        Defaults to 14.
+        data_num_bytes (int, optional): number of bytes per EMG value, 2 for
+        integers and 4 for floats. Defaults to 2.
+        start_num_bytes (int, optional): bytes before the EMG data.
+        Defaults to 8.
+
+    Returns:
+        bytearray: frame of array_length bytes.
+    """
+    data_type = 'h' if data_num_bytes == 2 else 'f'
+    frame = bytearray(array_length)
+    frame[:len(STARTING_BYTE)] = STARTING_BYTE
+    if data_type == 'h':
+        flex, extend = int(flex), int(extend)
+    struct.pack_into(data_type * 2, frame, start_num_bytes, flex, extend)
+    return frame
+
+
+class ReplayUart():
+    def __init__(self, samples, array_length=14, data_num_bytes=2,
+                 start_num_bytes=8):
+        """ Replays samples with the same methods as ReadUart.
+
+        Args:
+            samples (iterable): (flex, extend) EMG values.
+            array_length (int, optional): number of bytes of a frame.
+            Defaults to 14.
+            data_num_bytes (int, optional): number of bytes per EMG value.
+            Defaults to 2.
+            start_num_bytes (int, optional): bytes before the EMG data.
+            Defaults to 8.
+        """
+        self.num_variables = 2  # EMG_Flex, EMG_Extend
+        self.array_length = array_length
+        self.data_num_bytes = data_num_bytes
+        self.start_num_bytes = start_num_bytes
+        self.data_type = 'h' if data_num_bytes == 2 else 'f'
+
+        self.samples = iter(samples)
+        self.finished = False
+
+    @classmethod
+    def from_csv(cls, path, flex='BSMB_MUSCLE_FLEX',
+                 extend='BSMB_MUSCLE_EXTEND', **kwargs):
+        """ Replays a csv file with a column for each muscle, e.g. a file
+        created with convert_txt.py. Rows with missing values are skipped.
+
+        Args:
+            path (str): path of the csv file.
+            flex (str, optional): column with the flexion data.
+            Defaults to 'BSMB_MUSCLE_FLEX'.
+            extend (str, optional): column with the extension data.
+            Defaults to 'BSMB_MUSCLE_EXTEND'.
+
+        Returns:
+            ReplayUart: replay of the file.
+        """
+        def read_rows():
+            with open(path, 'r', newline='') as file:
+                for row in csv.DictReader(file):
+                    if row[flex] and row[extend]:
+                        yield float(row[flex]), float(row[extend])
+        return cls(read_rows(), **kwargs)
+
+    @classmethod
+    def from_data_frame(cls, data_frame, flex='BSMB_MUSCLE_FLEX',
+                        extend='BSMB_MUSCLE_EXTEND', **kwargs):
+        """ Replays a data frame, e.g. a Toolbox log loaded with extract_data.
+        Rows with missing values are skipped.
+
+        Args:
+            data_frame (data frame): data frame with a column for each muscle.
+            flex (str, optional): column with the flexion data.
+            Defaults to 'BSMB_MUSCLE_FLEX'.
+            extend (str, optional): column with the extension data.
+            Defaults to 'BSMB_MUSCLE_EXTEND'.
+
+        Returns:
+            ReplayUart: replay of the data frame.
+        """
+        data = data_frame[[flex, extend]].dropna()
+        return cls(data.itertuples(index=False, name=None), **kwargs)
+
+    def get_serial_data(self):
+        """ Returns the next frame, like ReadUart.get_serial_data.
+
+        Returns:
+            bytearray: frame, empty when all samples have been replayed.
+        """
+        try:
+            flex, extend = next(self.samples)
+        except StopIteration:
+            self.finished = True
+            return bytearray()
+        return build_frame(flex, extend, self.array_length,
+                           self.data_num_bytes, self.start_num_bytes)
+
+    def reset_input_buffer(self):
+        """ Like ReadUart.reset_input_buffer, nothing is waiting in a replay.
+        """
+
+    def backlog(self):
+        """ Number of bytes waiting to be read, like ReadUart.backlog.
+
+        Returns:
+            int: always 0, the next frame is created when it is read.
+        """
+        return 0
+
+    def extract_emg_data(self, private_data):
+        """ Extracts the EMG data from the frame, like
+        ReadUart.extract_emg_data.
+
+        Args:
+            private_data (bytearray): byte array of array_length
+
+        Returns:
+            list: emg data for flex and extend muscle
+        """
+        emg = private_data[
+            self.start_num_bytes:
+            self.start_num_bytes + self.data_num_bytes * self.num_variables]
+        emg_data = [emg[:self.data_num_bytes], emg[self.data_num_bytes:]]
+
+        emg_value = [struct.unpack(self.data_type, data)[0]
+                     for data in emg_data]
+        return emg_value
@@ -0,0 +1,205 @@
+"""
+ * @author Myrthe Tilleman
+ * @email metill@utu.fi
+ * @create date 2026-10-19 14:21:09
+ * @desc Bootstrap confidence intervals and permutation tests for the strict
+ accuracy, loose accuracy, and recall per level of the feedback validation.
+ All resamples are drawn at once as arrays. Resampling is done within each
+ session and true level, as each level is presented a fixed number of times.
+"""
+
+import numpy as np
+import pandas as pd
+
+from label_counts import LEVELS, cohort_counts, session_counts
+from profiling import stage
+
+LOOSE = np.sign(LEVELS)[:, None] == np.sign(LEVELS)[None, :]
+
+
+def measures(counts):
+    """ Calculates the strict accuracy, loose accuracy, and recall per level
+    of one or many count matrices.
+
+    Args:
+        counts (array): counts, (... x) true level x predicted level.
+
+    Returns:
+        array: strict, loose, and recall per level in the last dimension.
+    """
+    counts = np.asarray(counts, dtype=float)
+    totals = counts.sum(axis=(-2, -1))
+    correct = np.diagonal(counts, axis1=-2, axis2=-1)
+    level_totals = counts.sum(axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        strict = correct.sum(axis=-1) / totals
+        loose = (counts * LOOSE).sum(axis=(-2, -1)) / totals
+        recall = correct / level_totals
+    return np.concatenate([strict[..., None], loose[..., None], recall],
+                          axis=-1)
+
+
+def measure_names():
+    """ Names of the values returned by measures.
+
+    Returns:
+        list: measure names.
+    """
+    return ['strict accuracy', 'loose accuracy'] + [
+        f'recall level {level}' for level in LEVELS]
+
+
+def bootstrap_counts(counts, n_resamples=10000, rng=None):
+    """ Draws bootstrap count matrices. The trials of each session and true
+    level are resampled with replacement, so the number of presentations per
+    level stays the same.
+
+    Args:
+        counts (array): counts per session, (sessions x) true level x
+        predicted level.
+        n_resamples (int, optional): number of resamples. Defaults to 10000.
+        rng (Generator, optional): random generator. Defaults to None.
+
+    Returns:
+        array: resampled cohort counts, resamples x true x predicted level.
+    """
+    rng = np.random.default_rng(rng)
+    counts = np.asarray(counts, dtype=np.int64)
+    if counts.ndim == 2:
+        counts = counts[None]
+    totals = counts.sum(axis=-1)
+    probabilities = np.divide(
+        counts, totals[..., None], out=np.full(counts.shape, 1 / len(LEVELS)),
+        where=totals[..., None] > 0)
+
+    resampled = rng.multinomial(totals, probabilities,
+                                size=(n_resamples,) + totals.shape)
+    return resampled.sum(axis=1)
+
+
+@stage
+def bootstrap_accuracy(counts, n_resamples=10000, confidence=0.95,
+                       seed=None):
+    """ Calculates percentile bootstrap confidence intervals.
+
+    Args:
+        counts (array): counts per session, (sessions x) true level x
+        predicted level.
+        n_resamples (int, optional): number of resamples. Defaults to 10000.
+        confidence (float, optional): confidence level. Defaults to 0.95.
+        seed (int, optional): seed of the random generator. Defaults to None.
+
+    Returns:
+        DataFrame: estimate and lower and upper bound per measure.
+    """
+    counts = np.asarray(counts)
+    total_counts = counts if counts.ndim == 2 else counts.sum(axis=0)
+    resampled = measures(bootstrap_counts(counts, n_resamples, seed))
+
+    alpha = (1 - confidence) / 2
+    lower, upper = np.nanquantile(resampled, [alpha, 1 - alpha], axis=0)
+    return pd.DataFrame({'Estimate': measures(total_counts), 'Lower': lower,
+                         'Upper': upper}, index=measure_names())
+
+
+def expand_counts(counts):
+    """ Creates the true and predicted label of every trial from the counts.
+
+    Args:
+        counts (array): counts per session, sessions x true x predicted level.
+
+    Returns:
+        array, array, array: session, true level, and predicted level index
+        of each trial.
+    """
+    session, true, predicted = np.nonzero(counts)
+    repeats = counts[session, true, predicted]
+    return (np.repeat(session, repeats), np.repeat(true, repeats),
+            np.repeat(predicted, repeats))
+
+
+@stage
+def permutation_test(counts, n_resamples=10000, seed=None):
+    """ Tests whether the accuracy is above chance by shuffling the predicted
+    levels within each session. All permutations are drawn at once by sorting
+    random keys that are offset by the session number.
+
+    Args:
+        counts (array): counts per session, (sessions x) true level x
+        predicted level.
+        n_resamples (int, optional): number of permutations.
+        Defaults to 10000.
+        seed (int, optional): seed of the random generator. Defaults to None.
+
+    Returns:
+        DataFrame: observed value, 95th percentile of the chance
+        distribution, and p-value per measure.
+    """
+    rng = np.random.default_rng(seed)
+    counts = np.asarray(counts, dtype=np.int64)
+    if counts.ndim == 2:
+        counts = counts[None]
+    session, true, predicted = expand_counts(counts)
+
+    keys = rng.random((n_resamples, len(session))) + session
+    shuffled = predicted[np.argsort(keys, axis=1)]
+
+    num_levels = len(LEVELS)
+    cells = true * num_levels + shuffled
+    offset = np.arange(n_resamples)[:, None] * num_levels ** 2
+    permuted = np.bincount((cells + offset).ravel(),
+                           minlength=n_resamples * num_levels ** 2)
+    permuted = measures(permuted.reshape(n_resamples, num_levels, num_levels))
+
+    observed = measures(counts.sum(axis=0))
+    exceed = (permuted >= observed).sum(axis=0)
+    return pd.DataFrame({
+        'Observed': observed,
+        'Chance 95%': np.nanquantile(permuted, 0.95, axis=0),
+        'P-value': (exceed + 1) / (n_resamples + 1)}, index=measure_names())
+
+
+def validation_report(users, dates, criterion=0.9, n_resamples=10000,
+                      confidence=0.95, seed=None):
+    """ Calculates confidence intervals and p-values for each session and for
+    all sessions combined. A measure passes when the lower bound of its
+    confidence interval reaches the criterion.
+
+    Args:
+        users (list of str): user names / numbers.
+        dates (list of str): dates of the validation sessions.
+        criterion (float, optional): accuracy needed to pass.
+        Defaults to 0.9.
+        n_resamples (int, optional): number of resamples. Defaults to 10000.
+        confidence (float, optional): confidence level. Defaults to 0.95.
+        seed (int, optional): seed of the random generator. Defaults to None.
+
+    Returns:
+        DataFrame: results per session and measure.
+    """
+    sessions = [(user, date, session_counts(user, date)[None])
+                for user, date in zip(users, dates)]
+    sessions.append(('all', 'all', np.stack([
+        counts[0] for _, _, counts in sessions])))
+
+    reports = []
+    for user, date, counts in sessions:
+        report = bootstrap_accuracy(counts, n_resamples, confidence, seed)
+        report = report.join(permutation_test(counts, n_resamples, seed)[
+            ['Chance 95%', 'P-value']])
+        report['Passes'] = report['Lower'] >= criterion
+        report.insert(0, 'Date', date)
+        report.insert(0, 'User', user)
+        reports.append(report.rename_axis('Measure').reset_index())
+    return pd.concat(reports, ignore_index=True)
+
+
+if __name__ == '__main__':
+    users = ['U401', 'U412', 'U747']
+    dates = ['2023_04_25', '2023_04_26', '2023_05_03']
+
+    report = validation_report(users, dates, seed=0)
+    report.to_csv('user_files/results/validation_confidence_intervals.csv',
+                  index=False)
+    print(report[report['Measure'].str.contains('accuracy')])
+    print(cohort_counts(users, dates))
@@ -5,21 +5,35 @@
  * @desc Run this script as code.py on the Seeed board with CircuitPython.
 """
 
-import asyncio
-import gc
+from boot_profile import BootProfiler
 
-from activate_vibration_motors import ActivateVibrationMotor
-from preprocessing import PreprocessEMG
-from read_uart import ReadUart
+BOOT = BootProfiler()  # timestamps the imports and initialisation
 
+import asyncio  # noqa: E402
 
-async def check_serial_input(read_uart, process_EMG, motors):
+BOOT.mark('import asyncio')
+from read_uart import ReadUart  # noqa: E402
+
+BOOT.mark('import read_uart')
+from activate_vibration_motors import ActivateVibrationMotor  # noqa: E402
+
+BOOT.mark('import activate_vibration_motors')
+from boot_cache import load_calibration  # noqa: E402
+from gc_policy import GcPolicy  # noqa: E402
+from preprocessing import PreprocessEMG  # noqa: E402
+from vibration_patterns import PatternPlayer, level_patterns  # noqa: E402
+
+BOOT.mark('import others')
+
+
+async def check_serial_input(read_uart, process_EMG, motors, gc_policy):
     """ Task 1: Poll for emg signals and process them when it is available.
 
     Args:
         read_uart (Class): ReadUart instance.
         process_EMG (Class): PreprocessEMG instance.
         motors (Class): ActivateVibrationMotor instance.
+        gc_policy (Class): GcPolicy instance.
     """
     while True:
         data = read_uart.get_serial_data()
@@ -32,11 +46,45 @@ async def check_serial_input(read_uart, process_EMG, motors):
                 level = process_EMG.define_dominant_muscle(normal)
                 motors.vibrator_level = motors.level_list[level + 4]
                 motors.pin_on_index = motors.vibrator_level["PIN_INDEX"]
+                BOOT.finish()
             else:
+                process_EMG.reset_prediction()
                 motors.vib_count = 0
                 motors.prev_count = 0
                 motors.prev_level = None
                 motors.pin_on_index = []
+        if not motors.vib_emg:  # motors stay off until the next level
+            gc_policy.idle(float('inf'), read_uart.backlog())
+        gc_policy.check()  # also without data, polling allocates
+        await asyncio.sleep(0)
+
+
+async def select_pattern(read_uart, process_EMG, player, patterns,
+                         gc_policy):
+    """ Task 1 with compiled patterns: Poll for emg signals and play the
+    pattern of the level when it is available.
+
+    Args:
+        read_uart (Class): ReadUart instance.
+        process_EMG (Class): PreprocessEMG instance.
+        player (Class): PatternPlayer instance.
+        patterns (list): Pattern per level, see level_patterns.
+        gc_policy (Class): GcPolicy instance.
+    """
+    while True:
+        data = read_uart.get_serial_data()
+        if len(data) > 11:  # update level when data is available
+            emg_value = read_uart.extract_emg_data(data)
+            normal = process_EMG.normalise_data_MVC(emg_value)
+
+            if process_EMG.threshold_reached(normal):
+                level = process_EMG.define_dominant_muscle(normal)
+                player.play(patterns[level + 4])
+                BOOT.finish()
+            else:
+                process_EMG.reset_prediction()
+                player.stop()
+        gc_policy.check()  # also without data, polling allocates
         await asyncio.sleep(0)
 
 
@@ -62,9 +110,22 @@ async def activate_motors(motors):
 
 async def online_feedback_loop(
         user, feedback_folder, emg_folder,
-        threshold_file='perceptual_threshold.csv', left_leg=True):
+        threshold_file='perceptual_threshold.csv', left_leg=True,
+        compiled_patterns=True, prediction_horizon=0):
     """ Online processing of incoming EMG signals and activates the vibration
     motors accordingly. Creates two asyncio tasks and runs these alternately.
+    With compiled patterns, the feedback of each level is compiled before
+    the start and played by one PatternPlayer task.
+    Automatic garbage collection is disabled during the feedback, see
+    GcPolicy. The heap is collected when the motors are off and no data is
+    waiting, or when the free heap gets too low.
+    With a prediction horizon, the level is predicted ahead, see
+    PreprocessEMG.set_prediction, and a compiled pattern is interrupted during
+    its off time when the level changes.
+    The calibration files are read from one precomputed cache file, see
+    boot_cache. The UART input is discarded after the initialisation, so the
+    feedback starts with recent data. The time of each phase until the first
+    vibration is saved by BOOT, see BootProfiler.
 
     Args:
         user (str): user name or number, folder where all user files are saved.
@@ -74,21 +135,55 @@ async def online_feedback_loop(
         vibration for each level. Defaults to 'perceptual_threshold.csv'.
         left_leg (bool, optional): Whether the motors are placed on the left or
         right leg. Defaults to True.
+        compiled_patterns (bool, optional): Whether to play compiled patterns
+        instead of switching the motors with check_time_to_change.
+        Defaults to True.
+        prediction_horizon (float, optional): time (in seconds) the level is
+        predicted ahead, 0 uses the level of the newest frame. Defaults to 0.
     """
     read_uart = ReadUart()
+    BOOT.mark('ReadUart')
 
-    motors = ActivateVibrationMotor(user, feedback_folder, left_leg)
-    motors.set_thresholds(threshold_file)
-
-    process_EMG = PreprocessEMG(user, emg_folder, extend=1, flex=0)
+    path = f'user_files/{user}/'
+    thresholds, mvc, rest = load_calibration([
+        f'{path}{feedback_folder}/{threshold_file}',
+        f'{path}{emg_folder}/mvc.csv',
+        f'{path}{emg_folder}/rest_activity.csv'],
+        f'{path}boot_calibration.csv')
+    BOOT.mark('load_calibration')
 
-    emg_collection_task = asyncio.create_task(
-        check_serial_input(read_uart, process_EMG, motors))
-
-    vibration_task = asyncio.create_task(activate_motors(motors))
-    gc.collect()
-
-    await asyncio.gather(emg_collection_task, vibration_task)
+    motors = ActivateVibrationMotor(user, feedback_folder, left_leg)
+    BOOT.mark('ActivateVibrationMotor')
+    motors.set_thresholds(threshold_file, thresholds)
+
+    process_EMG = PreprocessEMG(user, emg_folder, extend=1, flex=0,
+                                calibration={'mvc.csv': mvc,
+                                             'rest_activity.csv': rest})
+    process_EMG.set_prediction(prediction_horizon)
+    BOOT.mark('PreprocessEMG')
+
+    gc_policy = GcPolicy()
+
+    if compiled_patterns:
+        player = PatternPlayer(motors.pins, lambda duration: gc_policy.idle(
+            duration, read_uart.backlog()), prediction_horizon > 0)
+        patterns = level_patterns(motors)
+        BOOT.mark('level_patterns')
+        emg_collection_task = asyncio.create_task(select_pattern(
+            read_uart, process_EMG, player, patterns, gc_policy))
+        vibration_task = asyncio.create_task(player.run())
+    else:
+        emg_collection_task = asyncio.create_task(
+            check_serial_input(read_uart, process_EMG, motors, gc_policy))
+        vibration_task = asyncio.create_task(activate_motors(motors))
+
+    gc_policy.start()
+    read_uart.reset_input_buffer()  # frames received during the boot
+    try:
+        await asyncio.gather(emg_collection_task, vibration_task)
+    finally:
+        gc_policy.stop()
+        print('garbage collections', gc_policy.counters)
 
 
 if __name__ == '__main__':
@@ -97,6 +192,9 @@ if __name__ == '__main__':
     emg_calibration = '2023_02_24'
     threshold_file = 'perceptual_thresholds - Copy.csv'
     left_leg = True
+    compiled_patterns = True
+    prediction_horizon = 0  # seconds, e.g. 0.1 to predict the level
 
     asyncio.run(online_feedback_loop(
-        user, feedback_calibration, emg_calibration, threshold_file, left_leg))
+        user, feedback_calibration, emg_calibration, threshold_file, left_leg,
+        compiled_patterns, prediction_horizon))
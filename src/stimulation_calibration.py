@@ -7,18 +7,19 @@
 """
 
 import asyncio
-import time
 
 from activate_vibration_motors import ActivateVibrationMotor
 from utils import mean, write_file
 
 
-def calibration_loop(motors):
+async def calibration_loop(motors):
     """ Increases vibration of vibrator_level with 1 ms at a time with
     intervals of 2 s on, 1 s off. User is asked to confirm continuation to the
     next level and for each step. When the user starts to feel the vibration
     clearly with an intensity of 2/10, i.e. the perceptual threshold is
     reached, input is given by the user and the level is returned.
+    Runs in the event loop of calibration_session. The next step is prepared
+    before the input of the user is asked.
     Based on Chee et al. 2022, and Tchimino et al. 2022
 
     Args:
@@ -28,33 +29,91 @@ def calibration_loop(motors):
         float: vibration_time from the moment the loop is broken
     """
     input('Press enter when you are ready to start the next round\n')
-    vibration_time = 0  # ms
-    on = 0
+    vibration_time = 1  # ms
+    motors.vibrator_level["VIBRATION_TIME"] = vibration_time / 1000
     while True:
-        on += 1
-        vibration_time = on  # increase duration by 1ms
         print(vibration_time, 'ms')
-        motors.vibrator_level["VIBRATION_TIME"] = vibration_time / 1000
-
         motors.prev_level = None  # so off_time is not adjusted
-        asyncio.run(motors.vibrate_motor(2))
+        await motors.vibrate_motor(2)
+
+        perception = vibration_time
+        vibration_time += 1  # increase duration by 1ms
+        motors.vibrator_level["VIBRATION_TIME"] = vibration_time / 1000
 
         user_input = input(
             'Enter a key when the vibration had an intensity of 2/10\n')
         if user_input != '':
-            perception = vibration_time
             break  # when perceptual threshold is reached
-        time.sleep(1)  # pause for 1 second
+        await asyncio.sleep(1)  # pause for 1 second
     return perception
 
 
-if __name__ == '__main__':
-    user = 'U747'
-    date = '2023_04_17'  # make sure this folder exists
-    repeat = 2  # repeat the calibration 5 times
-    left_leg = True
+async def staircase_loop(motors, start=32, step=16, max_trials=20):
+    """ Finds the perceptual threshold with an adaptive up/down staircase.
+    After each stimulus of 2 s, the user answers whether the vibration had
+    an intensity of at least 2/10. The duration goes down when it was felt
+    and up when it was not. The step is halved at each reversal, so the
+    search ends after logarithmically many trials, when the step is below
+    1 ms or after max_trials.
 
-    motors = ActivateVibrationMotor(user, date, left_leg)
+    Args:
+        motors (class): instance from ActivateVibrationMotor
+        start (int, optional): first vibration time in ms. Defaults to 32.
+        step (int, optional): first step size in ms. Defaults to 16.
+        max_trials (int, optional): maximum number of stimuli.
+        Defaults to 20.
+
+    Returns:
+        int: shortest vibration time (ms) that was felt, the last vibration
+        time when none was felt.
+    """
+    input('Press enter when you are ready to start the next round\n')
+    vibration_time = max(1, start)
+    perception = None
+    prev_felt = None
+
+    for _ in range(max_trials):
+        print(vibration_time, 'ms')
+        motors.vibrator_level["VIBRATION_TIME"] = vibration_time / 1000
+        motors.prev_level = None  # so off_time is not adjusted
+        await motors.vibrate_motor(2)
+
+        felt = input('Enter a key when the vibration had an intensity of at '
+                     'least 2/10, press enter when it was weaker\n') != ''
+        if felt and (perception is None or vibration_time < perception):
+            perception = vibration_time
+        if felt and vibration_time == 1:
+            break  # shortest vibration time is felt
+        if prev_felt is not None and felt != prev_felt:
+            step //= 2  # reversal
+        if step < 1:
+            break
+        prev_felt = felt
+
+        vibration_time = max(1, vibration_time - step if felt else
+                             vibration_time + step)
+        await asyncio.sleep(1)  # pause for 1 second
+
+    if perception is None:
+        print('Perceptual threshold not reached.')
+        perception = vibration_time
+    return perception
+
+
+async def calibration_session(motors, repeat, adaptive=True):
+    """ Finds the perceptual threshold of each level repeat times, all in one
+    asyncio event loop. With the adaptive staircase, the repetitions start
+    at the previous threshold of the level with a smaller step.
+
+    Args:
+        motors (class): instance from ActivateVibrationMotor
+        repeat (int): number of times the calibration is repeated.
+        adaptive (bool, optional): Whether to use staircase_loop instead of
+        increasing the duration 1 ms at a time. Defaults to True.
+
+    Returns:
+        list: list of perceptual thresholds (ms) per level.
+    """
     thresholds = [[] for _ in motors.level_list]
 
     for _ in range(repeat):
@@ -63,9 +122,27 @@ if __name__ == '__main__':
             motors.set_motor_value(vibrator_level["PIN"], False)  # turn off
             motors.vibrator_level = vibrator_level
 
-            perception = calibration_loop(motors)
+            if not adaptive:
+                perception = await calibration_loop(motors)
+            elif thresholds[index]:
+                perception = await staircase_loop(
+                    motors, start=thresholds[index][-1], step=4)
+            else:
+                perception = await staircase_loop(motors)
             thresholds[index].append(perception)
         print(thresholds)
+    return thresholds
+
+
+if __name__ == '__main__':
+    user = 'U747'
+    date = '2023_04_17'  # make sure this folder exists
+    repeat = 2  # repeat the calibration 5 times
+    left_leg = True
+    adaptive = True  # staircase instead of steps of 1 ms
+
+    motors = ActivateVibrationMotor(user, date, left_leg)
+    thresholds = asyncio.run(calibration_session(motors, repeat, adaptive))
 
     avg_thresholds = [mean(t) for t in thresholds]
     print(avg_thresholds)
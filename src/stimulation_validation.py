@@ -7,17 +7,18 @@
 """
 
 import asyncio
-import random
-import time
 
 from activate_vibration_motors import ActivateVibrationMotor
-from utils import write_file
+from stimulus_session import make_schedule, run_session
+from utils import accuracy_from_counts, count_labels, write_file
 
 
-def validation_loop(motors, validation=False, repeat=10):
+def validation_loop(motors, validation=False, repeat=10, seed=None):
     """ Loop for familiarisation and validation session. The participant is in
     a static position. Each level is activated a repeat number of times and is
     presented in a random order for 2 s followed by 1 second of rest.
+    The order is created before the session, each round contains every level
+    once. All stimuli are presented in one asyncio event loop.
     For each activation, the participant is asked to report which level was
     activated. When incorrect, the researcher provides the correct answer
     during the familiarisation session.
@@ -34,40 +35,57 @@ def validation_loop(motors, validation=False, repeat=10):
         validation session. Defaults to False.
         repeat (int, optional): Number of times each level is presented.
         Defaults to 10.
+        seed (int, optional): Seed for the order of the levels.
+        Defaults to None.
     """
-    stimulation_list = motors.level_list * repeat
+    schedule = make_schedule(len(motors.level_list), repeat, seed)
     user_answers = []
     stimulated = []
+    levels = [level_conf["LEVEL"] for level_conf in motors.level_list]
 
-    while stimulation_list:
-        if len(stimulation_list) % len(motors.level_list) == 0:
-            input(f'{int(len(stimulation_list) / len(motors.level_list))} '
-                  'more round(s) to go')
-        index = random.randrange(len(stimulation_list))
-        motors.vibrator_level = stimulation_list[index]
-        motors.prev_level = None  # so off_time is not adjusted
-        stimulation_list.pop(index)
-
-        asyncio.run(motors.vibrate_motor(2))
+    def answer(level_conf):
         if validation:
-            user = input('Enter level according to the user\n')
-            user_answers.append(int(user))
-            stimulated.append(motors.vibrator_level["LEVEL"])
+            user_answers.append(read_level(levels))
+            stimulated.append(level_conf["LEVEL"])
         else:
-            print(motors.vibrator_level["LEVEL"])
+            print(level_conf["LEVEL"])
             input('Enter to continue to next stimulus')
-        time.sleep(1)
+
+    def round_message(rounds):
+        input(f'{rounds} more round(s) to go')
+
+    asyncio.run(run_session(motors, schedule, answer,
+                            round_message=round_message))
 
     print('You are finished!\n')
     if validation:
-        calculate_accuracy(stimulated, user_answers)
-        try:
+        try:  # save the labels first, so they are kept if anything fails
             write_file(motors.path, 'true_labels.csv', stimulated)
             write_file(motors.path, 'predicted_labels.csv', user_answers)
         except OSError:
             print('Could not save the data.')
             print('True labels:', stimulated)
             print('Predicted labels:', user_answers)
+        calculate_accuracy(stimulated, user_answers)
+
+
+def read_level(levels):
+    """ Asks for the level the user felt until a valid level is entered.
+
+    Args:
+        levels (list): valid levels.
+
+    Returns:
+        int: the entered level.
+    """
+    while True:
+        user = input('Enter level according to the user\n')
+        try:
+            if int(user) in levels:
+                return int(user)
+        except ValueError:  # not a number, e.g. a typo
+            pass
+        print(f'Enter a level from {levels[0]} to {levels[-1]}')
 
 
 def calculate_accuracy(stimulation_list, user_answers):
@@ -78,16 +96,15 @@ def calculate_accuracy(stimulation_list, user_answers):
     Args:
         stimulation_list (list): True levels of the stimulus
         user_answers (list): Predicted levels of the stimulus by the user
+
+    Returns:
+        float, float: strict and loose accuracy.
     """
-    correct_strict = sum(1 for x, y in zip(stimulation_list, user_answers) if (
-        x == y))
-    correct_loose = sum(1 for x, y in zip(stimulation_list, user_answers) if (
-        (x == y) or (x < 0 and y < 0) or (x > 0 and y > 0)))
-    total = len(stimulation_list)
-    accuracy_strict = correct_strict / total
-    accuracy_loose = correct_loose / total
+    counts = count_labels(stimulation_list, user_answers)
+    accuracy_strict, accuracy_loose = accuracy_from_counts(counts)
     print(f'The strict accuracy reached is {accuracy_strict:0.2f} and \
           the loose accuracy reached is {accuracy_loose:0.2f}.')
+    return accuracy_strict, accuracy_loose
 
 
 if __name__ == '__main__':
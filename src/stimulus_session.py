@@ -0,0 +1,119 @@
+"""
+ * @author Myrthe Tilleman
+ * @email metill@utu.fi
+ * @create date 2026-10-19 14:58:30
+ * @desc Runs a session of vibration stimuli in one asyncio event loop.
+ The order of the stimuli is created before the session starts, with a seed
+ so the session can be repeated. The next stimulus is prepared before the
+ answer of the user is asked, so it starts directly after the answer.
+"""
+
+import asyncio
+import random
+
+
+class SeededRandom():
+    def __init__(self, seed):
+        """ Local random generator for CircuitPython, which has no
+        random.Random. A linear congruential generator, which is enough for
+        shuffling a schedule.
+
+        Args:
+            seed (int): seed of the generator.
+        """
+        self.state = seed & 0xFFFFFFFF
+
+    def randrange(self, stop):
+        """ Gives a random integer from 0 up to, but not including, stop.
+
+        Args:
+            stop (int): number of possible values.
+
+        Returns:
+            int: random integer.
+        """
+        self.state = (1664525 * self.state + 1013904223) & 0xFFFFFFFF
+        return ((self.state >> 16) * stop) >> 16
+
+
+def make_schedule(num_levels, repeat, seed=None, blocked=True):
+    """ Creates a balanced order of levels; each level is presented repeat
+    times. Shuffles in place with the Fisher-Yates algorithm. A seed is used
+    by a local generator, so the global random state is not changed.
+
+    Args:
+        num_levels (int): number of levels.
+        repeat (int): number of times each level is presented.
+        seed (int, optional): seed for the random order. Defaults to None.
+        blocked (bool, optional): Whether each round contains every level
+        once. Otherwise all stimuli are shuffled together. Defaults to True.
+
+    Returns:
+        list: level indices in order of presentation.
+    """
+    if seed is None:
+        rng = random
+    elif hasattr(random, 'Random'):
+        rng = random.Random(seed)
+    else:  # CircuitPython
+        rng = SeededRandom(seed)
+
+    def shuffle(items):
+        for i in range(len(items) - 1, 0, -1):
+            j = rng.randrange(i + 1)
+            items[i], items[j] = items[j], items[i]
+        return items
+
+    if blocked:
+        schedule = []
+        for _ in range(repeat):
+            schedule.extend(shuffle(list(range(num_levels))))
+        return schedule
+    return shuffle(list(range(num_levels)) * repeat)
+
+
+def prepare_stimulus(motors, level_conf):
+    """ Sets the level for the next stimulus, so it can start right away.
+
+    Args:
+        motors (class): instance from ActivateVibrationMotor
+        level_conf (dict): configuration of the level from level_list.
+    """
+    motors.vibrator_level = level_conf
+    motors.prev_level = None  # so off_time is not adjusted
+    motors.vib_count = 0
+    motors.set_motor_value(level_conf["PIN"], False)  # make sure it is off
+
+
+async def run_session(motors, schedule, answer, duration=2, pause=1,
+                      round_message=None):
+    """ Presents the stimuli of the schedule in one event loop. After each
+    stimulus, the next stimulus is prepared before answer is called.
+
+    Args:
+        motors (class): instance from ActivateVibrationMotor
+        schedule (list): level indices, see make_schedule.
+        answer (function): called with the level configuration of the
+        stimulus after each stimulus. Can block, e.g. to wait for input.
+        duration (int, optional): Time (in seconds) the motor vibrates.
+        Defaults to 2.
+        pause (int, optional): Time (in seconds) between the stimuli.
+        Defaults to 1.
+        round_message (function, optional): called with the number of rounds
+        to go at the start of each round. Defaults to None.
+    """
+    num_levels = len(motors.level_list)
+    if schedule:
+        prepare_stimulus(motors, motors.level_list[schedule[0]])
+
+    for trial, index in enumerate(schedule):
+        if round_message is not None and trial % num_levels == 0:
+            round_message((len(schedule) - trial) // num_levels)
+
+        stimulus = motors.vibrator_level
+        await motors.vibrate_motor(duration)
+
+        if trial + 1 < len(schedule):  # prepare while waiting for the answer
+            prepare_stimulus(motors, motors.level_list[schedule[trial + 1]])
+        answer(stimulus)
+        await asyncio.sleep(pause)
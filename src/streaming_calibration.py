@@ -0,0 +1,245 @@
+"""
+ * @author Myrthe Tilleman
+ * @email metill@utu.fi
+ * @create date 2026-10-19 13:02:44
+ * @desc EMG calibration on the microprocessor. Reads the EMG data from the
+ UART, calculates the rest activity and the mean of each contraction with
+ running statistics, and saves rest_activity.csv and mvc.csv directly.
+ The memory use does not depend on the length of the recording.
+ Can be run on the laptop with ReplayUart instead of ReadUart.
+"""
+
+
+class RunningStatistics():
+    def __init__(self):
+        """ Running mean, variance and maximum with Welford's algorithm.
+        """
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.maximum = None
+
+    def update(self, value):
+        """ Adds a value to the statistics.
+
+        Args:
+            value (float): new value.
+        """
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+
+    def std(self):
+        """ Calculates the sample standard deviation.
+
+        Returns:
+            float: standard deviation, 0 with less than 2 values.
+        """
+        if self.count < 2:
+            return 0.0
+        return (self.m2 / (self.count - 1)) ** 0.5
+
+
+class StreamingCalibration():
+    def __init__(self, user, date, source, sampling_rate=100,
+                 extend_name='BSMB_MUSCLE_EXTEND',
+                 flex_name='BSMB_MUSCLE_FLEX'):
+        self.path = f'user_files/{user}/{date}/'
+        self.source = source  # ReadUart or ReplayUart
+        self.sampling_rate = sampling_rate
+        self.extend = 1  # order of uart data
+        self.flex = 0
+        self.names = {self.extend: extend_name, self.flex: flex_name}
+
+        self.rest = None
+        self.mvc = {}
+        self.contractions = {}
+
+    def read_sample(self):
+        """ Waits for the next frame and extracts the EMG data.
+
+        Returns:
+            list: emg data for flex and extend muscle, None when a replayed
+            recording has ended.
+        """
+        while True:
+            data = self.source.get_serial_data()
+            if len(data) > 11:  # data is available
+                return self.source.extract_emg_data(data)
+            if getattr(self.source, 'finished', False):
+                return None
+
+    def record_rest(self, duration=12):
+        """ Calculates the rest activity. The first second is discarded and at
+        most 10 seconds are used, like EmgCalibration.calculate_rest_activity.
+
+        Args:
+            duration (int, optional): Length of the recording in seconds.
+            Defaults to 12.
+
+        Returns:
+            list: RunningStatistics of the flex and extend muscle.
+        """
+        start = self.sampling_rate
+        end = min(start + 10 * self.sampling_rate,
+                  (duration - 1) * self.sampling_rate)
+        self.rest = [RunningStatistics(), RunningStatistics()]
+
+        for sample in range(end):
+            emg_value = self.read_sample()
+            if emg_value is None:
+                break
+            if sample >= start:
+                for muscle in [self.flex, self.extend]:
+                    self.rest[muscle].update(emg_value[muscle])
+
+        if self.rest[self.flex].count < 6 * self.sampling_rate:
+            print('Total rest contraction recorded is '
+                  f'{self.rest[self.flex].count / self.sampling_rate} '
+                  'seconds. Consider recording again.')
+        return self.rest
+
+    def record_contractions(self, muscle, duration=30, num_contractions=3,
+                            on_std=10, off_std=5, min_difference=20,
+                            trim=0.5):
+        """ Detects the contractions of a muscle while they are recorded and
+        calculates the mean and maximum of each contraction.
+        A contraction starts when the EMG is on_std standard deviations above
+        the rest activity and ends below off_std standard deviations. The
+        first and last trim seconds of each contraction are left out, using
+        a small buffer of the most recent values.
+        The MVC is the average of the contraction means.
+
+        Args:
+            muscle (str): 'flexion' or 'extension'.
+            duration (int, optional): Maximum length of the recording in
+            seconds. Defaults to 30.
+            num_contractions (int, optional): Number of contractions.
+            Defaults to 3.
+            on_std (int, optional): Start threshold in rest standard
+            deviations. Defaults to 10.
+            off_std (int, optional): End threshold in rest standard
+            deviations. Defaults to 5.
+            min_difference (int, optional): Minimal difference between the
+            start threshold and the rest activity. Defaults to 20.
+            trim (float, optional): Seconds left out at the start and end of
+            each contraction. Defaults to 0.5.
+
+        Returns:
+            list: RunningStatistics of the contracted muscle per contraction.
+        """
+        index = self.flex if muscle == 'flexion' else self.extend
+        rest = self.rest[index]
+        on_level = rest.mean + max(on_std * rest.std(), min_difference)
+        off_level = rest.mean + max(off_std * rest.std(), min_difference / 2)
+
+        trim_samples = int(trim * self.sampling_rate)
+        buffer = [0.0] * trim_samples  # most recent values
+        contractions = []
+        current = None
+
+        for _ in range(duration * self.sampling_rate):
+            emg_value = self.read_sample()
+            if emg_value is None:
+                break
+            value = emg_value[index]
+
+            if current is None:
+                if value >= on_level:  # contraction starts
+                    current = RunningStatistics()
+                    length = 0
+                else:
+                    continue
+            elif value <= off_level:  # contraction ends
+                if current.count >= self.sampling_rate:
+                    contractions.append(current)
+                current = None
+                if len(contractions) == num_contractions:
+                    break
+                continue
+
+            if trim_samples:
+                # values enter the statistics once they leave the buffer
+                position = length % trim_samples
+                if length >= 2 * trim_samples:
+                    current.update(buffer[position])
+                buffer[position] = value
+            else:
+                current.update(value)
+            length += 1
+
+        if current is not None and current.count >= self.sampling_rate:
+            contractions.append(current)
+
+        if sum(c.count for c in contractions) < 6 * self.sampling_rate:
+            print('Total muscle contraction recorded is '
+                  f'{sum(c.count for c in contractions) / self.sampling_rate}'
+                  ' seconds. Consider recording again.')
+
+        self.contractions[index] = contractions
+        if contractions:
+            self.mvc[index] = sum(c.mean for c in contractions) / len(
+                contractions)
+        return contractions
+
+    def write_calibration(self, file_name, values):
+        """ Saves the calibration values in the same format as
+        EmgCalibration, so they can be loaded with PreprocessEMG.
+
+        Args:
+            file_name (str): name of the file.
+            values (dict): value for the extend and flex muscle.
+        """
+        with open(self.path + file_name, 'w') as file:
+            file.write(f'{self.names[self.extend]},{self.names[self.flex]}\n')
+            file.write(f'{values[self.extend]},{values[self.flex]}\n')
+
+    def save(self):
+        """ Saves the rest activity and MVC files.
+        """
+        if len(self.mvc) < 2:
+            raise ValueError('No contractions detected for both muscles.')
+        rest = {muscle: self.rest[muscle].mean
+                for muscle in [self.flex, self.extend]}
+        self.write_calibration('rest_activity.csv', rest)
+        self.write_calibration('mvc.csv', self.mvc)
+
+
+def calibration_session(calibration, interactive=True):
+    """ Records rest, flexion, and extension after each other and saves the
+    calibration files.
+
+    Args:
+        calibration (Class): StreamingCalibration instance.
+        interactive (bool, optional): Waits for enter before each recording.
+        Defaults to True.
+    """
+    steps = [('rest', calibration.record_rest, ()),
+             ('flexion', calibration.record_contractions, ('flexion',)),
+             ('extension', calibration.record_contractions, ('extension',))]
+    for name, record, args in steps:
+        if interactive:
+            input(f'Press enter to start recording {name}\n')
+        result = record(*args)
+        if name != 'rest':
+            print(name, [(c.mean, c.maximum) for c in result])
+
+    try:
+        calibration.save()
+    except OSError:
+        print('Could not save the data.')
+        print('Rest:', [r.mean for r in calibration.rest])
+        print('MVC:', calibration.mvc)
+
+
+if __name__ == '__main__':
+    from read_uart import ReadUart
+
+    user = 'me'
+    date = '2023_02_24'  # make sure this folder exists
+
+    calibration = StreamingCalibration(user, date, ReadUart())
+    calibration_session(calibration)
@@ -0,0 +1,253 @@
+"""
+ * @author Myrthe Tilleman
+ * @email metill@utu.fi
+ * @create date 2026-10-19 19:24:51
+ * @desc Generates synthetic EMG envelopes of the flexion and extension muscle
+ for load, scaling and soak tests. A contraction pattern, e.g. a gait cycle,
+ is repeated for the duration. The envelopes have a first order rise and
+ fall, noise, and are clipped to the bounds of the EMG values. Data is
+ generated in chunks, so hours of data can be written or streamed without
+ keeping it in memory. The data can be saved as Toolbox csv for
+ extract_data, as plain csv for simulate_online, or as UART frames with the
+ layout of ReadUart.
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.signal import lfilter, lfilter_zi
+
+from replay_uart import STARTING_BYTE
+
+# activation of (flexion, extension) as fraction of the MVC
+CONTRACTIONS = {'rest': (0.0, 0.0), 'flexion': (0.8, 0.1),
+                'extension': (0.1, 0.8), 'co-contraction': (0.5, 0.5),
+                'maximal flexion': (1.3, 0.1),  # saturates
+                'maximal extension': (0.1, 1.3)}
+GAIT_CYCLE = [('extension', 0.35), ('rest', 0.15), ('flexion', 0.3),
+              ('co-contraction', 0.1), ('rest', 0.2)]  # one stride of 1.1 s
+
+
+def contraction_levels(pattern, times):
+    """ Looks up the activation of both muscles at each time of a repeating
+    pattern.
+
+    Args:
+        pattern (list): (contraction, duration in seconds) per step, the
+        contraction is a key of CONTRACTIONS or a (flexion, extension) tuple.
+        times (array): times in seconds.
+
+    Returns:
+        array: activation of (flexion, extension) per time.
+    """
+    levels = np.array([CONTRACTIONS[contraction]
+                       if isinstance(contraction, str) else contraction
+                       for contraction, _ in pattern], dtype=float)
+    ends = np.cumsum([duration for _, duration in pattern])
+    steps = np.searchsorted(ends, times % ends[-1], side='right')
+    return levels[np.minimum(steps, len(pattern) - 1)]
+
+
+def emg_chunks(pattern=GAIT_CYCLE, duration=60, sampling_rate=100,
+               rest=(30, 30), mvc=(400, 400), noise=0.15, rise_time=0.05,
+               bounds=(0, 500), chunk_duration=60, seed=None):
+    """ Generates the EMG data chunk by chunk.
+
+    Args:
+        pattern (list, optional): contraction pattern, see
+        contraction_levels. Defaults to GAIT_CYCLE.
+        duration (float, optional): length of the data in seconds.
+        Defaults to 60.
+        sampling_rate (int, optional): samples per second. Defaults to 100.
+        rest (tuple, optional): rest activity of (flexion, extension).
+        Defaults to (30, 30).
+        mvc (tuple, optional): MVC of (flexion, extension).
+        Defaults to (400, 400).
+        noise (float, optional): standard deviation of the noise as
+        fraction of the envelope. Defaults to 0.15.
+        rise_time (float, optional): time constant (in seconds) of the rise
+        and fall of a contraction. Defaults to 0.05.
+        bounds (tuple, optional): lowest and highest EMG value, values are
+        clipped like by the Panda. Defaults to (0, 500).
+        chunk_duration (float, optional): length of a chunk in seconds.
+        Defaults to 60.
+        seed (int, optional): seed of the noise. Defaults to None.
+
+    Yields:
+        data frame: timestamp (ms), BSMB_MUSCLE_FLEX and BSMB_MUSCLE_EXTEND.
+    """
+    rng = np.random.default_rng(seed)
+    rest = np.array(rest, dtype=float)
+    mvc = np.array(mvc, dtype=float)
+    decay = np.exp(-1 / (rise_time * sampling_rate))
+    b, a = [1 - decay], [1, -decay]
+    state = None
+
+    total = int(round(duration * sampling_rate))
+    chunk_size = max(1, int(round(chunk_duration * sampling_rate)))
+    for start in range(0, total, chunk_size):
+        samples = np.arange(start, min(start + chunk_size, total))
+        activation = contraction_levels(pattern, samples / sampling_rate)
+        if state is None:  # start settled at the first contraction
+            state = lfilter_zi(b, a)[:, None] * activation[0]
+        envelope, state = lfilter(b, a, activation, axis=0, zi=state)
+
+        emg = rest + envelope * (mvc - rest)
+        emg *= 1 + noise * rng.standard_normal(emg.shape)
+        emg += rng.normal(0, noise * rest, emg.shape)  # noise at rest
+        emg = np.clip(np.round(emg), *bounds).astype(int)
+        yield pd.DataFrame({
+            'timestamp': samples * 1000 // sampling_rate,
+            'BSMB_MUSCLE_FLEX': emg[:, 0], 'BSMB_MUSCLE_EXTEND': emg[:, 1]})
+
+
+def generate_emg(*args, **kwargs):
+    """ Generates all EMG data at once, see emg_chunks for the arguments.
+
+    Returns:
+        data frame: timestamp (ms), BSMB_MUSCLE_FLEX and BSMB_MUSCLE_EXTEND.
+    """
+    return pd.concat(emg_chunks(*args, **kwargs), ignore_index=True)
+
+
+def as_chunks(data):
+    """ Allows a data frame wherever chunks are expected.
+
+    Args:
+        data (data frame or iterable): data frame or chunks of emg_chunks.
+
+    Returns:
+        iterable: chunks.
+    """
+    return [data] if isinstance(data, pd.DataFrame) else data
+
+
+def write_toolbox_csv(data, file_name):
+    """ Saves the data in the long format of the Össur Toolbox, which can be
+    read with extract_data.
+
+    Args:
+        data (data frame or iterable): data frame or chunks of emg_chunks.
+        file_name (str): path of the csv file.
+    """
+    with open(file_name, 'w', newline='') as file:
+        for index, chunk in enumerate(as_chunks(data)):
+            long = chunk.melt(id_vars='timestamp', var_name='variableType',
+                              value_name='numValue')
+            long.sort_values('timestamp', kind='stable').to_csv(
+                file, sep=';', index=False, header=index == 0)
+
+
+def write_csv(data, file_name):
+    """ Saves the data with a column per muscle, which can be read by
+    simulate_online with from_log False.
+
+    Args:
+        data (data frame or iterable): data frame or chunks of emg_chunks.
+        file_name (str): path of the csv file.
+    """
+    with open(file_name, 'w', newline='') as file:
+        for index, chunk in enumerate(as_chunks(data)):
+            chunk.to_csv(file, index=False, header=index == 0)
+
+
+def frame_bytes(chunk, array_length=14, data_num_bytes=2, start_num_bytes=8):
+    """ Converts a chunk into UART frames, the same as build_frame for each
+    sample.
+
+    Args:
+        chunk (data frame): chunk of emg_chunks.
+        array_length (int, optional): number of bytes of a frame.
+        Defaults to 14.
+        data_num_bytes (int, optional): number of bytes per EMG value, 2 for
+        integers and 4 for floats. Defaults to 2.
+        start_num_bytes (int, optional): bytes before the EMG data.
+        Defaults to 8.
+
+    Returns:
+        bytes: the frames after each other.
+    """
+    data_type = '=i2' if data_num_bytes == 2 else '=f4'
+    frames = np.zeros((len(chunk), array_length), dtype=np.uint8)
+    frames[:, :len(STARTING_BYTE)] = np.frombuffer(STARTING_BYTE, np.uint8)
+    emg = np.ascontiguousarray(
+        chunk[['BSMB_MUSCLE_FLEX', 'BSMB_MUSCLE_EXTEND']], dtype=data_type)
+    frames[:, start_num_bytes:start_num_bytes + 2 * data_num_bytes] = \
+        emg.view(np.uint8).reshape(len(chunk), -1)
+    return frames.tobytes()
+
+
+def write_frames(data, file_name, **kwargs):
+    """ Saves the data as a binary file of UART frames, see frame_bytes for
+    the keyword arguments.
+
+    Args:
+        data (data frame or iterable): data frame or chunks of emg_chunks.
+        file_name (str): path of the binary file.
+    """
+    with open(file_name, 'wb') as file:
+        for chunk in as_chunks(data):
+            file.write(frame_bytes(chunk, **kwargs))
+
+
+def stream_frames(data, write, rate=None, **kwargs):
+    """ Sends the data as UART frames, e.g. to a serial port to load the
+    board. See frame_bytes for the keyword arguments.
+
+    Args:
+        data (data frame or iterable): data frame or chunks of emg_chunks.
+        write (function): called with the bytes of each frame, e.g.
+        serial.Serial.write.
+        rate (float, optional): frames per second, as fast as possible when
+        None. Defaults to None.
+
+    Returns:
+        int: number of frames sent.
+    """
+    sent = 0
+    start = time.perf_counter()
+    for chunk in as_chunks(data):
+        frames = frame_bytes(chunk, **kwargs)
+        frame_length = len(frames) // max(1, len(chunk))
+        for index in range(0, len(frames), frame_length):
+            if rate is not None:  # wait until the frame is due
+                delay = start + sent / rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            write(frames[index:index + frame_length])
+            sent += 1
+    return sent
+
+
+def samples(data):
+    """ Yields the samples for ReplayUart, e.g.
+    ReplayUart(samples(emg_chunks(duration=3600))) for a soak test.
+
+    Args:
+        data (data frame or iterable): data frame or chunks of emg_chunks.
+
+    Yields:
+        tuple: (flex, extend) EMG values.
+    """
+    for chunk in as_chunks(data):
+        yield from chunk[['BSMB_MUSCLE_FLEX', 'BSMB_MUSCLE_EXTEND']
+                         ].itertuples(index=False, name=None)
+
+
+if __name__ == '__main__':
+    folder = 'user_files/synthetic/'
+    name = 'gait'
+    duration = 3600  # seconds
+    sampling_rate = 100
+    pattern = GAIT_CYCLE
+    seed = 1
+
+    chunks = emg_chunks(pattern, duration, sampling_rate, seed=seed)
+    write_csv(chunks, f'{folder}{name}.csv')
+
+    chunks = emg_chunks(pattern, duration, sampling_rate, seed=seed)
+    write_toolbox_csv(chunks, f'{folder}{name}_toolbox.csv')
+
+    chunks = emg_chunks(pattern, duration, sampling_rate, seed=seed)
+    write_frames(chunks, f'{folder}{name}.bin')
@@ -0,0 +1,214 @@
+"""
+ * @author Myrthe Tilleman
+ * @email metill@utu.fi
+ * @create date 2026-10-19 10:41:05
+ * @desc Evaluates many candidate level thresholds, activation thresholds, and
+ MVC percentages on recorded sessions at once. The recordings are normalised
+ once and every candidate is evaluated with array operations. Reports the
+ time spent in each level and how often the level switches per candidate.
+"""
+
+import numpy as np
+import pandas as pd
+
+from emg_store import read_recording
+from preprocessing import ACTIVATION_THRESHOLD, THRESHOLDS, PreprocessEMG
+from profiling import stage
+
+
+def normalise_recording(process_EMG, data):
+    """ Normalises all samples of a recording at once, the same way as
+    PreprocessEMG.normalise_data_MVC with an mvc_percentage of 1.0.
+    Samples with missing EMG values are removed.
+
+    Args:
+        process_EMG (Class): PreprocessEMG instance with the calibration.
+        data (data frame): recording with timestamp (s), extend, and flex
+        columns.
+
+    Returns:
+        array, array, array: timestamps, normalised extension and normalised
+        flexion.
+    """
+    data = data.dropna(subset=[process_EMG.extend, process_EMG.flex])
+    normalised = []
+    for muscle in [process_EMG.extend, process_EMG.flex]:
+        emg_value = np.clip(data[muscle].to_numpy(dtype=float),
+                            process_EMG.lower_bound, process_EMG.upper_bound)
+        full_mvc = process_EMG.normal_mvc[muscle] / process_EMG.mvc_percentage
+        normalised.append((emg_value - process_EMG.rest[muscle]) / full_mvc)
+    return data['timestamp'].to_numpy(dtype=float), *normalised
+
+
+@stage
+def load_session(user, emg_folder, data_folder, data_file,
+                 folder='user_files/', extend='BSMB_MUSCLE_EXTEND',
+                 flex='BSMB_MUSCLE_FLEX', from_log=True):
+    """ Loads and normalises a recorded session, see simulate_online.
+
+    Args:
+        user (str): user name / number, folder where all user files are saved.
+        emg_folder (str): date of the emg calibration.
+        data_folder (str): date of the recorded file to analyse.
+        data_file (str): name of the recorded file to analyse.
+        folder (str): folder where all user files are located. Defaults to
+        'user_files/'.
+        extend (str): name of column with emg data from extension muscle.
+        flex (str): name of column with emg data from flexion muscle.
+        from_log (bool): whether the data comes from a log from the panda or
+        another Össur device. Defaults to True.
+
+    Returns:
+        array, array, array: timestamps (s), normalised extension and
+        normalised flexion.
+    """
+    data_path = f'{folder}{user}/{data_folder}/{data_file}'
+    data = read_recording(data_path, from_log)
+    data['timestamp'] = (data['timestamp'] - data['timestamp'].iloc[0]) / 1000
+
+    process_EMG = PreprocessEMG(user, emg_folder, folder, extend, flex)
+    return normalise_recording(process_EMG, data)
+
+
+def candidate_grid(threshold_sets=(THRESHOLDS,), mvc_percentages=(1.0,),
+                   activation_thresholds=(ACTIVATION_THRESHOLD,)):
+    """ Creates all combinations of threshold sets, MVC percentages, and
+    activation thresholds.
+
+    Args:
+        threshold_sets (list, optional): sets of 8 increasing level
+        boundaries. Defaults to (THRESHOLDS,).
+        mvc_percentages (list, optional): MVC percentages, as a fraction.
+        Defaults to (1.0,).
+        activation_thresholds (list, optional): normalised EMG values to
+        activate feedback. Defaults to (ACTIVATION_THRESHOLD,).
+
+    Returns:
+        array, array, array: thresholds (candidates x 8), MVC percentages and
+        activation thresholds (candidates).
+    """
+    threshold_sets = np.asarray(threshold_sets, dtype=float)
+    set_index, mvc_index, activation_index = np.meshgrid(
+        np.arange(len(threshold_sets)), np.arange(len(mvc_percentages)),
+        np.arange(len(activation_thresholds)), indexing='ij')
+    return (threshold_sets[set_index.ravel()],
+            np.asarray(mvc_percentages, dtype=float)[mvc_index.ravel()],
+            np.asarray(activation_thresholds, dtype=float)[
+                activation_index.ravel()])
+
+
+def candidate_levels(extend, flex, thresholds, mvc_percentages,
+                     activation_thresholds):
+    """ Calculates the level of each sample for each candidate, following
+    PreprocessEMG.threshold_reached and define_dominant_muscle.
+    Dividing by the MVC percentage is the same as multiplying the thresholds
+    with it, so the normalised data does not change between candidates.
+
+    Args:
+        extend (array): normalised extension at an MVC percentage of 1.0.
+        flex (array): normalised flexion at an MVC percentage of 1.0.
+        thresholds (array): level boundaries (candidates x 8).
+        mvc_percentages (array): MVC percentage per candidate.
+        activation_thresholds (array): activation threshold per candidate.
+
+    Returns:
+        array: level index (candidates x samples), 0 to 8 for level -4 to 4
+        and 9 when the feedback is not active.
+    """
+    difference = extend - flex
+    strongest = np.maximum(extend, flex)
+    scaled = thresholds * mvc_percentages[:, None]
+
+    # number of boundaries below the difference, a difference equal to the
+    # lowest boundary still belongs to the lowest level
+    above = difference[None, :, None] >= scaled[:, None, :]
+    above[:, :, 0] = difference[None, :] > scaled[:, None, 0]
+    levels = above.sum(axis=2, dtype=np.int8)
+
+    active = strongest[None, :] > (
+        activation_thresholds * mvc_percentages)[:, None]
+    return np.where(active, levels, 9).astype(np.int8)
+
+
+@stage
+def sweep_thresholds(sessions, thresholds, mvc_percentages,
+                     activation_thresholds, chunk_size=64):
+    """ Evaluates all candidates on all sessions. Candidates are processed in
+    chunks to limit the memory use.
+
+    Args:
+        sessions (list): (timestamps, extend, flex) per session, see
+        load_session.
+        thresholds (array): level boundaries (candidates x 8).
+        mvc_percentages (array): MVC percentage per candidate.
+        activation_thresholds (array): activation threshold per candidate.
+        chunk_size (int, optional): number of candidates evaluated together.
+        Defaults to 64.
+
+    Returns:
+        data frame: one row per candidate with the candidate parameters, the
+        fraction of samples in each level and inactive, and the number of
+        level switches per second.
+    """
+    thresholds = np.asarray(thresholds, dtype=float)
+    mvc_percentages = np.asarray(mvc_percentages, dtype=float)
+    activation_thresholds = np.asarray(activation_thresholds, dtype=float)
+    num_candidates = len(thresholds)
+
+    counts = np.zeros((num_candidates, 10), dtype=np.int64)
+    switches = np.zeros(num_candidates, dtype=np.int64)
+    duration = 0.0
+
+    for timestamps, extend, flex in sessions:
+        if len(timestamps) == 0:
+            continue
+        duration += timestamps[-1] - timestamps[0]
+        for start in range(0, num_candidates, chunk_size):
+            end = min(start + chunk_size, num_candidates)
+            levels = candidate_levels(
+                extend, flex, thresholds[start:end],
+                mvc_percentages[start:end], activation_thresholds[start:end])
+
+            offset = np.arange(end - start)[:, None] * 10
+            counts[start:end] += np.bincount(
+                (levels + offset).ravel(), minlength=(end - start) * 10
+            ).reshape(end - start, 10)
+            switches[start:end] += np.count_nonzero(
+                levels[:, 1:] != levels[:, :-1], axis=1)
+
+    total = counts.sum(axis=1, keepdims=True)
+    occupancy = counts / np.maximum(total, 1)
+
+    results = pd.DataFrame(
+        thresholds, columns=[f'threshold {i}' for i in range(
+            thresholds.shape[1])])
+    results['mvc_percentage'] = mvc_percentages
+    results['activation_threshold'] = activation_thresholds
+    for index, level in enumerate(range(-4, 5)):
+        results[f'level {level}'] = occupancy[:, index]
+    results['inactive'] = occupancy[:, 9]
+    results['switching_rate'] = switches / duration if duration else np.nan
+    return results
+
+
+if __name__ == "__main__":
+    user = 'U401'
+    emg_calibration = '2023_03_17'
+    recordings = [('2023_03_17', 'plantar_flexion.csv')]
+    from_log = False
+
+    sessions = [load_session(user, emg_calibration, data_folder, data_file,
+                             from_log=from_log)
+                for data_folder, data_file in recordings]
+
+    scales = np.linspace(0.6, 1.4, 41)  # stretch the default boundaries
+    threshold_sets = np.asarray(THRESHOLDS)[None, :] * scales[:, None]
+    mvc_percentages = np.linspace(0.5, 1.0, 11)
+    activation_thresholds = np.linspace(0.05, 0.2, 7)
+
+    candidates = candidate_grid(
+        threshold_sets, mvc_percentages, activation_thresholds)
+    results = sweep_thresholds(sessions, *candidates)
+    results.to_csv(f'user_files/results/{user}_threshold_sweep.csv',
+                   index=False)
+    print(results.sort_values('switching_rate').head())
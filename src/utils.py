@@ -45,7 +45,19 @@ def read_file(path, file_name, data_type=[None]):
     """
     with open(path + file_name, 'r') as file:
         lines = file.read().splitlines()
+    return parse_lines(lines, data_type)
 
+
+def parse_lines(lines, data_type=[None]):
+    """ Splits the entities of the lines of a file by comma, see read_file.
+
+    Args:
+        lines (list): lines of the file.
+        data_type (str, optional): Converts to this data type. Defaults to None
+
+    Returns:
+        list: list of lists with data of each line
+    """
     data = []
     if len(lines) != len(data_type):
         data_type = data_type * int(len(lines) / len(data_type))
@@ -63,13 +75,47 @@ def read_file(path, file_name, data_type=[None]):
     return data
 
 
-def tikzplotlib_fix_ncols(obj):
+def count_labels(true_labels, predicted_labels, num_levels=9):
+    """ Counts how often each true level was predicted as each level.
+    Levels are centred around 0, e.g. -4 to 4 for 9 levels.
+
+    Args:
+        true_labels (list): true levels.
+        predicted_labels (list): predicted levels.
+        num_levels (int, optional): number of levels. Defaults to 9.
+
+    Returns:
+        list: list of lists with counts, true level x predicted level.
+
+    Raises:
+        ValueError: if a level is out of range.
     """
-    workaround for matplotlib 3.6 renamed legend's _ncol to _ncols,
-    which breaks tikzplotlib
-    https://github.com/nschloe/tikzplotlib/issues/557
+    offset = num_levels // 2
+    counts = [[0] * num_levels for _ in range(num_levels)]
+    for true, predicted in zip(true_labels, predicted_labels):
+        if not (-offset <= true <= offset and -offset <= predicted <= offset):
+            raise ValueError(f'Level out of range: {true}, {predicted}')
+        counts[true + offset][predicted + offset] += 1
+    return counts
+
+
+def accuracy_from_counts(counts):
+    """ Calculates the strict and loose accuracy from a count matrix.
+    Strict only counts the exact level as correct, loose counts the correct
+    direction as correct (flexion, co-contraction, or extension).
+
+    Args:
+        counts (list): list of lists or array with counts, true level x
+        predicted level, with level 0 in the middle.
+
+    Returns:
+        float, float: strict and loose accuracy.
     """
-    if hasattr(obj, "_ncols"):
-        obj._ncol = obj._ncols
-    for child in obj.get_children():
-        tikzplotlib_fix_ncols(child)
+    num_levels = len(counts)
+    middle = num_levels // 2
+    total = sum(sum(row) for row in counts)
+    correct_strict = sum(counts[i][i] for i in range(num_levels))
+    correct_loose = correct_strict + sum(
+        counts[i][j] for i in range(num_levels) for j in range(num_levels)
+        if i != j and (i - middle) * (j - middle) > 0)
+    return correct_strict / total, correct_loose / total
@@ -0,0 +1,237 @@
+"""
+ * @author Myrthe Tilleman
+ * @email metill@utu.fi
+ * @create date 2026-10-19 17:48:03
+ * @desc Vibration patterns compiled ahead of time into timeline tables of
+ (delay, pin mask) steps, and one player that plays them back. Bit i of a
+ pin mask is motors.pins[i]. Each step also stores the next step, so a
+ pattern can loop, e.g. to keep vibrating while the level stays the same.
+ A pattern without loop ends in a step with all pins off that repeats
+ itself. Runs on the microprocessor.
+"""
+
+import asyncio
+import time
+from array import array
+
+
+class Pattern():
+    def __init__(self, delays, masks, loop_start=None):
+        """ Timeline table of a pattern.
+
+        Args:
+            delays (list): time (in seconds) of each step.
+            masks (list): pin mask of each step, pins that are on.
+            loop_start (int, optional): step to continue from after the last
+            step. Turns all pins off after the last step when None.
+            Defaults to None.
+        """
+        delays = list(delays)
+        masks = list(masks)
+        if loop_start is None:  # end with all pins off
+            loop_start = len(masks)
+            delays.append(0)
+            masks.append(0)
+
+        self.delays = array('f', delays)
+        self.masks = array('B', masks)
+        self.next_steps = array('H', list(range(1, len(masks))) + [
+            loop_start])
+
+
+OFF = Pattern([0], [0], 0)  # all pins off
+
+
+def pin_mask(pin_indices):
+    """ Converts pin indices into a pin mask.
+
+    Args:
+        pin_indices (list): indices of motors.pins.
+
+    Returns:
+        int: mask with a bit per pin.
+    """
+    mask = 0
+    for index in pin_indices:
+        mask |= 1 << index
+    return mask
+
+
+def compile_pattern(steps, loop_start=None):
+    """ Compiles a list of steps into a Pattern.
+
+    Args:
+        steps (list): (delay in seconds, pin indices that are on) per step.
+        loop_start (int, optional): step to loop from. Defaults to None.
+
+    Returns:
+        Pattern: the compiled pattern.
+    """
+    return Pattern([delay for delay, _ in steps],
+                   [pin_mask(pins) for _, pins in steps], loop_start)
+
+
+def pulse_train(pin_indices, on_time, off_time, count=1, loop=False):
+    """ Turns the pins on and off count times.
+
+    Args:
+        pin_indices (list): indices of motors.pins.
+        on_time (float): time (in seconds) the pins are on.
+        off_time (float): time (in seconds) the pins are off.
+        count (int, optional): number of pulses. Defaults to 1.
+        loop (bool, optional): Whether the pulses repeat. Defaults to False.
+
+    Returns:
+        Pattern: the compiled pattern.
+    """
+    steps = [(on_time, pin_indices), (off_time, [])] * count
+    return compile_pattern(steps, 0 if loop else None)
+
+
+def sweep(pin_indices, on_time, gap=0, loop=False):
+    """ Turns on one pin after the other.
+
+    Args:
+        pin_indices (list): indices of motors.pins in the order of the sweep.
+        on_time (float): time (in seconds) each pin is on.
+        gap (float, optional): time (in seconds) between the pins.
+        Defaults to 0.
+        loop (bool, optional): Whether the sweep repeats. Defaults to False.
+
+    Returns:
+        Pattern: the compiled pattern.
+    """
+    steps = []
+    for index in pin_indices:
+        steps.append((on_time, [index]))
+        if gap > 0:
+            steps.append((gap, []))
+    return compile_pattern(steps, 0 if loop else None)
+
+
+def slow_down_pattern(pin_indices, vibration_time, min_off_time=0.100,
+                      max_off_time=0.500, threshold=2):
+    """ Compiles the rule of ActivateVibrationMotor.adjust_off_time: pulses
+    with min_off_time until the pulses took threshold seconds, then loops
+    pulses with max_off_time.
+
+    Args:
+        pin_indices (list): indices of motors.pins.
+        vibration_time (float): time (in seconds) the pins are on.
+        min_off_time (float, optional): Defaults to 0.100.
+        max_off_time (float, optional): Defaults to 0.500.
+        threshold (int, optional): Time (in seconds) after which the
+        interval between vibrations increases. Defaults to 2.
+
+    Returns:
+        Pattern: the compiled pattern.
+    """
+    fast = 0
+    while (vibration_time + min_off_time) * (fast + 1) <= threshold:
+        fast += 1
+    steps = [(vibration_time, pin_indices), (min_off_time, [])] * fast
+    steps += [(vibration_time, pin_indices), (max_off_time, [])]
+    return compile_pattern(steps, 2 * fast)
+
+
+def level_patterns(motors, threshold=2):
+    """ Compiles the feedback of each level of motors.level_list, after the
+    thresholds are set.
+
+    Args:
+        motors (class): instance from ActivateVibrationMotor
+        threshold (int, optional): Time (in seconds) after which the
+        interval between vibrations increases. Defaults to 2.
+
+    Returns:
+        list: Pattern per level.
+    """
+    return [slow_down_pattern(level_conf["PIN_INDEX"],
+                              level_conf["VIBRATION_TIME"],
+                              motors.min_off_time, motors.max_off_time,
+                              threshold)
+            for level_conf in motors.level_list]
+
+
+class PatternPlayer():
+    def __init__(self, pins, idle=None, interrupt_off=False,
+                 poll_time=0.02):
+        """ Plays one pattern at a time on the pins.
+
+        Args:
+            pins (list): digital output pins, e.g. motors.pins.
+            idle (function, optional): called with the delay at the start of
+            each step with all pins off, or inf when stopped, returns the
+            time it used, which is subtracted from the delay, e.g.
+            GcPolicy.idle. Defaults to None.
+            interrupt_off (bool, optional): Whether a new pattern starts
+            during a step with all pins off, instead of after it, so a level
+            change is not delayed by a long off time. Defaults to False.
+            poll_time (float, optional): time (in seconds) between checks
+            for a new pattern during an interrupted off step, or while
+            stopped. Defaults to 0.02.
+        """
+        self.pins = pins
+        self.idle = idle
+        self.interrupt_off = interrupt_off
+        self.poll_time = poll_time
+        self.bits = [1 << index for index in range(len(pins))]
+        self.pattern = OFF
+        self.step = 0
+
+    def play(self, pattern):
+        """ Starts a pattern. The current pattern continues when it is the
+        same pattern.
+
+        Args:
+            pattern (Pattern): pattern to play.
+        """
+        if pattern is not self.pattern:
+            self.pattern = pattern
+            self.step = 0
+
+    def stop(self):
+        """ Stops the current pattern, the pins are turned off in the next
+        step.
+        """
+        self.play(OFF)
+
+    def write_mask(self, mask):
+        """ Turns the pins of the mask on and all other pins off.
+
+        Args:
+            mask (int): pin mask.
+        """
+        for pin, bit in zip(self.pins, self.bits):
+            pin.value = bool(mask & bit)
+
+    async def run(self):
+        """ Task that plays the patterns. Every step awaits at least once,
+        so the other tasks keep running.
+        """
+        while True:
+            pattern = self.pattern
+            step = self.step
+            mask = pattern.masks[step]
+            delay = pattern.delays[step]
+            # OFF and the end of a pattern: off until the next pattern
+            stopped = not mask and not delay and \
+                pattern.next_steps[step] == step
+            self.write_mask(mask)
+            if not mask and self.idle is not None:
+                window = float('inf') if stopped else delay
+                delay = max(0, delay - self.idle(window))
+
+            if mask or not self.interrupt_off:
+                await asyncio.sleep(delay)
+            else:
+                end = float('inf') if stopped else time.monotonic() + delay
+                while True:
+                    await asyncio.sleep(
+                        min(max(0, end - time.monotonic()), self.poll_time))
+                    if pattern is not self.pattern or \
+                            time.monotonic() >= end:
+                        break
+
+            if pattern is self.pattern:  # not changed while sleeping
+                self.step = pattern.next_steps[step]